@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Benchmark JSONArrayWidget.load_json_object against loading one add_item call at a time.
+
+    python benchmarks/bench_array_load.py 1000 10000 50000
+"""
+
+import gc
+import os
+import sys
+from pathlib import Path
+from time import perf_counter
+
+# The package is imported from this checkout, rather than from an installed copy
+PACKAGE_DIRECTORY = Path(__file__).absolute().parent.parent
+sys.path.insert(0, str(PACKAGE_DIRECTORY))
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5 import QtCore, QtWidgets
+
+from qtjsonschema.journal import EditJournal
+from qtjsonschema.widgets import JSONArrayWidget, create_widget
+
+# Each measurement is the best of this many runs
+REPEAT = 3
+
+# Arrays are represented by a JSONArrayWidget unless they opt in to JSONVirtualArrayWidget
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "array": {"type": "array", "items": {"type": "string"}}
+    }
+}
+
+
+def create_array_widget() -> tuple:
+    """Return root widget and its array widget, with change and edit listeners like those of the editor window"""
+    root = create_widget("root", SCHEMA)
+    widget = root.properties["array"]
+    assert isinstance(widget, JSONArrayWidget)
+
+    timer = QtCore.QTimer(root)
+    timer.setSingleShot(True)
+    root.valueChanged.connect(timer.start)
+
+    root.journal = EditJournal()
+    root.edited.connect(root.journal.record)
+    return root, widget
+
+
+def best_time(func, data: list) -> float:
+    return min(func(data) for _ in range(REPEAT))
+
+
+def time_item_by_item(data: list) -> float:
+    root, widget = create_array_widget()
+    gc.collect()
+
+    start_time = perf_counter()
+    for datum in data:
+        widget.add_item(datum)
+    QtWidgets.QApplication.processEvents()
+    return perf_counter() - start_time
+
+
+def time_bulk(data: list) -> float:
+    root, widget = create_array_widget()
+    gc.collect()
+
+    start_time = perf_counter()
+    widget.load_json_object(data)
+    QtWidgets.QApplication.processEvents()
+    return perf_counter() - start_time
+
+
+def time_reload_shorter(data: list) -> float:
+    root, widget = create_array_widget()
+    widget.load_json_object(data)
+    gc.collect()
+
+    start_time = perf_counter()
+    widget.load_json_object(data[:len(data) // 2])
+    QtWidgets.QApplication.processEvents()
+    assert widget.dump_json_object() == data[:len(data) // 2]
+    return perf_counter() - start_time
+
+
+def main(sizes):
+    app = QtWidgets.QApplication(sys.argv)
+
+    print("{:>8} {:>14} {:>14} {:>8} {:>14}".format("items", "item-by-item", "bulk", "speedup", "reload half"))
+    for size in sizes:
+        data = ["item {}".format(i) for i in range(size)]
+        item_by_item = best_time(time_item_by_item, data)
+        bulk = best_time(time_bulk, data)
+        reload_shorter = best_time(time_reload_shorter, data)
+        print("{:>8d} {:>13.3f}s {:>13.3f}s {:>7.2f}x {:>13.3f}s".format(size, item_by_item, bulk,
+                                                                        item_by_item / bulk, reload_shorter))
+
+    return app
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1000, 10000, 50000])
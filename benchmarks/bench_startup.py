@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Benchmark import time and time to first window, against the budget in startup_budget.json.
+
+Each scenario runs in a fresh interpreter, and is timed from process launch until it exits, less the time to start an
+interpreter which imports nothing. Each scenario also lists modules which it must not import, such as dependencies
+which should only be imported on first use. The exit status is 1 if any scenario exceeds its budget.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 20 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+
+BUDGET_PATH = Path(__file__).with_name("startup_budget.json")
+PACKAGE_DIRECTORY = Path(__file__).absolute().parent.parent
+
+SHOW_WINDOW = """
+from PyQt5 import QtWidgets
+from qtjsonschema.editor import MainWindow
+
+app = QtWidgets.QApplication([])
+window = MainWindow()
+window.show()
+app.processEvents()
+"""
+
+SCENARIOS = {
+    "import_package": "import qtjsonschema",
+    "import_tools": "import qtjsonschema.tools",
+    "import_widgets": "import qtjsonschema.widgets",
+    "import_cli": "import qtjsonschema.__main__",
+    "first_window": SHOW_WINDOW,
+}
+
+# Prints the modules imported by a scenario
+REPORT_MODULES = "\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))\n"
+
+
+def run_python(code: str) -> tuple:
+    """Return (duration, stdout) of a fresh interpreter running code"""
+    env = dict(os.environ, PYTHONPATH=str(PACKAGE_DIRECTORY), QT_QPA_PLATFORM="offscreen")
+
+    start_time = perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env,
+                            check=True, universal_newlines=True)
+    return perf_counter() - start_time, result.stdout
+
+
+def measure_scenario(code: str, repeat: int, baseline: float) -> dict:
+    durations = [run_python(code)[0] for _ in range(repeat)]
+    _, stdout = run_python(code + REPORT_MODULES)
+
+    return {"median": max(statistics.median(durations) - baseline, 0.0),
+            "min": max(min(durations) - baseline, 0.0),
+            "modules": json.loads(stdout.splitlines()[-1])}
+
+
+def check_budget(name: str, result: dict, budget: dict) -> list:
+    """Return list of messages describing how a scenario exceeds its budget"""
+    failures = []
+
+    if result["median"] > budget["max_seconds"]:
+        failures.append("{} took {:.3f}s, over budget of {:.3f}s".format(name, result["median"],
+                                                                         budget["max_seconds"]))
+
+    for module in budget.get("forbidden_modules", ()):
+        if module in result["modules"]:
+            failures.append("{} imported {}".format(name, module))
+
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=10, help="number of timed runs of each scenario")
+    parser.add_argument("--budget", default=str(BUDGET_PATH), help="path of budget file")
+    parser.add_argument("--output", help="path of JSON results file")
+    args = parser.parse_args(argv)
+
+    with open(args.budget) as f:
+        budgets = json.load(f)
+
+    baseline = statistics.median(run_python("pass")[0] for _ in range(args.repeat))
+    print("interpreter startup: {:.4f}s".format(baseline))
+    print("{:<16} {:>10} {:>10} {:>10}".format("scenario", "min", "median", "budget"))
+
+    results = {}
+    failures = []
+    for name in args.scenario or SCENARIOS:
+        result = results[name] = measure_scenario(SCENARIOS[name], args.repeat, baseline)
+        budget = budgets[name]
+
+        print("{:<16} {:>9.4f}s {:>9.4f}s {:>9.4f}s".format(name, result["min"], result["median"],
+                                                            budget["max_seconds"]))
+        failures.extend(check_budget(name, result, budget))
+
+    for message in failures:
+        print("OVER BUDGET: {}".format(message))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"baseline": baseline, "results": {k: {m: v for m, v in r.items() if m != "modules"}
+                                                         for k, r in results.items()}}, f, indent=4)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
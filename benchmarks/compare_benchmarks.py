@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Compare two results files written by run_benchmarks.py.
+
+The exit status is 1 if any phase is slower (by median time) or uses more peak memory than the baseline by more than
+the threshold.
+
+    python benchmarks/compare_benchmarks.py baseline.json results.json --threshold 0.1
+"""
+
+import argparse
+import json
+import sys
+
+
+def iter_comparisons(baseline: dict, current: dict):
+    """Yield (scenario, phase, metric, baseline value, current value) for results present in both files"""
+    for scenario, phases in current["results"].items():
+        for phase, result in phases.items():
+            try:
+                baseline_result = baseline["results"][scenario][phase]
+            except KeyError:
+                continue
+
+            for metric in ("median", "peak_memory"):
+                yield scenario, phase, metric, baseline_result[metric], result[metric]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline", help="baseline results file")
+    parser.add_argument("current", help="current results file")
+    parser.add_argument("--threshold", type=float, default=0.1, help="permitted relative increase")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    print("baseline: {}".format(baseline["metadata"].get("commit")))
+    print("current:  {}".format(current["metadata"].get("commit")))
+    print("{:<14} {:<9} {:<12} {:>12} {:>12} {:>8}".format("scenario", "phase", "metric", "baseline", "current",
+                                                           "change"))
+
+    regressions = 0
+    for scenario, phase, metric, baseline_value, current_value in iter_comparisons(baseline, current):
+        change = (current_value - baseline_value) / baseline_value if baseline_value else 0.0
+        is_regression = change > args.threshold
+        regressions += is_regression
+
+        print("{:<14} {:<9} {:<12} {:>12.4g} {:>12.4g} {:>+7.1%}{}".format(
+            scenario, phase, metric, baseline_value, current_value, change, "  REGRESSION" if is_regression else ""))
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
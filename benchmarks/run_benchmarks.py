@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+Benchmark building, loading, dumping and validating forms for synthetic schemas.
+
+Each phase is timed over several repeats, and then run once more with tracemalloc to record its peak Python
+memory allocation (memory allocated by Qt itself is not traced). Results are written as JSON for
+compare_benchmarks.py.
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --scenario wide_object --scenario heavy_ref --repeat 10
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+
+# The package is imported from this checkout, rather than from an installed copy
+PACKAGE_DIRECTORY = Path(__file__).absolute().parent.parent
+sys.path.insert(0, str(PACKAGE_DIRECTORY))
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5 import QtCore, QtWidgets
+
+from qtjsonschema.validation import ValidationTarget, ValidatorCache
+from qtjsonschema.widgets import create_widget
+from qtjsonschema.workers import ValidationTask
+
+from synthetic import SCENARIOS
+
+PHASES = ("build", "load", "dump", "validate")
+
+
+def run_phases(schema: dict, instance) -> dict:
+    """Run each phase once, returning a mapping from phase name to its duration (seconds)"""
+    timings = {}
+
+    start_time = perf_counter()
+    widget = create_widget("root", schema)
+    timings["build"] = perf_counter() - start_time
+
+    start_time = perf_counter()
+    widget.load_json_object(instance)
+    QtWidgets.QApplication.processEvents()
+    timings["load"] = perf_counter() - start_time
+
+    start_time = perf_counter()
+    dumped = widget.dump_json_object()
+    timings["dump"] = perf_counter() - start_time
+
+    # As for the editor window: a validator is built for the schema, then the dumped instance is validated
+    start_time = perf_counter()
+    validator = ValidatorCache().get_validator(schema)
+    task = ValidationTask(0, validator, [ValidationTarget((), schema, None, dumped)])
+    task.run()
+    timings["validate"] = perf_counter() - start_time
+
+    widget.deleteLater()
+    QtWidgets.QApplication.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+    return timings
+
+
+def measure_peak_memory(schema: dict, instance) -> dict:
+    """Return mapping from phase name to peak traced allocation (bytes) during that phase, relative to its start"""
+    peaks = {}
+    tracemalloc.start()
+    start_memory = 0
+
+    def finish_phase(name):
+        nonlocal start_memory
+        current_memory, peak_memory = tracemalloc.get_traced_memory()
+        peaks[name] = peak_memory - start_memory
+
+        start_memory = current_memory
+        tracemalloc.reset_peak()
+
+    widget = create_widget("root", schema)
+    finish_phase("build")
+
+    widget.load_json_object(instance)
+    QtWidgets.QApplication.processEvents()
+    finish_phase("load")
+
+    dumped = widget.dump_json_object()
+    finish_phase("dump")
+
+    validator = ValidatorCache().get_validator(schema)
+    ValidationTask(0, validator, [ValidationTarget((), schema, None, dumped)]).run()
+    finish_phase("validate")
+
+    tracemalloc.stop()
+    widget.deleteLater()
+    QtWidgets.QApplication.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+    return peaks
+
+
+def benchmark_scenario(name: str, repeat: int) -> dict:
+    schema, instance = SCENARIOS[name]()
+    samples = {phase: [] for phase in PHASES}
+
+    for _ in range(repeat):
+        gc.collect()
+        for phase, seconds in run_phases(schema, instance).items():
+            samples[phase].append(seconds)
+
+    gc.collect()
+    peaks = measure_peak_memory(schema, instance)
+
+    return {phase: {"min": min(samples[phase]), "median": statistics.median(samples[phase]),
+                    "peak_memory": peaks[phase], "repeat": repeat} for phase in PHASES}
+
+
+def get_metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                universal_newlines=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "qt": QtCore.QT_VERSION_STR,
+        "platform": platform.platform(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed repeats")
+    parser.add_argument("--output", help="path of JSON results file")
+    args = parser.parse_args(argv)
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    results = {"metadata": get_metadata(), "results": {}}
+
+    print("{:<14} {:<9} {:>11} {:>11} {:>12}".format("scenario", "phase", "min", "median", "peak memory"))
+    for name in args.scenario or SCENARIOS:
+        scenario_results = results["results"][name] = benchmark_scenario(name, args.repeat)
+
+        for phase, result in scenario_results.items():
+            print("{:<14} {:<9} {:>10.4f}s {:>10.4f}s {:>10.2f}MB".format(name, phase, result["min"],
+                                                                         result["median"],
+                                                                         result["peak_memory"] / 1e6))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    return app
+
+
+if __name__ == "__main__":
+    main()
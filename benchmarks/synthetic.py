@@ -0,0 +1,109 @@
+"""
+Synthetic schemas and matching instances for benchmarks.
+
+Each scenario function returns a (schema, instance) pair, where the instance validates against the schema.
+"""
+
+import random
+
+PRIMITIVE_SCHEMAS = (
+    ({"type": "string"}, lambda r, i: "value {}".format(i)),
+    ({"type": "string", "pattern": "^v", "minLength": 1}, lambda r, i: "v{}".format(i)),
+    ({"type": "integer", "minimum": 0, "maximum": 1000}, lambda r, i: r.randint(0, 1000)),
+    ({"type": "number"}, lambda r, i: r.random() * 100),
+    ({"type": "boolean"}, lambda r, i: bool(i % 2)),
+    ({"type": "string", "format": "date-time"}, lambda r, i: "2000-01-01T00:00:00Z"),
+)
+
+
+def wide_object(width: int = 500, seed: int = 0) -> tuple:
+    """Object with many primitive properties"""
+    r = random.Random(seed)
+    properties = {}
+    instance = {}
+
+    for i in range(width):
+        schema, make_value = PRIMITIVE_SCHEMAS[i % len(PRIMITIVE_SCHEMAS)]
+        properties["p{}".format(i)] = dict(schema)
+        instance["p{}".format(i)] = make_value(r, i)
+
+    return {"type": "object", "properties": properties}, instance
+
+
+def deep_nesting(depth: int = 40, seed: int = 0) -> tuple:
+    """Objects nested within each other, each with a few primitive properties"""
+    r = random.Random(seed)
+    schema = {"type": "object", "properties": {"leaf": {"type": "string"}}}
+    instance = {"leaf": "leaf"}
+
+    for i in range(depth):
+        schema = {"type": "object", "properties": {"child": schema, "n": {"type": "integer"},
+                                                   "s": {"type": "string"}}}
+        instance = {"child": instance, "n": r.randint(0, 99), "s": "level {}".format(i)}
+
+    return schema, instance
+
+
+def big_enum(size: int = 5000, count: int = 20, seed: int = 0) -> tuple:
+    """Object with several properties drawn from large enumerations"""
+    r = random.Random(seed)
+    values = ["option {}".format(i) for i in range(size)]
+
+    schema = {"type": "object", "properties": {"e{}".format(i): {"enum": values} for i in range(count)}}
+    instance = {"e{}".format(i): r.choice(values) for i in range(count)}
+    return schema, instance
+
+
+def large_array(length: int = 20000, seed: int = 0) -> tuple:
+    """Virtual array of small objects"""
+    r = random.Random(seed)
+    item_schema = {"type": "object", "properties": {"name": {"type": "string"}, "value": {"type": "number"},
+                                                    "flag": {"type": "boolean"}}}
+
+    schema = {"type": "object", "properties": {"items": {"type": "array", "x-virtual": True, "items": item_schema}}}
+    instance = {"items": [{"name": "item {}".format(i), "value": r.random(), "flag": bool(i % 2)}
+                          for i in range(length)]}
+    return schema, instance
+
+
+def small_arrays(count: int = 20, length: int = 50, seed: int = 0) -> tuple:
+    """Object with several arrays, which have a widget per item"""
+    r = random.Random(seed)
+    item_schema = {"type": "object", "properties": {"a": {"type": "integer"}, "b": {"type": "string"}}}
+
+    schema = {"type": "object", "properties": {
+        "a{}".format(i): {"type": "array", "items": item_schema} for i in range(count)
+    }}
+    instance = {"a{}".format(i): [{"a": r.randint(0, 99), "b": "b{}".format(j)} for j in range(length)]
+                for i in range(count)}
+    return schema, instance
+
+
+def heavy_ref(count: int = 300, chain: int = 5, seed: int = 0) -> tuple:
+    """Object whose properties are references into chains of references to definitions"""
+    r = random.Random(seed)
+    definitions = {}
+
+    for i in range(count):
+        definitions["d{}_0".format(i)] = {"type": "object", "properties": {"x": {"type": "integer"},
+                                                                           "y": {"type": "string"}}}
+        for j in range(1, chain):
+            definitions["d{}_{}".format(i, j)] = {"$ref": "#/definitions/d{}_{}".format(i, j - 1)}
+
+    schema = {
+        "type": "object",
+        "definitions": definitions,
+        "properties": {"p{}".format(i): {"$ref": "#/definitions/d{}_{}".format(i, chain - 1)} for i in range(count)},
+    }
+    instance = {"p{}".format(i): {"x": r.randint(0, 99), "y": "y{}".format(i)} for i in range(count)}
+    return schema, instance
+
+
+SCENARIOS = {
+    "wide_object": wide_object,
+    "deep_nesting": deep_nesting,
+    "big_enum": big_enum,
+    "large_array": large_array,
+    "small_arrays": small_arrays,
+    "heavy_ref": heavy_ref,
+}
@@ -1,2 +1,10 @@
 version = '0.1.0'
-from .widgets import create_widget
+
+
+def __getattr__(name):
+    # Widgets are imported on first use, so that headless tools do not import Qt
+    if name == 'create_widget':
+        from .widgets import create_widget
+        return create_widget
+
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -6,163 +6,127 @@ Generate a dynamic Qt form representing a JSON Schema.
 Filling the form will generate JSON.
 """
 
-import collections
 import json
-from json import dumps
-from pathlib import Path
+import logging
+import sys
+import traceback
 
 import click
-from PyQt5 import QtCore, QtWidgets
-from jsonschema import Draft4Validator, FormatChecker
 
-from .widgets import create_widget
+from .instrumentation import profiler
+from .schema_cache import SchemaCache, load_schema_file
+from .tools import HTTPResourceLoader, get_cache_directory
 
 
-class MainWindow(QtWidgets.QWidget):
-    schema = None
-
-    def __init__(self, parent=None, validation_interval=100):
-        QtWidgets.QWidget.__init__(self, parent)
-
-        self.setWindowTitle("PyQt JSON Schema Editor")
-
-        self.menu = QtWidgets.QMenuBar(self)
-        self.file_menu = self.menu.addMenu("&File")
-
-        _action_open_json = QtWidgets.QAction("&Open File", self)
-        _action_open_json.triggered.connect(self._handle_open_json)
-
-        _action_open_schema = QtWidgets.QAction("Open &JSON Schema", self)
-        _action_open_schema.triggered.connect(self._handle_open_schema)
-
-        _action_save = QtWidgets.QAction("&Save", self)
-        _action_save.triggered.connect(self._handle_save)
-
-        _action_quit = QtWidgets.QAction("&Close", self)
-        _action_quit.triggered.connect(self._handle_quit)
-
-        self.file_menu.addAction(_action_open_json)
-        self.file_menu.addAction(_action_open_schema)
-        self.file_menu.addAction(_action_save)
-        self.file_menu.addSeparator()
-        self.file_menu.addAction(_action_quit)
-
-        # Scrollable region for schema form
-        self.content_region = QtWidgets.QScrollArea(self)
-        self.schema_widget = None
-        self.schema = None
-
-        self._validation_label = QtWidgets.QLabel()
-        self._format_checker = FormatChecker()
-
-        self._validation_timer = QtCore.QTimer(self)
-        self._validation_timer.setInterval(validation_interval)
-        self._validation_timer.timeout.connect(self._do_validation)
-
-        vbox = QtWidgets.QVBoxLayout()
-        vbox.addWidget(self.menu)
-        vbox.addWidget(self._validation_label)
-        vbox.addWidget(self.content_region)
-        vbox.setContentsMargins(0, 0, 0, 0)
-
-        hbox = QtWidgets.QHBoxLayout()
-        hbox.setContentsMargins(0, 0, 0, 0)
-        hbox.addLayout(vbox)
-
-        self.setLayout(hbox)
-
-    @property
-    def format_checker(self) -> FormatChecker:
-        return self._format_checker
-
-    def load_schema(self, file_path):
-        """
-            Load a schema and create the root element.
-        """
-        schema_path = Path(file_path).absolute()
-        with open(schema_path) as f:
-            schema = json.loads(f.read(), object_pairs_hook=collections.OrderedDict)
-
-        Draft4Validator.check_schema(schema)
-
-        schema_title = schema.get("title", "<root>")
-        self.setWindowTitle("{} - PyQt JSON Schema".format(schema_title))
-        self.schema_widget = create_widget(schema_title, schema, schema_path.as_uri())
-        self.content_region.setWidget(self.schema_widget)
-        self.content_region.setWidgetResizable(True)
-        self.schema = schema
-
-        self._validation_timer.start()
-
-    def load_json(self, json_file):
-        """
-            Load a schema and create the root element.
-        """
-        with open(json_file) as f:
-            data = json.loads(f.read(), object_pairs_hook=collections.OrderedDict)
-            # from jsonschema import validate
-            # validate(data, self.schema)
-            self.schema_widget.load_json_object(data)
-
-    def _do_validation(self):
-        label = self._validation_label
-
-        validator = Draft4Validator(self.schema, format_checker=self._format_checker)
-
-        errors = [err for err in validator.iter_errors(self.schema_widget.dump_json_object())]
-        if errors:
-            error = errors[0]
-            error_string = ("{} errors" if len(errors) > 1 else "{} error").format(len(errors))
-            label.setText("{}.\nFirst error in {}:\n{}".format(error_string, '#/' + '/'.join(error.schema_path),
-                                                               error.message))
-            label.setStyleSheet("QLabel { color: red; }")
-
-        else:
-            label.setText("Object validates")
-            label.setStyleSheet("QLabel { color: green; }")
-
-    def _handle_open_json(self):
-        # Open JSON File
-        json_file, _ = QtWidgets.QFileDialog.getOpenFileName(self, 'Open Schema', filter="JSON File (*.json)")
-        if json_file:
-            self.load_json(json_file)
-
-    def _handle_open_schema(self):
-        # Open JSON Schema
-        schema, _ = QtWidgets.QFileDialog.getOpenFileName(self, 'Open Schema', filter="JSON Schema (*.schema *.json)")
-        if schema:
-            self.load_schema(schema)
-
-    def _handle_save(self):
-        # Save JSON output
-        obj = self.content_region.widget().dump_json_object()
-        outfile, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Save JSON', filter="JSON (*.json)")
-        if outfile:
-            with open(outfile, 'w') as f:
-                f.write(dumps(obj, sort_keys=True, indent=4))
-
-    def _handle_quit(self):
-        # TODO: Check if saved?
-        self.close()
-
-
-@click.command()
+@click.group(invoke_without_command=True)
 @click.option('--schema', default=None, help='Schema file to generate an editing window from.')
 @click.option('--json', default=None, help='Schema file to generate an editing window from.')
-def json_editor(schema, json):
-    import sys
+@click.option('--incremental-validation', is_flag=True, help='Validate only the sub-schemas of changed fields.')
+@click.option('--schema-cache/--no-schema-cache', default=True, help='Cache checked schemas and their references.')
+@click.option('--offline', is_flag=True, help='Load remote references only from the HTTP cache.')
+@click.option('--http-timeout', default=10.0, help='Timeout for loading remote references (seconds).')
+@click.option('--indent', default=4, help='Indentation of saved JSON (spaces).')
+@click.option('--compact', is_flag=True, help='Save JSON without whitespace.')
+@click.option('--sort-keys/--no-sort-keys', default=True, help='Sort object keys in saved JSON.')
+@click.option('--recovery/--no-recovery', default=True, help='Journal edits to restore them if the editor crashes.')
+@click.option('--log-level', default='WARNING', type=click.Choice(['DEBUG', 'INFO', 'WARNING', 'ERROR']),
+              help='Level of messages logged to stderr.')
+@click.option('--profile', is_flag=True, help='Record timings of schema loading, form building and validation.')
+@click.option('--trace-file', default=None, type=click.Path(dir_okay=False),
+              help='Write recorded timings to this Chrome trace file on exit (implies --profile).')
+@click.pass_context
+def json_editor(ctx, schema, json, incremental_validation, schema_cache, offline, http_timeout, indent, compact,
+                sort_keys, recovery, log_level, profile, trace_file):
+    logging.basicConfig(level=log_level, format="%(levelname)s %(name)s: %(message)s")
+
+    if profile or trace_file:
+        profiler.enable()
+    if trace_file:
+        ctx.call_on_close(lambda: profiler.export_chrome_trace(trace_file))
+
+    if ctx.invoked_subcommand is not None:
+        return
+
+    # Subcommands run without Qt
+    from PyQt5 import QtCore, QtWidgets
+    from .editor import MainWindow
 
     app = QtWidgets.QApplication(sys.argv)
-    main_window = MainWindow()
+    http_loader = HTTPResourceLoader(timeout=http_timeout, cache_directory=get_cache_directory() / "http",
+                                     offline=offline)
+    main_window = MainWindow(incremental_validation=incremental_validation,
+                             schema_cache=SchemaCache() if schema_cache else None, http_loader=http_loader,
+                             save_indent=None if compact else indent, save_sort_keys=sort_keys,
+                             recovery_directory=get_cache_directory() / "recovery" if recovery else None)
     main_window.show()
     main_window.resize(1000, 800)
 
-    if schema:
-        main_window.load_schema(schema)
-        if json:
-            main_window.load_json(json)
+    def load_documents():
+        # Exceptions raised from Qt slots abort the process, so they are reported here and the editor exits instead
+        try:
+            main_window.load_schema(schema)
 
-    app.exec_()
+            # A restored session is offered for saving before the document replaces it
+            if json and main_window.confirm_discard_changes():
+                main_window.load_json(json)
+
+        except Exception:
+            traceback.print_exc()
+            app.exit(1)
+
+    # Documents are loaded once the event loop starts, so that the window is shown first
+    if schema:
+        QtCore.QTimer.singleShot(0, load_documents)
+
+    sys.exit(app.exec_())
+
+
+@json_editor.command()
+@click.option('--schema', required=True, type=click.Path(exists=True, dir_okay=False),
+              help='Schema file to validate against.')
+@click.option('--jobs', '-j', default=None, type=int, help='Number of worker processes (default: number of CPUs).')
+@click.option('--output-dir', default=None, type=click.Path(file_okay=False),
+              help='Write normalized copies of valid files to this directory.')
+@click.option('--indent', default=4, help='Indentation of normalized JSON (spaces).')
+@click.option('--compact', is_flag=True, help='Write normalized JSON without whitespace.')
+@click.option('--sort-keys/--no-sort-keys', default=True, help='Sort object keys in normalized JSON.')
+@click.option('--schema-cache/--no-schema-cache', default=True, help='Cache checked schemas and their references.')
+@click.option('--offline', is_flag=True, help='Load remote references only from the HTTP cache.')
+@click.option('--http-timeout', default=10.0, help='Timeout for loading remote references (seconds).')
+@click.argument('files', nargs=-1, type=click.Path(dir_okay=False))
+def validate(schema, jobs, output_dir, indent, compact, sort_keys, schema_cache, offline, http_timeout, files):
+    """Validate JSON files against a schema without a GUI.
+
+    A JSON object is written to stdout for each file, and the exit status is 1 if any file is invalid.
+    """
+    from jsonschema.exceptions import SchemaError
+    from .batch import BatchValidator, iter_validate_files
+
+    http_cache_directory = get_cache_directory() / "http"
+    http_loader = HTTPResourceLoader(timeout=http_timeout, cache_directory=http_cache_directory, offline=offline)
+
+    try:
+        loaded = load_schema_file(schema, SchemaCache() if schema_cache else None, http_loader)
+    except (OSError, ValueError, SchemaError) as err:
+        raise click.ClickException("Failed to load schema {}: {}".format(schema, err))
+
+    batch_validator = BatchValidator(loaded.schema, loaded.uri, loaded.registry.resources, output_dir,
+                                     None if compact else indent, sort_keys, http_timeout, http_cache_directory,
+                                     offline)
+
+    if output_dir is not None:
+        try:
+            batch_validator.check_output_paths(files)
+        except ValueError as err:
+            raise click.ClickException(str(err))
+
+    failures = 0
+    for result in iter_validate_files(batch_validator, files, jobs):
+        click.echo(json.dumps(result))
+        if not result['valid']:
+            failures += 1
+
+    sys.exit(1 if failures else 0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,167 @@
+"""
+Headless validation and normalization of JSON files, in parallel across worker processes.
+"""
+
+import collections
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .instrumentation import profiler
+from .streaming import write_json
+from .tools import HTTPResourceLoader, create_default_uri_loader_registry
+from .validation import ValidatorCache, format_json_pointer, iter_validation_issues
+
+
+class BatchValidator:
+    """Validate JSON files against a schema, optionally writing normalized copies of valid files.
+
+    Instances are sent to each worker process once, and build their validator on first use, so that it is compiled
+    once per process.
+
+    :param schema: dict-like JSON schema, which has been checked against the metaschema
+    :param schema_uri: URI of schema
+    :param resources: mapping from location URI to JSON object for referenced documents which are already loaded
+    :param output_directory: directory to write normalized files to, or None
+    :param indent: indentation of normalized files, or None for compact output
+    :param sort_keys: whether to sort object keys in normalized files
+    :param http_timeout: timeout for loading remote references (seconds)
+    :param http_cache_directory: directory of HTTP response cache, or None to disable caching
+    :param offline: if True, only load remote references from the HTTP cache
+    """
+
+    def __init__(self, schema: dict, schema_uri: str, resources: dict, output_directory: Path = None,
+                 indent: int = 4, sort_keys: bool = True, http_timeout: float = 10.0,
+                 http_cache_directory: Path = None, offline: bool = False):
+        self.schema = schema
+        self.schema_uri = schema_uri
+        self.resources = resources
+        self.output_directory = output_directory
+        self.indent = indent
+        self.sort_keys = sort_keys
+        self.http_timeout = http_timeout
+        self.http_cache_directory = http_cache_directory
+        self.offline = offline
+
+        self._validator = None
+
+    def __getstate__(self):
+        # Validators hold a ref resolver and HTTP session, so are built in each process instead
+        state = self.__dict__.copy()
+        state['_validator'] = None
+        return state
+
+    @property
+    def validator(self):
+        if self._validator is None:
+            http_loader = HTTPResourceLoader(timeout=self.http_timeout, cache_directory=self.http_cache_directory,
+                                             offline=self.offline)
+            registry = create_default_uri_loader_registry(self.schema, self.schema_uri, http_loader)
+            for location, resource in self.resources.items():
+                registry.add_resource(location, resource)
+
+            self._validator = ValidatorCache().get_validator(self.schema, self.schema_uri, registry.resources,
+                                                             registry.get_scheme_handlers())
+
+        return self._validator
+
+    def get_output_path(self, path: Path) -> Path:
+        """Return path of the normalized copy of a file.
+
+        Files beneath the working directory keep their relative path, and others keep their absolute path (beneath
+        the name of their drive, if any).
+
+        :param path: file path
+        """
+        # '..' components are normalized, so that files cannot be written outside the output directory
+        path = Path(os.path.abspath(path))
+        try:
+            relative_path = path.relative_to(Path.cwd())
+        except ValueError:
+            relative_path = Path(path.drive.replace(':', '').strip('\\/'), *path.parts[1:])
+
+        return Path(self.output_directory) / relative_path
+
+    def check_output_paths(self, paths):
+        """Raise ValueError if the normalized copies of two different files would be written to the same path
+
+        :param paths: iterable of file paths
+        """
+        sources = {}
+        for path in map(Path, paths):
+            output_path = self.get_output_path(path)
+            source = sources.setdefault(output_path, path)
+            if source.resolve() != path.resolve():
+                raise ValueError("{} and {} would both be written to {}".format(source, path, output_path))
+
+    def __call__(self, path) -> dict:
+        """Return result dictionary for a JSON file, with the keys 'path', 'valid' and 'errors'
+
+        :param path: file path
+        """
+        path = Path(path)
+        result = {'path': str(path), 'valid': False, 'errors': []}
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                instance = json.load(f, object_pairs_hook=collections.OrderedDict)
+        except (OSError, ValueError) as err:
+            result['errors'].append({'path': None, 'schema_path': None, 'message': "Failed to load: {}".format(err)})
+            return result
+
+        try:
+            with profiler.span("validate", str(path)):
+                issues = list(iter_validation_issues(self.validator, instance))
+        # Report schemas which cannot be validated (e.g. with circular references) rather than stopping the batch
+        except Exception as err:
+            result['errors'].append({'path': None, 'schema_path': None,
+                                     'message': "Validation failed: {!r}".format(err)})
+            return result
+
+        result['errors'] = [{'path': format_json_pointer(i.path), 'schema_path': format_json_pointer(i.schema_path),
+                             'message': i.message} for i in issues]
+        result['valid'] = not issues
+
+        if result['valid'] and self.output_directory is not None:
+            output_path = self.get_output_path(path)
+            try:
+                output_path.parent.mkdir(parents=True, exist_ok=True)
+                write_json(output_path, instance, self.indent, self.sort_keys)
+            except OSError as err:
+                result['valid'] = False
+                result['errors'].append({'path': None, 'schema_path': None,
+                                         'message': "Failed to write {}: {}".format(output_path, err)})
+            else:
+                result['output'] = str(output_path)
+
+        return result
+
+
+# BatchValidator of the current worker process
+_worker_validator = None
+
+
+def _initialise_worker(batch_validator: BatchValidator):
+    global _worker_validator
+    _worker_validator = batch_validator
+
+
+def _validate_in_worker(path) -> dict:
+    return _worker_validator(path)
+
+
+def iter_validate_files(batch_validator: BatchValidator, paths, jobs: int = None, chunk_size: int = 16):
+    """Yield the result dictionary for each file, in order, validating files in parallel
+
+    :param batch_validator: BatchValidator object
+    :param paths: iterable of file paths
+    :param jobs: number of worker processes (number of CPUs if omitted), or 1 to validate in this process
+    :param chunk_size: number of files sent to a worker at a time
+    """
+    if jobs == 1:
+        yield from map(batch_validator, paths)
+        return
+
+    with ProcessPoolExecutor(jobs, initializer=_initialise_worker, initargs=(batch_validator,)) as executor:
+        yield from executor.map(_validate_in_worker, paths, chunksize=chunk_size)
@@ -0,0 +1,209 @@
+"""
+Schema compilation into a resolved intermediate representation.
+
+The schema is walked once, following every 'id' scope and '$ref' reference, to produce a graph of SchemaNode objects.
+Recursive schemas produce cyclic graphs, rather than unbounded trees.
+"""
+
+from uritools import uridefrag, urijoin
+
+from .errors import UnsupportedSchemaError
+from .tools import Context
+
+_MISSING = object()
+
+
+def escape_json_pointer(key: str) -> str:
+    """Return object key escaped for use as a JSON pointer reference token
+
+    :param key: object key
+    """
+    return key.replace('~', '~0').replace('/', '~1')
+
+
+class SchemaNode:
+    """Resolved schema element, holding everything a widget needs which does not depend upon its instance.
+
+    :ivar schema: dict-like JSON schema, with any '$ref' resolved
+    :ivar ctx: Context object for the scope of the schema
+    :ivar location: URI of the schema, with a JSON pointer fragment
+    :ivar widget_class: JSONBaseWidget subclass representing the schema
+    :ivar options: widget-specific values precomputed by the widget class
+    :ivar properties: mapping from property name to SchemaNode
+    :ivar items: SchemaNode, list of SchemaNode objects, or None
+    :ivar additional_items: SchemaNode or None
+    """
+
+    def __init__(self, schema: dict, ctx: Context, location: str = None):
+        self.schema = schema
+        self.ctx = ctx
+        self.location = location if location is not None else ctx.scope_uri
+
+        self.widget_class = None
+        self.options = {}
+
+        self.properties = {}
+        self.items = None
+        self.additional_items = None
+
+        self._default_value = _MISSING
+        self._is_computing_default = False
+
+    @property
+    def title(self) -> str:
+        return self.schema.get('title')
+
+    @property
+    def description(self) -> str:
+        return self.schema.get('description')
+
+    @property
+    def default_value(self):
+        """Value dumped by a newly created widget for this node.
+
+        The value is shared, and must be copied before it is modified.
+        Recursive references encountered whilst computing the value are represented by the recursive value of the
+        widget class (e.g. an empty object), as a value cannot contain itself.
+        """
+        if self._default_value is _MISSING:
+            if self._is_computing_default:
+                return self.widget_class.get_recursive_json_object(self)
+
+            self._is_computing_default = True
+            try:
+                self._default_value = self.widget_class.get_default_json_object(self)
+            finally:
+                self._is_computing_default = False
+
+        return self._default_value
+
+    def get_item_node(self, index: int) -> 'SchemaNode':
+        """Return node for the array item at the given index
+
+        :param index: array index
+        """
+        if isinstance(self.items, list):
+            try:
+                return self.items[index]
+            except IndexError:
+                if self.additional_items is None:
+                    raise UnsupportedSchemaError("Array item {} has no schema".format(index))
+                return self.additional_items
+
+        assert self.items is not None
+        return self.items
+
+    def get_descendant_node(self, path: tuple) -> 'SchemaNode':
+        """Return node for the value at path, relative to the value of this node, raising LookupError if there is none
+
+        :param path: sequence of object keys and array indices
+        """
+        node = self
+        for key in path:
+            if isinstance(key, int):
+                if node.items is None:
+                    raise LookupError(path)
+                try:
+                    node = node.get_item_node(key)
+                except UnsupportedSchemaError:
+                    raise LookupError(path)
+            else:
+                node = node.properties[key]
+
+        return node
+
+    def __repr__(self):
+        return "SchemaNode({!r}, {})".format(self.location, self.widget_class.__name__)
+
+
+class SchemaCompiler:
+    """Compile JSON schemas into graphs of SchemaNode objects
+
+    :param get_widget_class: callable returning the widget class for a resolved schema
+    :param fallback_widget_class: widget class for schemas which cannot be resolved
+    """
+
+    def __init__(self, get_widget_class, fallback_widget_class):
+        self.get_widget_class = get_widget_class
+        self.fallback_widget_class = fallback_widget_class
+
+        self._nodes = {}
+
+    def compile(self, schema: dict, ctx: Context, location: str = None) -> SchemaNode:
+        """Return the SchemaNode for the given schema, compiling it and its descendants if necessary
+
+        :param schema: dict-like JSON schema
+        :param ctx: Context object for the scope of the schema
+        :param location: URI of the schema, with a JSON pointer fragment (scope URI if omitted)
+        """
+        if location is None:
+            location = ctx.scope_uri
+
+        try:
+            resolved_schema, resolved_ctx = self.resolve(schema, ctx)
+        except UnsupportedSchemaError:
+            node = SchemaNode(schema, ctx, location)
+            node.widget_class = self.fallback_widget_class
+            return node
+
+        # Referenced schemas are located by their reference
+        if resolved_ctx is not ctx:
+            location = resolved_ctx.scope_uri
+        schema, ctx = resolved_schema, resolved_ctx
+
+        # References to the same schema from within the same document share a node
+        key = id(schema), uridefrag(ctx.scope_uri).uri
+        try:
+            return self._nodes[key]
+        except KeyError:
+            pass
+
+        node = self._nodes[key] = SchemaNode(schema, ctx, location)
+        node.widget_class = self.get_widget_class(schema)
+
+        if '#' not in location:
+            location += '#'
+
+        for name, property_schema in schema.get('properties', {}).items():
+            node.properties[name] = self.compile(property_schema, ctx,
+                                                 "{}/properties/{}".format(location, escape_json_pointer(name)))
+
+        items = schema.get('items')
+        if isinstance(items, list):
+            node.items = [self.compile(s, ctx, "{}/items/{}".format(location, i)) for i, s in enumerate(items)]
+        elif isinstance(items, dict):
+            node.items = self.compile(items, ctx, location + "/items")
+
+        additional_items = schema.get('additionalItems')
+        if isinstance(additional_items, dict):
+            node.additional_items = self.compile(additional_items, ctx, location + "/additionalItems")
+
+        node.options = node.widget_class.compile_options(node)
+        return node
+
+    @staticmethod
+    def resolve(schema: dict, ctx: Context) -> tuple:
+        """Return (schema, context) pair after following any 'id' and '$ref' fields
+
+        :param schema: dict-like JSON schema
+        :param ctx: Context object
+        """
+        if "id" in schema:
+            ctx = ctx.follow_uri(schema['id'])
+
+        visited = set()
+        while "$ref" in schema:
+            reference = schema['$ref']
+            uri = urijoin(ctx.scope_uri, reference)
+
+            if uri in visited:
+                raise UnsupportedSchemaError("Circular reference {!r}".format(uri))
+            visited.add(uri)
+
+            schema = ctx.dereference(reference)
+            ctx = ctx.follow_uri(reference)
+
+            if "id" in schema:
+                ctx = ctx.follow_uri(schema['id'])
+
+        return schema, ctx
@@ -0,0 +1,679 @@
+"""
+Editor window, generating a dynamic Qt form from a JSON Schema.
+"""
+
+import collections
+import logging
+import os
+from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from .instrumentation import profiler
+from .journal import EditJournal, PatchOperation
+from .recovery import (RecoveryJournal, RecoverySession, get_recovery_directory, load_recovery_session,
+                       lock_recovery_session, replay_recovery_session)
+from .schema_cache import SchemaCache, load_schema_file
+from .streaming import JSONStreamReader, write_json
+from .tools import HTTPResourceLoader
+from .validation import CONTEXT_KEYWORDS, ValidationTarget, ValidatorCache, format_json_pointer, get_json_value, \
+    merge_validation_issues
+from .widgets import create_widget
+from .workers import ValidationTask
+
+if TYPE_CHECKING:
+    import jsonschema
+
+logger = logging.getLogger(__name__)
+
+JSONLoad = collections.namedtuple("JSONLoad", "file reader steps progress size was_blocked")
+
+
+class DiagnosticsPanel(QtWidgets.QWidget):
+    """Summary of the time spent in each instrumented phase, by schema location"""
+
+    HEADERS = ("Phase", "Schema location", "Count", "Total (ms)", "Max (ms)")
+
+    # Maximum number of table rows
+    ROW_LIMIT = 500
+
+    def __init__(self, parent=None):
+        QtWidgets.QWidget.__init__(self, parent)
+
+        self.table = QtWidgets.QTableWidget(0, len(self.HEADERS), self)
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(1, QtWidgets.QHeaderView.Stretch)
+
+        refresh_button = QtWidgets.QPushButton("Refresh", self)
+        refresh_button.clicked.connect(self.refresh)
+
+        clear_button = QtWidgets.QPushButton("Clear", self)
+        clear_button.clicked.connect(self._handle_clear)
+
+        export_button = QtWidgets.QPushButton("Export Trace...", self)
+        export_button.clicked.connect(self._handle_export)
+
+        button_layout = QtWidgets.QHBoxLayout()
+        button_layout.addWidget(refresh_button)
+        button_layout.addWidget(clear_button)
+        button_layout.addStretch()
+        button_layout.addWidget(export_button)
+
+        layout = QtWidgets.QVBoxLayout()
+        layout.addWidget(QtWidgets.QLabel("Diagnostics"))
+        layout.addWidget(self.table)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def refresh(self):
+        """Show the current profiler summary"""
+        summary = profiler.summary(self.ROW_LIMIT)
+
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(summary))
+
+        for row, stats in enumerate(summary):
+            cells = (stats.name, stats.key, stats.count, stats.total * 1e3, stats.maximum * 1e3)
+            for column, value in enumerate(cells):
+                item = QtWidgets.QTableWidgetItem()
+                # Numbers are stored as display data so that columns sort numerically
+                item.setData(QtCore.Qt.DisplayRole, round(value, 3) if isinstance(value, float) else value)
+                self.table.setItem(row, column, item)
+
+        self.table.setSortingEnabled(True)
+
+    def _handle_clear(self):
+        profiler.clear()
+        self.refresh()
+
+    def _handle_export(self):
+        trace_file, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Export Trace', filter="Chrome Trace (*.json)")
+        if not trace_file:
+            return
+
+        try:
+            profiler.export_chrome_trace(trace_file)
+        except OSError as err:
+            QtWidgets.QMessageBox.critical(self, "Export Trace", "Failed to export {}:\n{}".format(trace_file, err))
+
+
+class MainWindow(QtWidgets.QWidget):
+    schema = None
+
+    # Time spent loading a JSON document between event loop iterations (seconds)
+    LOAD_TIME_SLICE = 0.05
+
+    def __init__(self, parent=None, validation_interval=100, incremental_validation=False,
+                 schema_cache: SchemaCache = None, http_loader: HTTPResourceLoader = None, save_indent=4,
+                 save_sort_keys=True, recovery_directory: Path = None):
+        QtWidgets.QWidget.__init__(self, parent)
+
+        self.setWindowTitle("PyQt JSON Schema Editor")
+
+        self.menu = QtWidgets.QMenuBar(self)
+        self.file_menu = self.menu.addMenu("&File")
+
+        _action_open_json = QtWidgets.QAction("&Open File", self)
+        _action_open_json.triggered.connect(self._handle_open_json)
+
+        _action_open_schema = QtWidgets.QAction("Open &JSON Schema", self)
+        _action_open_schema.triggered.connect(self._handle_open_schema)
+
+        _action_save = QtWidgets.QAction("&Save", self)
+        _action_save.triggered.connect(self._handle_save)
+
+        _action_quit = QtWidgets.QAction("&Close", self)
+        _action_quit.triggered.connect(self._handle_quit)
+
+        self.file_menu.addAction(_action_open_json)
+        self.file_menu.addAction(_action_open_schema)
+        self.file_menu.addAction(_action_save)
+        self.file_menu.addSeparator()
+        self.file_menu.addAction(_action_quit)
+
+        self.edit_menu = self.menu.addMenu("&Edit")
+
+        self._action_undo = QtWidgets.QAction("&Undo", self)
+        self._action_undo.setShortcut(QtGui.QKeySequence.Undo)
+        self._action_undo.triggered.connect(self.undo)
+
+        self._action_redo = QtWidgets.QAction("&Redo", self)
+        self._action_redo.setShortcut(QtGui.QKeySequence.Redo)
+        self._action_redo.triggered.connect(self.redo)
+
+        self.edit_menu.addAction(self._action_undo)
+        self.edit_menu.addAction(self._action_redo)
+
+        # Scrollable region for schema form
+        self.content_region = QtWidgets.QScrollArea(self)
+        self.schema_widget = None
+        self.schema = None
+        self.schema_uri = None
+        self.registry = None
+
+        self._schema_cache = schema_cache
+        self._http_loader = http_loader
+
+        # Saved documents are compact if save_indent is None
+        self.save_indent = save_indent
+        self.save_sort_keys = save_sort_keys
+
+        self._validation_label = QtWidgets.QLabel()
+        # jsonschema is imported once validation starts
+        self._validator_cache = ValidatorCache()
+
+        # Validation is debounced; the timer is restarted by each change, and only fires once edits settle
+        self._validation_dirty = False
+        self._validation_timer = QtCore.QTimer(self)
+        self._validation_timer.setSingleShot(True)
+        self._validation_timer.setInterval(validation_interval)
+        self._validation_timer.timeout.connect(self._do_validation)
+
+        # Validation runs on a single worker thread; results from superseded runs are discarded by generation
+        self._validation_pool = QtCore.QThreadPool(self)
+        self._validation_pool.setMaxThreadCount(1)
+        self._validation_generation = 0
+        self._validation_task = None
+
+        # In incremental mode, only the sub-schemas enclosing changed widgets are validated again,
+        # and the per-subtree results are merged by path
+        self._incremental_validation = incremental_validation
+        self._changed_paths = set()
+        self._dispatched_paths = set()
+        self._validation_issues = None
+
+        # JSON documents are loaded in time slices, so that the event loop keeps running
+        self._json_load = None
+        self._json_load_timer = QtCore.QTimer(self)
+        self._json_load_timer.setSingleShot(True)
+        self._json_load_timer.timeout.connect(self._continue_json_load)
+
+        # Edits are recorded as patch operations, except for those made by undo and redo themselves
+        self._journal = EditJournal()
+        self._is_applying_edit = False
+        self._update_edit_actions()
+
+        # Edits are also journalled to disk for crash recovery, unless recovery_directory is None
+        self._recovery_directory = recovery_directory
+        self._recovery = None
+        self._document_path = None
+        self._is_modified = False
+
+        # Timings are only shown when profiling is enabled
+        self.diagnostics_panel = DiagnosticsPanel(self) if profiler.enabled else None
+
+        vbox = QtWidgets.QVBoxLayout()
+        vbox.addWidget(self.menu)
+        vbox.addWidget(self._validation_label)
+        vbox.addWidget(self.content_region)
+        vbox.setContentsMargins(0, 0, 0, 0)
+
+        hbox = QtWidgets.QHBoxLayout()
+        hbox.setContentsMargins(0, 0, 0, 0)
+        hbox.addLayout(vbox)
+        if self.diagnostics_panel is not None:
+            hbox.addWidget(self.diagnostics_panel)
+
+        self.setLayout(hbox)
+
+    @property
+    def format_checker(self) -> 'jsonschema.FormatChecker':
+        return self._validator_cache.format_checker
+
+    @property
+    def validator_cache(self) -> ValidatorCache:
+        return self._validator_cache
+
+    @property
+    def journal(self) -> EditJournal:
+        return self._journal
+
+    @property
+    def is_modified(self) -> bool:
+        """Whether the document has been edited since it was loaded or saved"""
+        return self._is_modified
+
+    def load_schema(self, file_path):
+        """
+            Load a schema and create the root element.
+        """
+        self._finish_json_load()
+
+        with profiler.span("load_schema", str(file_path)):
+            schema, schema_uri, registry = load_schema_file(file_path, self._schema_cache, self._http_loader)
+
+            schema_title = schema.get("title", "<root>")
+            self.setWindowTitle("{} - PyQt JSON Schema".format(schema_title))
+            self.schema_widget = create_widget(schema_title, schema, schema_uri, registry)
+
+        self.schema_widget.valueChanged.connect(self._handle_value_changed)
+        self.schema_widget.edited.connect(self._handle_edited)
+        self.content_region.setWidget(self.schema_widget)
+        self.content_region.setWidgetResizable(True)
+        self.schema = schema
+        self.schema_uri = schema_uri
+        self.registry = registry
+
+        # Validators compiled for the previous schema are no longer useful
+        self._validator_cache.clear()
+        self._validation_issues = None
+        self._changed_paths.clear()
+        self._dispatched_paths.clear()
+        self._invalidate_validation()
+        self._refresh_diagnostics()
+
+        self._journal.clear()
+        self._update_edit_actions()
+
+        self._document_path = None
+        self._is_modified = False
+        self._start_recovery(file_path)
+
+    def load_json(self, json_file):
+        """
+            Load a JSON document into the form.
+
+            The document is decoded incrementally, and loaded in time slices between event loop iterations,
+            with a cancellable progress dialog. Values loaded before cancellation or an error are kept, as an unsaved
+            document.
+        """
+        self._finish_json_load()
+
+        f = open(json_file, 'rb')
+        reader = JSONStreamReader(f)
+
+        progress = QtWidgets.QProgressDialog("Loading {}".format(Path(json_file).name), "Cancel", 0, 1000, self)
+        progress.setWindowModality(QtCore.Qt.WindowModal)
+        progress.setMinimumDuration(500)
+        progress.canceled.connect(self._finish_json_load)
+
+        # Changes are reported once loading finishes
+        widget = self.schema_widget
+        was_blocked = widget.blockSignals(True)
+        widget.setUpdatesEnabled(False)
+
+        self._json_load = JSONLoad(f, reader, widget.iter_load_json_object(reader), progress,
+                                   os.fstat(f.fileno()).st_size, was_blocked)
+        self._json_load_timer.start()
+
+    def _continue_json_load(self):
+        load = self._json_load
+        if load is None:
+            return
+
+        deadline = perf_counter() + self.LOAD_TIME_SLICE
+
+        try:
+            for _ in load.steps:
+                if perf_counter() > deadline:
+                    break
+
+            else:
+                load.reader.check_end()
+                self._finish_json_load(completed=True)
+                return
+
+        # Values of the wrong type for their widgets are also reported, e.g. a string for an integer
+        except Exception as err:
+            self._finish_json_load()
+            QtWidgets.QMessageBox.critical(self, "Open File", "Failed to load {}:\n{}".format(load.file.name, err))
+            return
+
+        except BaseException:
+            self._finish_json_load()
+            raise
+
+        load.progress.setValue(int(1000 * load.reader.position / max(load.size, 1)))
+        self._json_load_timer.start()
+
+    def _finish_json_load(self, completed: bool = False):
+        """Stop loading the current JSON document, if any, keeping the values loaded so far.
+
+        A document which is not completely loaded is unnamed and modified, so that saving it cannot overwrite the
+        file with partial data.
+
+        :param completed: whether the whole document was loaded
+        """
+        load = self._json_load
+        if load is None:
+            return
+
+        self._json_load = None
+        self._json_load_timer.stop()
+
+        widget = self.schema_widget
+
+        try:
+            load.steps.close()
+
+        finally:
+            load.file.close()
+            load.progress.reset()
+            load.progress.deleteLater()
+
+            widget.setUpdatesEnabled(True)
+            widget.blockSignals(load.was_blocked)
+
+            # Edits made before loading cannot be undone within the loaded document
+            self._journal.clear()
+            self._update_edit_actions()
+
+            self._document_path = load.file.name if completed else None
+            self._is_modified = not completed
+
+        widget.valueChanged.emit(widget)
+        self._snapshot_recovery()
+
+    def undo(self):
+        """Undo the last edit, if any"""
+        operation = self._journal.undo()
+        if operation is not None:
+            self._apply_edit(operation)
+
+    def redo(self):
+        """Redo the last undone edit, if any"""
+        operation = self._journal.redo()
+        if operation is not None:
+            self._apply_edit(operation)
+
+    def _apply_edit(self, operation: PatchOperation):
+        self._is_applying_edit = True
+        try:
+            self.schema_widget.apply_patch_operation(operation.op, operation.path, operation.value)
+
+        # The form no longer matches the journal, e.g. if the array was changed by loading
+        except LookupError:
+            self._journal.clear()
+
+        else:
+            self._record_recovery(operation)
+
+        finally:
+            self._is_applying_edit = False
+
+        self._update_edit_actions()
+
+    def _handle_edited(self, operation: PatchOperation):
+        if self._is_applying_edit:
+            return
+
+        self._journal.record(operation)
+        self._record_recovery(operation)
+        self._update_edit_actions()
+
+    def _start_recovery(self, schema_path):
+        """Offer to restore the session left by an editor which did not close cleanly, then start a new session
+
+        :param schema_path: path of root schema file
+        """
+        if self._recovery_directory is None:
+            return
+
+        # Changes to the previous document were saved or discarded before loading this schema
+        if self._recovery is not None:
+            self._recovery.close(discard=True)
+            self._recovery = None
+
+        directory = get_recovery_directory(schema_path, self._recovery_directory)
+
+        # The session belongs to another running editor, which is left to journal it
+        if not lock_recovery_session(directory):
+            logger.warning("Recovery session for %s is in use by another editor, so edits will not be journalled",
+                           schema_path)
+            return
+
+        session = load_recovery_session(directory)
+
+        if session is not None and self._has_unsaved_changes(session):
+            document_name = session.document_path or "an unsaved document"
+            answer = QtWidgets.QMessageBox.question(self, "Recover", "Restore unsaved changes to {} from a previous "
+                                                                     "session?".format(document_name))
+            if answer == QtWidgets.QMessageBox.Yes:
+                self._restore_session(session)
+
+        self._recovery = RecoveryJournal(directory, schema_path, self.schema_widget.dump_json_object(),
+                                         self._document_path, self._is_modified)
+
+    def _has_unsaved_changes(self, session: RecoverySession) -> bool:
+        if session.operations:
+            return True
+
+        if not session.is_modified:
+            return False
+
+        # An unnamed document is unchanged if it matches the new document
+        return session.document_path is not None or session.snapshot != self.schema_widget.dump_json_object()
+
+    def _restore_session(self, session: RecoverySession):
+        # Keep the edits replayed so far, if the journal does not match the snapshot
+        document, _ = replay_recovery_session(session)
+
+        widget = self.schema_widget
+        was_blocked = widget.blockSignals(True)
+        try:
+            widget.load_json_object(document)
+        finally:
+            widget.blockSignals(was_blocked)
+
+        widget.valueChanged.emit(widget)
+
+        self._document_path = session.document_path
+        self._is_modified = True
+
+    def _record_recovery(self, operation: PatchOperation):
+        self._is_modified = True
+
+        if self._recovery is None:
+            return
+
+        self._recovery.append(operation)
+        if self._recovery.needs_snapshot:
+            self._snapshot_recovery()
+
+    def _snapshot_recovery(self):
+        # Dumped values are cached and not modified, so they can be encoded by the writer thread
+        if self._recovery is not None:
+            self._recovery.snapshot(self.schema_widget.dump_json_object(), self._document_path, self._is_modified)
+
+    def _update_edit_actions(self):
+        self._action_undo.setEnabled(self._journal.can_undo)
+        self._action_redo.setEnabled(self._journal.can_redo)
+
+    def _handle_value_changed(self, source):
+        # Paths are recorded when values change, as a widget may later hold another value (e.g. the item editor of a
+        # JSONVirtualArrayWidget is rebound to the selected item). None marks a change which cannot be located
+        try:
+            self._changed_paths.add(source.json_path)
+        except (LookupError, RuntimeError):
+            self._changed_paths.add(None)
+
+        self._invalidate_validation()
+
+    def _invalidate_validation(self):
+        """Mark the current validation result as stale, and (re)start the debounce timer"""
+        if not self._validation_dirty:
+            self._validation_dirty = True
+            self._validation_label.setText("Validating...")
+            self._validation_label.setStyleSheet("QLabel { color: gray; }")
+
+        self._validation_timer.start()
+
+    def _do_validation(self):
+        if not self._validation_dirty:
+            return
+
+        self._validation_dirty = False
+
+        # Any run still queued or in progress is now stale, so its changes are validated by this run instead
+        if self._validation_task is not None:
+            self._validation_task.cancel()
+            self._changed_paths |= self._dispatched_paths
+
+        self._dispatched_paths, self._changed_paths = self._changed_paths, set()
+        self._validation_generation += 1
+
+        with profiler.span("do_validation"):
+            validator = self._validator_cache.get_validator(self.schema, self.schema_uri, self.registry.resources,
+                                                            self.registry.get_scheme_handlers())
+            task = ValidationTask(self._validation_generation, validator, self._create_validation_targets())
+        task.signals.finished.connect(self._handle_validation_finished)
+
+        self._validation_task = task
+        self._validation_pool.start(task)
+
+    def _create_validation_targets(self) -> list:
+        document = self.schema_widget.dump_json_object()
+        if (not self._incremental_validation or self._validation_issues is None or
+                None in self._dispatched_paths):
+            return [ValidationTarget((), self.schema, None, document)]
+
+        root_node = self.schema_widget.node
+        targets = []
+
+        try:
+            paths = {self._get_validation_root_path(p) for p in self._dispatched_paths}
+
+            # Validate only the outermost of nested subtrees
+            for path in sorted(paths, key=len):
+                if any(path[:len(t.path)] == t.path for t in targets):
+                    continue
+
+                node = root_node.get_descendant_node(path)
+                targets.append(ValidationTarget(path, node.schema, node.ctx.scope_uri, get_json_value(document, path)))
+
+        # Changed value has since been removed from the document
+        except LookupError:
+            return [ValidationTarget((), self.schema, None, document)]
+
+        return targets
+
+    def _get_validation_root_path(self, path: tuple) -> tuple:
+        """Return path of the outermost value whose schema must be validated when the value at path changes
+
+        :param path: path of changed value
+        """
+        node = self.schema_widget.node
+        for i, key in enumerate(path):
+            if not CONTEXT_KEYWORDS.isdisjoint(node.schema):
+                return path[:i]
+            node = node.get_descendant_node((key,))
+
+        return path
+
+    def _handle_validation_finished(self, generation: int, results: tuple):
+        # Drop results made stale by newer edits
+        if generation != self._validation_generation or self._validation_dirty:
+            return
+
+        self._validation_task = None
+        self._dispatched_paths.clear()
+
+        if self._validation_issues is None:
+            self._validation_issues = {}
+
+        for path, path_issues in results:
+            merge_validation_issues(self._validation_issues, path, path_issues)
+
+        issues = [i for path_issues in self._validation_issues.values() for i in path_issues]
+        label = self._validation_label
+
+        if issues:
+            issue = issues[0]
+            error_string = ("{} errors" if len(issues) > 1 else "{} error").format(len(issues))
+            label.setText("{}.\nFirst error in {}:\n{}".format(error_string, format_json_pointer(issue.path),
+                                                               issue.message))
+            label.setStyleSheet("QLabel { color: red; }")
+
+        else:
+            label.setText("Object validates")
+            label.setStyleSheet("QLabel { color: green; }")
+
+        label.setToolTip(repr(self._validator_cache))
+        self._refresh_diagnostics()
+
+    def _refresh_diagnostics(self):
+        if self.diagnostics_panel is not None:
+            self.diagnostics_panel.refresh()
+
+    def _handle_open_json(self):
+        if not self.confirm_discard_changes():
+            return
+
+        # Open JSON File
+        json_file, _ = QtWidgets.QFileDialog.getOpenFileName(self, 'Open Schema', filter="JSON File (*.json)")
+        if json_file:
+            self.load_json(json_file)
+
+    def _handle_open_schema(self):
+        if not self.confirm_discard_changes():
+            return
+
+        # Open JSON Schema
+        schema, _ = QtWidgets.QFileDialog.getOpenFileName(self, 'Open Schema', filter="JSON Schema (*.schema *.json)")
+        if schema:
+            self.load_schema(schema)
+
+    def save_json(self, json_file):
+        """
+            Save the form to a JSON document.
+
+            The document is encoded from the widget tree in chunks, and replaces any existing file atomically.
+        """
+        write_json(json_file, self.schema_widget.dump_json_source(), self.save_indent, self.save_sort_keys)
+
+        self._document_path = json_file
+        self._is_modified = False
+        self._snapshot_recovery()
+
+    def _handle_save(self):
+        # Save JSON output
+        outfile, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Save JSON', filter="JSON (*.json)")
+        if not outfile:
+            return
+
+        try:
+            self.save_json(outfile)
+        except OSError as err:
+            QtWidgets.QMessageBox.critical(self, "Save", "Failed to save {}:\n{}".format(outfile, err))
+
+    def confirm_discard_changes(self) -> bool:
+        """Offer to save unsaved changes, returning False if the user cancels"""
+        if self.schema_widget is None or not self._is_modified:
+            return True
+
+        buttons = QtWidgets.QMessageBox.Save | QtWidgets.QMessageBox.Discard | QtWidgets.QMessageBox.Cancel
+        answer = QtWidgets.QMessageBox.question(self, "Unsaved Changes", "Save changes to the document?", buttons)
+
+        if answer == QtWidgets.QMessageBox.Save:
+            self._handle_save()
+            return not self._is_modified
+
+        return answer == QtWidgets.QMessageBox.Discard
+
+    def _handle_quit(self):
+        self.close()
+
+    def closeEvent(self, event):
+        if not self.confirm_discard_changes():
+            event.ignore()
+            return
+
+        self._finish_json_load()
+
+        # A validation run still in progress would otherwise emit its result once the window is deleted
+        self._validation_timer.stop()
+        if self._validation_task is not None:
+            self._validation_task.cancel()
+            self._validation_task = None
+        self._validation_pool.waitForDone()
+
+        # The session is only kept for recovery if the editor does not close cleanly
+        if self._recovery is not None:
+            self._recovery.close(discard=True)
+            self._recovery = None
+
+        super().closeEvent(event)
@@ -2,6 +2,10 @@ class UnsupportedSchemaError(Exception):
     """Error raised when schema cannot be handled"""
 
 
+class ResourceUnavailableError(Exception):
+    """Error raised when a resource cannot be loaded"""
+
+
 class ValidationError(Exception):
     """Error raised when validation fails"""
 
@@ -0,0 +1,143 @@
+"""
+Opt-in timing instrumentation of hot paths.
+
+Instrumented code records spans with the default `profiler`, keyed by phase name and schema location (or URI).
+Profiling is disabled unless enabled with `profiler.enable()`, or the QTJSONSCHEMA_PROFILE environment variable.
+"""
+
+import json
+import os
+import threading
+from collections import deque, namedtuple
+from time import perf_counter
+
+Span = namedtuple("Span", "name key start duration thread_id")
+SpanStats = namedtuple("SpanStats", "name key count total maximum")
+
+
+class _NullSpan:
+    """Context manager which records nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+class _RecordingSpan:
+
+    __slots__ = 'profiler', 'name', 'key', 'start'
+
+    def __init__(self, profiler: 'Profiler', name: str, key: str):
+        self.profiler = profiler
+        self.name = name
+        self.key = key
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.profiler.record(self.name, self.key, self.start, perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """Thread-safe recorder of timed spans, with per-(name, key) statistics.
+
+    Statistics cover every span recorded, whilst only the most recent spans are kept for trace export.
+    Times are inclusive of nested spans.
+
+    :param max_spans: maximum number of spans kept for trace export
+    """
+
+    def __init__(self, max_spans: int = 100000):
+        self.enabled = False
+
+        self._spans = deque(maxlen=max_spans)
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._origin = perf_counter()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def span(self, name: str, key: str = ''):
+        """Return context manager recording the time spent within it, if profiling is enabled
+
+        :param name: phase name
+        :param key: schema location, URI or other key within the phase
+        """
+        if not self.enabled:
+            return _null_span
+        return _RecordingSpan(self, name, key)
+
+    def record(self, name: str, key: str, start: float, duration: float):
+        """Record a span
+
+        :param name: phase name
+        :param key: key within the phase
+        :param start: start time, from `time.perf_counter`
+        :param duration: duration (seconds)
+        """
+        with self._lock:
+            self._spans.append(Span(name, key, start, duration, threading.get_ident()))
+
+            try:
+                stats = self._stats[name, key]
+            except KeyError:
+                self._stats[name, key] = [1, duration, duration]
+            else:
+                stats[0] += 1
+                stats[1] += duration
+                if duration > stats[2]:
+                    stats[2] = duration
+
+    def summary(self, limit: int = None) -> list:
+        """Return list of SpanStats, in descending order of total time
+
+        :param limit: maximum number of entries
+        """
+        with self._lock:
+            stats = [SpanStats(name, key, *values) for (name, key), values in self._stats.items()]
+
+        stats.sort(key=lambda s: s.total, reverse=True)
+        return stats[:limit]
+
+    def clear(self):
+        """Remove all recorded spans and statistics"""
+        with self._lock:
+            self._spans.clear()
+            self._stats.clear()
+
+    def get_chrome_trace(self) -> dict:
+        """Return recorded spans in the Chrome trace event format, for chrome://tracing or Perfetto"""
+        with self._lock:
+            spans = list(self._spans)
+
+        pid = os.getpid()
+        events = [{"name": s.name, "cat": "qtjsonschema", "ph": "X", "pid": pid, "tid": s.thread_id,
+                   "ts": (s.start - self._origin) * 1e6, "dur": s.duration * 1e6, "args": {"key": s.key}}
+                  for s in spans]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path):
+        """Write recorded spans to a Chrome trace JSON file
+
+        :param path: file path
+        """
+        with open(path, 'w') as f:
+            json.dump(self.get_chrome_trace(), f)
+
+
+profiler = Profiler()
+
+if os.environ.get('QTJSONSCHEMA_PROFILE'):
+    profiler.enable()
@@ -0,0 +1,156 @@
+"""
+Undo and redo of edits, recorded as JSON Patch operations.
+
+Widgets report each edit as a single operation holding its path and the old and new values, so that the journal
+grows with the number of edits rather than with the size of the document.
+"""
+
+from collections import deque, namedtuple
+from time import monotonic
+
+from .compiler import escape_json_pointer
+
+
+class PatchOperation(namedtuple("PatchOperation", "op path value old_value")):
+    """JSON Patch 'add', 'remove' or 'replace' operation, with the value it replaces or removes.
+
+    :ivar op: operation name
+    :ivar path: sequence of object keys and array indices from the document root
+    :ivar value: added or replacing value, or None for 'remove'
+    :ivar old_value: removed or replaced value, or None for 'add'
+    """
+
+    __slots__ = ()
+
+    INVERSE_OPS = {'add': 'remove', 'remove': 'add', 'replace': 'replace'}
+
+    def invert(self) -> 'PatchOperation':
+        """Return the operation which undoes this operation"""
+        return PatchOperation(self.INVERSE_OPS[self.op], self.path, self.old_value, self.value)
+
+    def to_json_patch(self) -> dict:
+        """Return the operation as a JSON Patch (RFC 6902) operation object"""
+        operation = {'op': self.op, 'path': ''.join('/' + escape_json_pointer(str(k)) for k in self.path)}
+        if self.op != 'remove':
+            operation['value'] = self.value
+        return operation
+
+
+def apply_patch_operation(document, op: str, path: tuple, value=None):
+    """Return a copy of JSON document with a patch operation applied.
+
+    Only the containers along the path are copied, and unchanged values are shared with the document.
+
+    :param document: JSON object
+    :param op: 'add', 'remove' or 'replace'
+    :param path: sequence of object keys and array indices
+    :param value: added or replacing value
+    """
+    if not path:
+        if op != 'replace':
+            raise ValueError("Cannot {} the document root".format(op))
+        return value
+
+    key = path[0]
+    result = list(document) if isinstance(document, list) else dict(document)
+
+    if len(path) > 1:
+        result[key] = apply_patch_operation(document[key], op, path[1:], value)
+    elif op == 'remove':
+        del result[key]
+    elif op == 'add' and isinstance(result, list):
+        result.insert(key, value)
+    else:
+        result[key] = value
+
+    return result
+
+
+class EditJournal:
+    """Bounded history of edits for undo and redo.
+
+    Consecutive replacements of the same value within the coalescing interval (e.g. typing into a field) are merged
+    into a single edit.
+
+    :param max_edits: maximum number of edits which can be undone
+    :param coalesce_interval: maximum time between merged replacements (seconds)
+    """
+
+    def __init__(self, max_edits: int = 1000, coalesce_interval: float = 1.0):
+        self.coalesce_interval = coalesce_interval
+
+        self._undo_stack = deque(maxlen=max_edits)
+        self._redo_stack = []
+        self._last_record_time = None
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo_stack)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo_stack)
+
+    def record(self, operation: PatchOperation, time: float = None):
+        """Record an edit, discarding any edits which were undone
+
+        :param operation: PatchOperation object
+        :param time: time of the edit, from `time.monotonic`
+        """
+        if time is None:
+            time = monotonic()
+
+        self._redo_stack.clear()
+
+        if self._can_coalesce(operation, time):
+            previous = self._undo_stack.pop()
+            operation = operation._replace(old_value=previous.old_value)
+
+        # Edits which restore the original value are dropped
+        if operation.op == 'replace' and operation.value == operation.old_value:
+            self._last_record_time = None
+            return
+
+        self._undo_stack.append(operation)
+        self._last_record_time = time
+
+    def undo(self) -> PatchOperation:
+        """Return the operation which undoes the last edit, or None if there is none"""
+        if not self._undo_stack:
+            return None
+
+        operation = self._undo_stack.pop()
+        self._redo_stack.append(operation)
+        self._last_record_time = None
+        return operation.invert()
+
+    def redo(self) -> PatchOperation:
+        """Return the operation which redoes the last undone edit, or None if there is none"""
+        if not self._redo_stack:
+            return None
+
+        operation = self._redo_stack.pop()
+        self._undo_stack.append(operation)
+        self._last_record_time = None
+        return operation
+
+    def clear(self):
+        """Remove all edits"""
+        self._undo_stack.clear()
+        self._redo_stack.clear()
+        self._last_record_time = None
+
+    def get_json_patch(self) -> list:
+        """Return the edits which can be undone as a JSON Patch document, in order"""
+        return [o.to_json_patch() for o in self._undo_stack]
+
+    def _can_coalesce(self, operation: PatchOperation, time: float) -> bool:
+        if self._last_record_time is None or not self._undo_stack:
+            return False
+
+        previous = self._undo_stack[-1]
+        return (operation.op == previous.op == 'replace' and operation.path == previous.path and
+                time - self._last_record_time <= self.coalesce_interval)
+
+    def __len__(self):
+        return len(self._undo_stack)
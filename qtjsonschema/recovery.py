@@ -0,0 +1,359 @@
+"""
+Crash recovery journal of edits to a document.
+
+A session directory holds a snapshot of the document and an append-only journal of the edits made since the snapshot.
+Edits are encoded and written in batches by a background thread, and the journal is periodically compacted by writing
+a new snapshot, so that neither an edit nor a compaction blocks the caller on file access.
+Each session directory is locked by the process editing it, so that other running editors leave it alone.
+"""
+
+import collections
+import hashlib
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+from pathlib import Path
+
+from .journal import PatchOperation
+from .streaming import write_json
+from .tools import get_cache_directory
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FORMAT_VERSION = 1
+
+# Lock file descriptors of the session directories locked by this process
+_locked_directories = {}
+
+RecoverySession = collections.namedtuple("RecoverySession", "schema_path document_path snapshot is_modified operations")
+
+
+def get_recovery_directory(schema_path, directory: Path = None) -> Path:
+    """Return the session directory for editing documents of a schema file
+
+    :param schema_path: path of root schema file
+    :param directory: parent directory of sessions (default from `get_cache_directory()` if omitted)
+    """
+    if directory is None:
+        directory = get_cache_directory() / "recovery"
+
+    key = hashlib.sha256(str(Path(schema_path).absolute()).encode('utf-8')).hexdigest()
+    return Path(directory) / key
+
+
+def _get_snapshot_path(directory: Path, generation: int) -> Path:
+    return directory / "snapshot-{}.json".format(generation)
+
+
+def _try_lock_file(fd: int) -> bool:
+    """Take an exclusive lock on an open file without blocking, returning False if it is held by another open file.
+
+    The lock is released when the file is closed, including by the exit of the process.
+
+    :param fd: file descriptor
+    """
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def lock_recovery_session(directory: Path) -> bool:
+    """Lock a session directory, returning False if it is locked by another running process, or already locked by this
+    process.
+
+    The lock is an advisory lock on a lock file, so a lock left by a process which is no longer running is released.
+
+    :param directory: session directory
+    """
+    directory = Path(directory).absolute()
+    if directory in _locked_directories:
+        return False
+
+    lock_path = directory / "lock"
+
+    while True:
+        directory.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(lock_path), os.O_RDWR | os.O_CREAT, 0o666)
+
+        if not _try_lock_file(fd):
+            os.close(fd)
+            return False
+
+        # The session may have been discarded, removing the lock file, between opening and locking it
+        try:
+            lock_stat = os.stat(str(lock_path))
+        except FileNotFoundError:
+            lock_stat = None
+
+        file_stat = os.fstat(fd)
+        if lock_stat is not None and (lock_stat.st_dev, lock_stat.st_ino) == (file_stat.st_dev, file_stat.st_ino):
+            break
+
+        os.close(fd)
+
+    # The owner is recorded for diagnostics only
+    os.ftruncate(fd, 0)
+    os.write(fd, str(os.getpid()).encode('ascii'))
+
+    _locked_directories[directory] = fd
+    return True
+
+
+def unlock_recovery_session(directory: Path):
+    """Release the lock on a session directory, if it is held by this process
+
+    :param directory: session directory
+    """
+    # The lock file is left in place, so that a process which has already opened it locks the same file as later ones
+    fd = _locked_directories.pop(Path(directory).absolute(), None)
+    if fd is not None:
+        os.close(fd)
+
+
+def load_recovery_session(directory: Path) -> RecoverySession:
+    """Return the RecoverySession left in a session directory, or None if there is none.
+
+    A truncated final record, written whilst crashing, is ignored.
+
+    :param directory: session directory
+    """
+    journal_path = Path(directory) / "journal.jsonl"
+
+    try:
+        with open(journal_path, encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('version') != JOURNAL_FORMAT_VERSION:
+                return None
+
+            with open(_get_snapshot_path(directory, header['snapshot']), encoding='utf-8') as snapshot_file:
+                snapshot = json.load(snapshot_file, object_pairs_hook=collections.OrderedDict)
+
+            operations = []
+            for line in f:
+                try:
+                    record = json.loads(line, object_pairs_hook=collections.OrderedDict)
+                except ValueError:
+                    break
+
+                operations.append(PatchOperation(record['op'], tuple(record['path']), record.get('value'), None))
+
+    # Treat unreadable sessions as missing
+    except (OSError, ValueError, LookupError, AttributeError):
+        return None
+
+    return RecoverySession(header.get('schema'), header.get('document'), snapshot, header.get('modified', True),
+                           operations)
+
+
+def replay_recovery_session(session: RecoverySession) -> tuple:
+    """Return (document, is_complete) for the document produced by applying the journal to the snapshot.
+
+    The snapshot is modified in-place. If an edit cannot be applied, the edits before it are kept and is_complete is
+    False.
+
+    :param session: RecoverySession object
+    """
+    document = session.snapshot
+
+    for operation in session.operations:
+        path = operation.path
+
+        try:
+            if not path:
+                document = operation.value
+                continue
+
+            parent = document
+            for key in path[:-1]:
+                parent = parent[key]
+
+            key = path[-1]
+            if operation.op == 'remove':
+                del parent[key]
+            elif operation.op == 'add' and isinstance(parent, list):
+                if not 0 <= key <= len(parent):
+                    raise IndexError(key)
+                parent.insert(key, operation.value)
+            else:
+                if operation.op == 'replace' and isinstance(parent, dict) and key not in parent:
+                    raise KeyError(key)
+                parent[key] = operation.value
+
+        except (LookupError, TypeError):
+            logger.warning("Failed to replay recovery journal for %s", session.schema_path, exc_info=True)
+            return document, False
+
+    return document, True
+
+
+def discard_recovery_session(directory: Path):
+    """Remove a session directory, if it exists
+
+    :param directory: session directory
+    """
+    # The lock is held until the directory is removed, so that no other process takes over the session meanwhile
+    shutil.rmtree(str(directory), ignore_errors=True)
+    unlock_recovery_session(directory)
+
+
+class RecoveryJournal:
+    """Append-only journal of the edits to a document, written by a background thread.
+
+    The journal starts from a snapshot of the document, replacing any session in the directory. After
+    `snapshot_interval` edits, `needs_snapshot` is set, and the owner should call `snapshot` with the current document,
+    which replaces the journal.
+    Documents are encoded on the writer thread, so must not be modified once they are passed to the journal.
+    The session directory should be locked with `lock_recovery_session` beforehand, and is unlocked when the journal is
+    closed.
+
+    :param directory: session directory
+    :param schema_path: path of root schema file
+    :param document: JSON value of the document
+    :param document_path: path of the file the document was loaded from, or None
+    :param is_modified: whether the document has changes which are not saved to document_path
+    :param snapshot_interval: number of edits between snapshots
+    """
+
+    def __init__(self, directory: Path, schema_path, document, document_path=None, is_modified: bool = False,
+                 snapshot_interval: int = 1000):
+        self.directory = Path(directory)
+        self.schema_path = str(schema_path)
+        self.snapshot_interval = snapshot_interval
+
+        self._operation_count = 0
+        self._file = None
+
+        # Snapshots of an existing session are not overwritten until it is replaced
+        self._generation = max((int(p.stem.rpartition('-')[2]) for p in self.directory.glob("snapshot-*.json")
+                                if p.stem.rpartition('-')[2].isdigit()), default=0)
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="RecoveryJournal", daemon=True)
+        self._thread.start()
+
+        self.snapshot(document, document_path, is_modified)
+
+    @property
+    def needs_snapshot(self) -> bool:
+        return self._operation_count >= self.snapshot_interval
+
+    def append(self, operation: PatchOperation):
+        """Add an edit to the journal
+
+        :param operation: PatchOperation object
+        """
+        self._queue.put(('append', operation))
+        self._operation_count += 1
+
+    def snapshot(self, document, document_path=None, is_modified: bool = False):
+        """Replace the journal with a snapshot of the document
+
+        :param document: JSON value of the document
+        :param document_path: path of the file the document was loaded from or saved to, or None
+        :param is_modified: whether the document has changes which are not saved to document_path
+        """
+        self._generation += 1
+        self._queue.put(('snapshot', document, document_path, is_modified, self._generation))
+        self._operation_count = 0
+
+    def flush(self):
+        """Block until all queued records are written"""
+        self._queue.join()
+
+    def close(self, discard: bool = False):
+        """Write any queued records and stop the writer thread
+
+        :param discard: whether to remove the session, e.g. when the editor is closed cleanly
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+        if discard:
+            discard_recovery_session(self.directory)
+        else:
+            unlock_recovery_session(self.directory)
+
+    def _run(self):
+        while True:
+            records = [self._queue.get()]
+
+            # Write all queued records as a batch
+            while records[-1] is not None:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._write_records(records)
+            except Exception:
+                logger.exception("Failed to write recovery journal %s", self.directory)
+
+            for _ in records:
+                self._queue.task_done()
+
+            if records[-1] is None:
+                break
+
+        if self._file is not None:
+            self._file.close()
+
+    def _write_records(self, records: list):
+        lines = []
+
+        for record in records:
+            if record is None:
+                break
+
+            if record[0] == 'snapshot':
+                # Edits before the snapshot are superseded by it
+                lines.clear()
+                self._write_snapshot(*record[1:])
+                continue
+
+            operation = record[1]
+            lines.append(json.dumps({'op': operation.op, 'path': list(operation.path), 'value': operation.value}))
+
+        if lines and self._file is not None:
+            self._file.write('\n'.join(lines) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _write_snapshot(self, document, document_path, is_modified: bool, generation: int):
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # Large documents are encoded in batches, between which the GIL is released to the UI thread
+        snapshot_path = _get_snapshot_path(self.directory, generation)
+        write_json(snapshot_path, document)
+
+        # The new journal only refers to the new snapshot once it is complete
+        journal_path = self.directory / "journal.jsonl"
+        temporary_path = journal_path.with_suffix('.tmp')
+
+        header = {'version': JOURNAL_FORMAT_VERSION, 'schema': self.schema_path,
+                  'document': None if document_path is None else str(document_path), 'modified': is_modified,
+                  'snapshot': generation}
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(header) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+        if self._file is not None:
+            self._file.close()
+
+        os.replace(str(temporary_path), str(journal_path))
+        self._file = open(journal_path, 'a', encoding='utf-8')
+
+        for path in self.directory.glob("snapshot-*.json"):
+            if path != snapshot_path:
+                path.unlink()
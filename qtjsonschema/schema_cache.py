@@ -0,0 +1,215 @@
+"""
+Persistent on-disk cache of checked schemas and the documents that they reference.
+"""
+
+import collections
+import json
+import logging
+import os
+from collections import namedtuple
+from hashlib import sha256
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+
+from uritools import urisplit
+
+from .tools import HTTPResourceLoader, create_default_uri_loader_registry, get_cache_directory, prefetch_references
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT_VERSION = 3
+
+CachedSchema = namedtuple("CachedSchema", "schema resources")
+LoadedSchema = namedtuple("LoadedSchema", "schema uri registry")
+FileFingerprint = namedtuple("FileFingerprint", "path mtime_ns size digest")
+
+
+def fingerprint_file(path: Path, content: bytes = None) -> FileFingerprint:
+    """Return FileFingerprint for a file
+
+    :param path: file path
+    :param content: file content, if already read
+    """
+    stat = path.stat()
+    if content is None:
+        content = path.read_bytes()
+    return FileFingerprint(str(path), stat.st_mtime_ns, stat.st_size, sha256(content).hexdigest())
+
+
+def is_fingerprint_current(fingerprint: FileFingerprint) -> bool:
+    """Return True if the file has not changed since it was fingerprinted.
+
+    Files are only hashed again if their modification time or size have changed.
+
+    :param fingerprint: FileFingerprint object
+    """
+    path = Path(fingerprint.path)
+    try:
+        stat = path.stat()
+    except OSError:
+        return False
+
+    if stat.st_mtime_ns == fingerprint.mtime_ns and stat.st_size == fingerprint.size:
+        return True
+
+    return sha256(path.read_bytes()).hexdigest() == fingerprint.digest
+
+
+def digest_resource(resource) -> str:
+    """Return the content hash of a loaded JSON document
+
+    :param resource: JSON object
+    """
+    return sha256(json.dumps(resource).encode('utf-8')).hexdigest()
+
+
+def _get_file_path(uri: str) -> Path:
+    result = urisplit(uri)
+    if result.scheme != 'file' or result.authority:
+        return None
+    return Path(result.getpath())
+
+
+class SchemaCache:
+    """Cache of checked schemas, keyed by the content hash of the root schema file.
+
+    Each entry also holds the documents loaded to resolve the schema's references, with fingerprints of those which
+    are local files and content hashes of those which are remote, so that an entry is invalidated when the root schema
+    or any document it references changes. Remote documents are revalidated by the HTTP loader, which only downloads
+    those whose ETag / Last-Modified have changed if it has a cache directory.
+
+    :param directory: cache directory (default from `get_cache_directory()` if omitted)
+    """
+
+    def __init__(self, directory: Path = None):
+        if directory is None:
+            directory = get_cache_directory() / "schemas"
+
+        self.directory = Path(directory)
+
+    def load(self, schema_path: Path, content: bytes, http_loader: HTTPResourceLoader = None) -> CachedSchema:
+        """Return CachedSchema for the given schema file, or None if it is not cached or is stale
+
+        :param schema_path: path of root schema file
+        :param content: content of root schema file
+        :param http_loader: HTTPResourceLoader object used to revalidate remote documents (uncached loader if omitted)
+        """
+        entry_path = self._get_entry_path(content)
+
+        # Entries are plain JSON, so that reading a planted entry cannot execute code
+        try:
+            with open(entry_path, encoding='utf-8') as f:
+                entry = json.load(f, object_pairs_hook=collections.OrderedDict)
+
+            if entry['version'] != CACHE_FORMAT_VERSION:
+                return None
+
+            fingerprints = [FileFingerprint(*f) for f in entry['fingerprints']]
+            remote_digests = entry['remote_digests']
+            schema = entry['schema']
+            resources = entry['resources']
+        # Treat unreadable entries as missing
+        except Exception:
+            return None
+
+        if not all(is_fingerprint_current(f) for f in fingerprints):
+            return None
+
+        if remote_digests:
+            if http_loader is None:
+                http_loader = HTTPResourceLoader()
+
+            # Remote documents which cannot be revalidated are loaded again with the schema
+            for location, digest in remote_digests.items():
+                try:
+                    resource = http_loader.load_resource(location)
+                except Exception:
+                    logger.debug("Failed to revalidate %s", location, exc_info=True)
+                    return None
+
+                if digest_resource(resource) != digest:
+                    return None
+
+        return CachedSchema(schema, resources)
+
+    def store(self, schema_path: Path, content: bytes, schema: dict, resources: dict):
+        """Add schema and its referenced documents to the cache
+
+        :param schema_path: path of root schema file
+        :param content: content of root schema file
+        :param schema: dict-like JSON schema, which has been checked against the metaschema
+        :param resources: mapping from location URI to JSON object for every referenced document
+        """
+        # Caching is best-effort, so a cache which cannot be written does not prevent loading the schema
+        try:
+            fingerprints = [fingerprint_file(Path(schema_path), content)]
+            remote_digests = {}
+            for location, resource in resources.items():
+                if urisplit(location).scheme in ('http', 'https'):
+                    remote_digests[location] = digest_resource(resource)
+                    continue
+
+                path = _get_file_path(location)
+                if path is not None and path != Path(schema_path):
+                    fingerprints.append(fingerprint_file(path))
+
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+            # Write atomically, so that concurrent readers never see a partial entry
+            entry = {'version': CACHE_FORMAT_VERSION, 'fingerprints': fingerprints, 'remote_digests': remote_digests,
+                     'schema': schema, 'resources': resources}
+            with NamedTemporaryFile('w', encoding='utf-8', dir=str(self.directory), delete=False) as f:
+                json.dump(entry, f)
+            os.replace(f.name, str(self._get_entry_path(content)))
+
+        except OSError as err:
+            logger.warning("Failed to cache schema %s: %s", schema_path, err)
+
+    def clear(self):
+        """Remove all cache entries"""
+        # Entries of earlier versions were pickled
+        for pattern in ("*.json", "*.pickle"):
+            for path in self.directory.glob(pattern):
+                path.unlink()
+
+    def _get_entry_path(self, content: bytes) -> Path:
+        return self.directory / "{}.json".format(sha256(content).hexdigest())
+
+
+def load_schema_file(file_path, schema_cache: SchemaCache = None,
+                     http_loader: HTTPResourceLoader = None) -> LoadedSchema:
+    """Load and check a schema file, and create a registry holding the documents that it references
+
+    :param file_path: schema file path
+    :param schema_cache: SchemaCache object, or None to disable caching
+    :param http_loader: HTTPResourceLoader object (uncached loader if omitted)
+    """
+    schema_path = Path(file_path).absolute()
+    schema_uri = schema_path.as_uri()
+    content = schema_path.read_bytes()
+
+    cached = None
+    if schema_cache is not None:
+        cached = schema_cache.load(schema_path, content, http_loader)
+
+    # Cached schemas have already been checked, and their references loaded
+    if cached is not None:
+        schema = cached.schema
+        registry = create_default_uri_loader_registry(schema, schema_uri, http_loader)
+        for location, resource in cached.resources.items():
+            registry.add_resource(location, resource)
+
+        return LoadedSchema(schema, schema_uri, registry)
+
+    schema = json.loads(content.decode('utf-8'), object_pairs_hook=collections.OrderedDict)
+
+    from jsonschema import Draft4Validator
+    Draft4Validator.check_schema(schema)
+
+    registry = create_default_uri_loader_registry(schema, schema_uri, http_loader)
+    prefetch_references(registry, schema, schema_uri)
+
+    if schema_cache is not None:
+        schema_cache.store(schema_path, content, schema, registry.resources)
+
+    return LoadedSchema(schema, schema_uri, registry)
@@ -0,0 +1,469 @@
+"""
+Incremental reading and writing of JSON documents.
+"""
+
+import codecs
+import collections
+import json
+import math
+import os
+import re
+import shutil
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
+from tempfile import TMP_MAX
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+NUMBER_CHARS = '0123456789.eE+-'
+LEADING_SPACES = re.compile(r'^ +', re.MULTILINE)
+# Text which orjson may have written for a float which the json module writes differently
+ORJSON_FLOAT_CANDIDATES = re.compile(r'null|\d[eE]|0\.0000')
+
+# Number of values of an in-memory array or object encoded at a time
+BATCH_SIZE = 1024
+
+
+class JSONStreamReader:
+    """Pull reader for a JSON document, decoding it in chunks from a binary file.
+
+    Containers may be iterated item by item with `iter_object` and `iter_array`, or decoded in steps with `iter_value`,
+    whilst any other value is decoded whole with `read_value`. Only the unconsumed part of the current chunk, and the
+    value being decoded, are held in memory.
+
+    :param f: binary file object
+    :param chunk_size: number of bytes read at a time
+    :param object_pairs_hook: callable used to build decoded objects from (key, value) pairs
+    """
+
+    def __init__(self, f, chunk_size: int = 1 << 16, object_pairs_hook=collections.OrderedDict):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._object_pairs_hook = object_pairs_hook
+        self._json_decoder = json.JSONDecoder(object_pairs_hook=object_pairs_hook)
+
+        self._buffer = ''
+        self._index = 0
+        self._is_eof = False
+
+        self.position = 0
+
+    def _fill(self, size: int = None) -> bool:
+        """Append the next chunk of the file to the buffer, discarding consumed text. Return False at end of file
+
+        :param size: number of bytes to read (chunk size if omitted)
+        """
+        if self._is_eof:
+            return False
+
+        data = self._file.read(size or self._chunk_size)
+        self.position += len(data)
+        self._is_eof = not data
+
+        self._buffer = self._buffer[self._index:] + self._decoder.decode(data, final=self._is_eof)
+        self._index = 0
+        return True
+
+    def _error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self._buffer, self._index)
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it, or an empty string at the end of the
+        document"""
+        while True:
+            buffer = self._buffer
+            index = self._index = WHITESPACE.match(buffer, self._index).end()
+
+            if index < len(buffer):
+                return buffer[index]
+
+            if not self._fill():
+                return ''
+
+    def _expect(self, char: str):
+        if self.peek() != char:
+            raise self._error("Expecting {!r}".format(char))
+        self._index += 1
+
+    def read_value(self):
+        """Decode and return the next JSON value"""
+        self.peek()
+
+        size = self._chunk_size
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer, self._index)
+            except json.JSONDecodeError:
+                # The value may continue beyond the buffer. Read sizes grow so that long values are decoded in
+                # linear time
+                if not self._fill(size):
+                    raise
+                size *= 2
+                continue
+
+            # Numbers at the end of the buffer may be truncated, including within their fraction or exponent
+            # (leaving at most "e+" undecoded)
+            tail = self._buffer[end:end + 3]
+            if len(tail) < 3 and not tail.strip(NUMBER_CHARS) and self._fill(size):
+                size *= 2
+                continue
+
+            self._index = end
+            return value
+
+    def iter_value(self):
+        """Decode the next JSON value, yielding after each array item and object member so that large values are
+        decoded in steps. The value is returned by the generator"""
+        char = self.peek()
+
+        if char == '{':
+            pairs = []
+            for key in self.iter_object():
+                pairs.append((key, (yield from self.iter_value())))
+                yield
+            return self._object_pairs_hook(pairs)
+
+        if char == '[':
+            values = []
+            for _ in self.iter_array():
+                values.append((yield from self.iter_value()))
+                yield
+            return values
+
+        return self.read_value()
+
+    def skip_value(self):
+        """Consume the next JSON value"""
+        self.read_value()
+
+    def _iter_members(self, close: str):
+        if self.peek() == close:
+            self._index += 1
+            return
+
+        while True:
+            yield
+
+            char = self.peek()
+            self._index += 1
+
+            if char == close:
+                return
+            if char != ',':
+                self._index -= 1
+                raise self._error("Expecting ',' delimiter")
+
+    def iter_object(self):
+        """Consume the next JSON object, yielding each key. The caller must consume the corresponding value before
+        resuming iteration"""
+        self._expect('{')
+
+        for _ in self._iter_members('}'):
+            if self.peek() != '"':
+                raise self._error("Expecting property name enclosed in double quotes")
+            key = self.read_value()
+            self._expect(':')
+            yield key
+
+    def iter_array(self):
+        """Consume the next JSON array, yielding the index of each item. The caller must consume the item before
+        resuming iteration"""
+        self._expect('[')
+
+        for index, _ in enumerate(self._iter_members(']')):
+            yield index
+
+    def check_end(self):
+        """Raise JSONDecodeError if any data follows the document"""
+        if self.peek():
+            raise self._error("Extra data")
+
+
+def json_encoder(value, indent: int = None, sort_keys: bool = False) -> str:
+    """Encode JSON value with the json module.
+
+    Output is compact if indent is None, and non-ASCII characters are not escaped.
+
+    :param value: JSON value
+    :param indent: number of spaces per indentation level, or None
+    :param sort_keys: whether to sort object keys
+    """
+    separators = (',', ': ') if indent is not None else (',', ':')
+    return json.dumps(value, indent=indent, sort_keys=sort_keys, separators=separators, ensure_ascii=False)
+
+
+def orjson_encoder(value, indent: int = None, sort_keys: bool = False) -> str:
+    """Encode JSON value with orjson, producing the same output as `json_encoder`.
+
+    :param value: JSON value
+    :param indent: number of spaces per indentation level, or None
+    :param sort_keys: whether to sort object keys
+    """
+    option = orjson.OPT_SORT_KEYS if sort_keys else 0
+    if indent is not None:
+        option |= orjson.OPT_INDENT_2
+
+    try:
+        text = orjson.dumps(value, option=option).decode('utf-8')
+    # Values which orjson does not support, such as integers beyond 64 bits
+    except orjson.JSONEncodeError:
+        return json_encoder(value, indent, sort_keys)
+
+    # orjson writes non-finite floats as null, and floats which the json module writes with an exponent differently
+    # (e.g. 1e16 for 1e+16, 0.00001 for 1e-05). The value is only searched for these if the text may contain them
+    if ORJSON_FLOAT_CANDIDATES.search(text) and _has_exponent_floats(value):
+        return json_encoder(value, indent, sort_keys)
+
+    # orjson only indents by two spaces. Strings cannot contain newlines, so every indented line is structural
+    if indent is not None and indent != 2:
+        text = LEADING_SPACES.sub(lambda m: ' ' * (len(m.group()) // 2 * indent), text)
+
+    return text
+
+
+def _has_exponent_floats(value) -> bool:
+    """Return True if a JSON value contains a float which is not finite, or which is written with an exponent
+
+    :param value: JSON value
+    """
+    stack = [value]
+
+    while stack:
+        value = stack.pop()
+
+        if isinstance(value, float):
+            if not math.isfinite(value) or 'e' in repr(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+
+    return False
+
+
+default_encoder = json_encoder if orjson is None else orjson_encoder
+
+
+class JSONObjectSource:
+    """JSON object whose items are produced when it is encoded
+
+    :param iter_items: callable returning an iterator of (key, value) pairs
+    """
+
+    def __init__(self, iter_items):
+        self.iter_items = iter_items
+
+
+class JSONArraySource:
+    """JSON array whose items are produced when it is encoded
+
+    :param iter_values: callable returning an iterator of values
+    """
+
+    def __init__(self, iter_values):
+        self.iter_values = iter_values
+
+
+def _count_values(value, limit: int) -> int:
+    """Return the number of values in a JSON value, including itself, counting no more than limit
+
+    :param value: JSON value
+    :param limit: maximum count
+    """
+    count = 0
+    stack = [value]
+
+    while stack and count < limit:
+        value = stack.pop()
+        count += 1
+
+        if isinstance(value, dict):
+            stack.extend(islice(value.values(), limit - count))
+        elif isinstance(value, list):
+            stack.extend(islice(value, limit - count))
+        elif isinstance(value, (JSONObjectSource, JSONArraySource)):
+            return limit
+
+    return count
+
+
+def iter_encode(value, indent: int = None, sort_keys: bool = False, encoder=None):
+    """Yield chunks of the JSON encoding of a value.
+
+    Values may contain JSONObjectSource and JSONArraySource objects, which are expanded as they are encoded.
+    Other values are encoded by the encoder, with arrays and objects of more than `BATCH_SIZE` values encoded in
+    batches, so that no single call to the encoder holds the GIL for long.
+
+    :param value: JSON value
+    :param indent: number of spaces per indentation level, or None for compact output
+    :param sort_keys: whether to sort object keys
+    :param encoder: callable with the signature of `json_encoder` (`default_encoder` if omitted)
+    """
+    if encoder is None:
+        encoder = default_encoder
+
+    key_separator = ':' if indent is None else ': '
+
+    def get_newline(level: int) -> str:
+        return '' if indent is None else '\n' + ' ' * (indent * level)
+
+    def encode_key(key, level: int) -> str:
+        return get_newline(level) + json.dumps(key, ensure_ascii=False) + key_separator
+
+    def encode_batch(batch, is_object: bool, level: int) -> str:
+        # Encode the batch as a container, without its brackets
+        text = encoder(collections.OrderedDict(batch) if is_object else batch, indent, sort_keys)
+        if indent is None:
+            return text[1:-1]
+        return text[1:-2].replace('\n', get_newline(level))
+
+    def iter_batches(values):
+        """Yield (is_batch, values) for each run of small values, or single large value"""
+        batch = []
+        size = 0
+
+        for item, value in values:
+            count = _count_values(value, BATCH_SIZE)
+            if count < BATCH_SIZE:
+                batch.append(item)
+                size += count
+                if size < BATCH_SIZE:
+                    continue
+
+            elif batch:
+                yield True, batch
+                batch = [item]
+
+            else:
+                batch.append(item)
+
+            yield count < BATCH_SIZE, batch
+            batch = []
+            size = 0
+
+        if batch:
+            yield True, batch
+
+    def encode(value, level: int):
+        if isinstance(value, JSONObjectSource):
+            items = value.iter_items()
+            if sort_keys:
+                items = sorted(items, key=itemgetter(0))
+
+            separator = '{'
+            for key, item in items:
+                yield separator + encode_key(key, level + 1)
+                yield from encode(item, level + 1)
+                separator = ','
+
+            yield '{}' if separator == '{' else get_newline(level) + '}'
+
+        elif isinstance(value, JSONArraySource):
+            newline = get_newline(level + 1)
+            separator = '['
+            for item in value.iter_values():
+                yield separator + newline
+                yield from encode(item, level + 1)
+                separator = ','
+
+            yield '[]' if separator == '[' else get_newline(level) + ']'
+
+        elif isinstance(value, (dict, list)) and _count_values(value, BATCH_SIZE) == BATCH_SIZE:
+            is_object = isinstance(value, dict)
+            if is_object:
+                items = value.items()
+                if sort_keys:
+                    items = sorted(items, key=itemgetter(0))
+                values = ((i, i[1]) for i in items)
+            else:
+                values = ((i, i) for i in value)
+
+            separator = '{' if is_object else '['
+            for is_batch, batch in iter_batches(values):
+                if is_batch:
+                    yield separator + encode_batch(batch, is_object, level)
+
+                # Large values are encoded incrementally in turn
+                elif is_object:
+                    key, item = batch[0]
+                    yield separator + encode_key(key, level + 1)
+                    yield from encode(item, level + 1)
+
+                else:
+                    yield separator + get_newline(level + 1)
+                    yield from encode(batch[0], level + 1)
+
+                separator = ','
+
+            yield get_newline(level) + ('}' if is_object else ']')
+
+        else:
+            text = encoder(value, indent, sort_keys)
+            if indent is not None and level:
+                text = text.replace('\n', get_newline(level))
+            yield text
+
+    yield from encode(value, 0)
+
+
+def write_json(path, value, indent: int = None, sort_keys: bool = False, encoder=None):
+    """Write JSON value to a file, replacing it atomically.
+
+    The value is encoded in chunks by `iter_encode` to a temporary file in the same directory, which then replaces
+    the destination. An existing file is left unchanged if encoding fails.
+
+    :param path: destination file path
+    :param value: JSON value, which may contain JSONObjectSource and JSONArraySource objects
+    :param indent: number of spaces per indentation level, or None for compact output
+    :param sort_keys: whether to sort object keys
+    :param encoder: callable with the signature of `json_encoder` (`default_encoder` if omitted)
+    """
+    path = Path(path)
+
+    f, temporary_path = _create_temporary_file(path)
+
+    with f:
+        try:
+            for chunk in iter_encode(value, indent, sort_keys, encoder):
+                f.write(chunk)
+
+            f.flush()
+            os.fsync(f.fileno())
+
+        except BaseException:
+            f.close()
+            os.unlink(temporary_path)
+            raise
+
+    # A replaced file keeps its permissions, otherwise those of a new file are kept
+    if path.exists():
+        shutil.copymode(str(path), temporary_path)
+
+    os.replace(temporary_path, str(path))
+
+
+def _create_temporary_file(path: Path) -> tuple:
+    """Return (file, path) pair for a new text file in the directory of path, with the permissions of a new file
+    (i.e. subject to the umask)
+
+    :param path: destination file path
+    """
+    # NamedTemporaryFile only permits its owner to read the file, and the umask cannot be read without changing it
+    for _ in range(TMP_MAX):
+        temporary_path = path.with_name("{}.{}.tmp".format(path.name, os.urandom(6).hex()))
+        try:
+            fd = os.open(str(temporary_path), os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0),
+                         0o666)
+        except FileExistsError:
+            continue
+
+        return open(fd, 'w', encoding='utf-8'), str(temporary_path)
+
+    raise FileExistsError("No usable temporary file name found for {}".format(path))
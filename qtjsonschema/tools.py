@@ -1,15 +1,156 @@
+import json
+import logging
+import os
+import warnings
 from abc import ABC, abstractmethod
-from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from hashlib import sha256
 from json import load as load_json
+from pathlib import Path
 from platform import system
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from typing import TYPE_CHECKING
 
-import requests
 from uritools import uricompose, urisplit, urijoin
 
+from .errors import ResourceUnavailableError
+from .instrumentation import profiler
+
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache_directory() -> Path:
+    """Return the directory for qtjsonschema caches.
+
+    Uses the QTJSONSCHEMA_CACHE_DIR environment variable if set, otherwise the user cache directory.
+    """
+    try:
+        return Path(os.environ['QTJSONSCHEMA_CACHE_DIR'])
+    except KeyError:
+        pass
+
+    base_directory = os.environ.get('XDG_CACHE_HOME') or Path.home() / ".cache"
+    return Path(base_directory) / "qtjsonschema"
+
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_uri(uri: str) -> str:
+    """Return URI without fragment, with case-insensitive components lowercased and any default port removed
+
+    :param uri: URI string
+    """
+    result = urisplit(uri)
+    scheme = result.getscheme()
+
+    if result.authority is None:
+        return uricompose(scheme, None, result.path, result.query)
+
+    port = result.getport()
+    if port == DEFAULT_PORTS.get(scheme):
+        port = None
+
+    return uricompose(scheme, path=result.getpath() or '/', query=result.query, userinfo=result.getuserinfo(),
+                      host=result.gethost(), port=port)
+
+
+class ResourceCache:
+    """Thread-safe LRU cache of loaded resources, keyed by normalized URI.
+
+    The cache may be shared between registries, so that documents are loaded once per process.
+
+    :param max_size: maximum number of entries
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+
+        self._resources = OrderedDict()
+        self._lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, uri: str, version=None) -> dict:
+        """Return cached resource for URI, or raise KeyError if it is not cached, or was cached for another version
+
+        :param uri: URI string
+        :param version: version of the resource, from `ResourceLoader.get_resource_version`
+        """
+        key = normalize_uri(uri)
+
+        with self._lock:
+            try:
+                cached_version, resource = self._resources[key]
+                if cached_version != version:
+                    raise KeyError(uri)
+            except KeyError:
+                self.misses += 1
+                raise
+
+            self._resources.move_to_end(key)
+            self.hits += 1
+
+        return resource
+
+    def put(self, uri: str, resource: dict, version=None):
+        """Add resource to the cache, evicting the least recently used entries if full
+
+        :param uri: URI string
+        :param resource: JSON object
+        :param version: version of the resource, from `ResourceLoader.get_resource_version`
+        """
+        key = normalize_uri(uri)
+
+        with self._lock:
+            self._resources[key] = version, resource
+            self._resources.move_to_end(key)
+
+            while len(self._resources) > self.max_size:
+                self._resources.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, uri: str = None):
+        """Remove the cached resource for URI, or all resources if URI is omitted
+
+        :param uri: URI string
+        """
+        with self._lock:
+            if uri is None:
+                self._resources.clear()
+            else:
+                self._resources.pop(normalize_uri(uri), None)
+
+    def stats(self) -> dict:
+        """Return dictionary of cache statistics"""
+        return {'size': len(self._resources), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
+
+    def __len__(self):
+        return len(self._resources)
+
+    def __repr__(self):
+        return "ResourceCache(size={size}, max_size={max_size}, hits={hits}, misses={misses}, " \
+               "evictions={evictions})".format(**self.stats())
+
+
+# Shared by registries which are not given a cache
+default_resource_cache = ResourceCache()
+
 
 class ResourceLoader(ABC):
     """Abstract base class for a resource loader, which accepts a URI and returns a JSON object"""
 
+    # Whether resources may be shared between registries by the ResourceCache
+    is_cacheable = True
+
     @abstractmethod
     def load_resource(self, uri: str) -> dict:
         """Return JSON object associated with URI
@@ -18,18 +159,138 @@ class ResourceLoader(ABC):
         """
         pass
 
+    def get_resource_version(self, uri: str):
+        """Return a hashable value which changes when the resource for URI changes, or None if it is not tracked.
+        Cached resources are only shared whilst their version is unchanged.
+
+        :param uri: URI string
+        """
+        return None
+
 
 class HTTPResourceLoader(ResourceLoader):
-    """ResourceLoader corresponding to a remote JSON file served over http."""
+    """ResourceLoader corresponding to a remote JSON file served over http.
+
+    Connections are pooled and kept alive by a requests Session. If a cache directory is given, responses are cached on
+    disk and revalidated with their ETag / Last-Modified headers. In offline mode, resources are only loaded from the
+    cache.
+
+    :param session: requests Session object (a pooled session is created on first use if omitted)
+    :param timeout: connect and read timeout (seconds)
+    :param cache_directory: directory of response cache, or None to disable caching
+    :param offline: if True, do not make requests
+    :param pool_size: maximum number of connections kept alive per host
+    """
+
+    # Resources are revalidated whenever they are loaded, rather than shared by the ResourceCache for the life of the
+    # process. Unchanged responses are then read from the response cache
+    is_cacheable = False
+
+    def __init__(self, session: 'requests.Session' = None, timeout: float = 10.0, cache_directory: Path = None,
+                 offline: bool = False, pool_size: int = 10):
+        self.timeout = timeout
+        self.cache_directory = None if cache_directory is None else Path(cache_directory)
+        self.offline = offline
+        self.pool_size = pool_size
+
+        self._session = session
+        self._session_lock = Lock()
+
+    @property
+    def session(self) -> 'requests.Session':
+        # requests is only imported once a remote reference is loaded
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+
+        return self._session
 
     def load_resource(self, uri: str) -> dict:
-        return requests.get(uri).json()
+        cached = self._read_cache(uri)
+
+        if self.offline:
+            if cached is None:
+                raise ResourceUnavailableError("Resource {} is not cached, and cannot be loaded offline".format(uri))
+            return json.loads(cached[1])
+
+        headers = {}
+        if cached is not None:
+            metadata = cached[0]
+            if metadata.get('etag'):
+                headers['If-None-Match'] = metadata['etag']
+            if metadata.get('last_modified'):
+                headers['If-Modified-Since'] = metadata['last_modified']
+
+        response = self.session.get(uri, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304 and cached is not None:
+            return json.loads(cached[1])
+
+        response.raise_for_status()
+        self._write_cache(uri, response)
+        return response.json()
+
+    def _get_cache_paths(self, uri: str) -> tuple:
+        name = sha256(uri.encode('utf-8')).hexdigest()
+        return self.cache_directory / (name + ".meta"), self.cache_directory / (name + ".json")
+
+    def _read_cache(self, uri: str) -> tuple:
+        """Return (metadata, content) pair for cached response, or None"""
+        if self.cache_directory is None:
+            return None
+
+        metadata_path, content_path = self._get_cache_paths(uri)
+        try:
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            content = content_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+
+        if metadata.get('uri') != uri:
+            return None
+
+        return metadata, content
+
+    def _write_cache(self, uri: str, response: 'requests.Response'):
+        if self.cache_directory is None:
+            return
+
+        self.cache_directory.mkdir(parents=True, exist_ok=True)
+        metadata = {'uri': uri, 'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified')}
+
+        # Content is replaced before metadata, so that metadata never describes other content
+        metadata_path, content_path = self._get_cache_paths(uri)
+        for path, data in ((content_path, response.content), (metadata_path, json.dumps(metadata).encode('utf-8'))):
+            with NamedTemporaryFile('wb', dir=str(self.cache_directory), delete=False) as f:
+                f.write(data)
+            os.replace(f.name, str(path))
 
 
 class FileResourceLoader(ResourceLoader):
-    """ResourceLoader corresponding to a local JSON file."""
+    """ResourceLoader corresponding to a local JSON file.
+
+    Files may be edited between loads, so their version is their modification time and size.
+    """
 
     def load_resource(self, uri: str) -> dict:
+        with open(self._get_path(uri)) as f:
+            return load_json(f)
+
+    def get_resource_version(self, uri: str) -> tuple:
+        stat = os.stat(self._get_path(uri))
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _get_path(uri: str) -> str:
         result = urisplit(uri)
 
         if result.authority:
@@ -41,8 +302,7 @@ class FileResourceLoader(ResourceLoader):
         if system() == 'Windows':
             path = path[1:]
 
-        with open(path) as f:
-            return load_json(f)
+        return path
 
 
 class DocumentLoader(ResourceLoader):
@@ -51,6 +311,9 @@ class DocumentLoader(ResourceLoader):
     Used to facilitate internal references when references are not resolved with base uri 
     """
 
+    # The location is only meaningful to the document's own registry
+    is_cacheable = False
+
     def __init__(self, document: dict, location: str):
         self.location = location
         self.document = document
@@ -62,10 +325,26 @@ class DocumentLoader(ResourceLoader):
 
 
 class URILoaderRegistry:
-    """Registry to load a URI according to URI scheme"""
+    """Registry to load a URI according to URI scheme.
+
+    Resources are retained by location once loaded, and can be added in advance to avoid loading them.
+    Resources from cacheable loaders are also shared with other registries through a ResourceCache.
+
+    :param resource_cache: ResourceCache object, or None to disable sharing
+    """
 
-    def __init__(self):
+    def __init__(self, resource_cache: ResourceCache = None):
         self.scheme_to_loader = {}
+        self.resources = {}
+        self.resource_cache = resource_cache
+
+    def add_resource(self, location: str, resource: dict):
+        """Add JSON object to be returned for the given location, instead of loading it
+
+        :param location: URI string, without fragment
+        :param resource: JSON object
+        """
+        self.resources[location] = resource
 
     def load_resource_from_loader(self, loader: ResourceLoader, uri: str) -> dict:
         """Return JSON object returned by loader for given URI
@@ -73,43 +352,190 @@ class URILoaderRegistry:
         :param loader: ResourceLoader object
         :param uri: URI string
         """
-        print("Loading resource {} with {}".format(uri, loader))
-        return loader.load_resource(uri)
+        if self.resource_cache is None or not loader.is_cacheable:
+            return self._load_resource(loader, uri)
+
+        version = loader.get_resource_version(uri)
+        try:
+            return self.resource_cache.get(uri, version)
+        except KeyError:
+            pass
+
+        resource = self._load_resource(loader, uri)
+        self.resource_cache.put(uri, resource, version)
+        return resource
+
+    def _load_resource(self, loader: ResourceLoader, uri: str) -> dict:
+        logger.debug("Loading resource %s with %s", uri, loader)
+
+        with profiler.span("load_resource", uri):
+            return loader.load_resource(uri)
 
     def load_uri(self, uri: str) -> dict:
         """Return the JSON object associated with given URI
         
         :param uri: URI string
         """
-        result = urisplit(uri)
+        with profiler.span("load_uri", uri):
+            result = urisplit(uri)
 
-        location = uricompose(result.scheme, result.authority, result.path)
-        loader = self.scheme_to_loader[result.scheme]
-        resource = self.load_resource_from_loader(loader, location)
+            location = uricompose(result.scheme, result.authority, result.path)
 
-        if result.fragment:
-            assert result.fragment.startswith("/")
-            reference = Reference(result.fragment[1:])
-            return reference.extract(resource)
+            try:
+                resource = self.resources[location]
+            except KeyError:
+                loader = self.scheme_to_loader[result.scheme]
+                resource = self.resources[location] = self.load_resource_from_loader(loader, location)
 
-        return resource
+            if result.fragment:
+                assert result.fragment.startswith("/")
+                reference = Reference(result.fragment[1:])
+                return reference.extract(resource)
+
+            return resource
 
     def register_for_scheme(self, scheme: str, loader):
         self.scheme_to_loader[scheme] = loader
 
+    def get_scheme_handlers(self) -> dict:
+        """Return mapping from URI scheme to callable loading a URI through this registry, for use by
+        a `referencing.Registry` retrieval function"""
+        return {scheme: self.load_uri for scheme in self.scheme_to_loader if scheme}
+
 
 def create_cached_uri_loader_registry(cache_size=1024):
-    """Create a cached URILoaderRegistry subclass and return it
-    
+    """Create a URILoaderRegistry subclass whose instances share a ResourceCache, and return it.
+
+    Deprecated: registries are given a ResourceCache, and those created by `create_default_uri_loader_registry` share
+    one by default.
+
     :param cache_size: size of registry cache (entries)
     """
+    warnings.warn("create_cached_uri_loader_registry is deprecated, pass a ResourceCache to URILoaderRegistry instead",
+                  DeprecationWarning, stacklevel=2)
+
+    shared_resource_cache = ResourceCache(cache_size)
 
     class CachedURILoaderRegistry(URILoaderRegistry):
-        load_resource_from_loader = lru_cache(1024)(URILoaderRegistry.load_resource_from_loader)
+        def __init__(self, resource_cache: ResourceCache = shared_resource_cache):
+            super().__init__(resource_cache)
 
     return CachedURILoaderRegistry
 
 
+def create_default_uri_loader_registry(document: dict = None, document_uri: str = None,
+                                       http_loader: HTTPResourceLoader = None,
+                                       resource_cache: ResourceCache = default_resource_cache) -> URILoaderRegistry:
+    """Create URILoaderRegistry for http(s) and file URIs, and relative references within a document.
+
+    :param document: dict-like JSON object against which relative references without a base URI are resolved
+    :param document_uri: URI of document, if known
+    :param http_loader: HTTPResourceLoader object (uncached loader if omitted)
+    :param resource_cache: ResourceCache object shared between registries, or None to disable sharing
+    """
+    registry = URILoaderRegistry(resource_cache)
+
+    if http_loader is None:
+        http_loader = HTTPResourceLoader()
+    file_resource_loader = FileResourceLoader()
+
+    registry.register_for_scheme('http', http_loader)
+    registry.register_for_scheme('https', http_loader)
+    registry.register_for_scheme('file', file_resource_loader)
+
+    if document is not None:
+        # Without a document URI, internal references resolve to an empty document location
+        registry.register_for_scheme(None, DocumentLoader(document, document_uri or ""))
+
+        # The document is already loaded
+        if document_uri is not None:
+            registry.add_resource(document_uri, document)
+
+    return registry
+
+
+# Keywords whose values are instance data, rather than schemas
+DATA_KEYWORDS = frozenset(("enum", "default"))
+
+
+def iter_schema_references(schema, scope_uri: str):
+    """Yield the absolute URI of each '$ref' in a JSON schema, respecting 'id' scopes
+
+    :param schema: dict-like JSON schema
+    :param scope_uri: URI of the scope of the schema
+    """
+    stack = [(schema, scope_uri)]
+
+    while stack:
+        obj, scope_uri = stack.pop()
+
+        if isinstance(obj, list):
+            stack.extend((v, scope_uri) for v in obj)
+            continue
+
+        if not isinstance(obj, dict):
+            continue
+
+        if isinstance(obj.get("id"), str):
+            scope_uri = urijoin(scope_uri, obj["id"])
+
+        if isinstance(obj.get("$ref"), str):
+            yield urijoin(scope_uri, obj["$ref"])
+
+        stack.extend((v, scope_uri) for k, v in obj.items() if k not in DATA_KEYWORDS)
+
+
+def prefetch_references(registry: URILoaderRegistry, schema: dict, schema_uri: str, max_workers: int = 8) -> list:
+    """Load the external documents referenced by a schema concurrently, and add them to the registry.
+
+    References within fetched documents are followed transitively.
+    Documents which fail to load are skipped, so that the error is raised when the reference is dereferenced.
+
+    :param registry: URILoaderRegistry object
+    :param schema: dict-like JSON schema
+    :param schema_uri: URI of schema
+    :param max_workers: maximum number of concurrent loads
+    :returns: list of loaded locations
+    """
+    loaded = []
+    seen = set(registry.resources)
+
+    def submit_references(executor, document, document_uri):
+        for uri in iter_schema_references(document, document_uri):
+            result = urisplit(uri)
+            location = uricompose(result.scheme, result.authority, result.path)
+            if location in seen:
+                continue
+            seen.add(location)
+
+            loader = registry.scheme_to_loader.get(result.scheme)
+            # Relative references without a base URI are resolved against the schema itself
+            if loader is None or isinstance(loader, DocumentLoader):
+                continue
+
+            futures[executor.submit(registry.load_resource_from_loader, loader, location)] = location
+
+    futures = {}
+    with ThreadPoolExecutor(max_workers) as executor:
+        submit_references(executor, schema, schema_uri)
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                location = futures.pop(future)
+                try:
+                    document = future.result()
+                except Exception:
+                    continue
+
+                registry.add_resource(location, document)
+                loaded.append(location)
+                submit_references(executor, document, location)
+
+    return loaded
+
+
 class Reference:
     def __init__(self, uri: str):
         self.elements = [e.replace('~1', '/').replace('~0', '~') for e in uri.split('/')]
@@ -145,7 +571,9 @@ class Context:
         :param uri: URI string
         """
         reference_path = urijoin(self.scope_uri, uri)
-        return self.registry.load_uri(reference_path)
+
+        with profiler.span("dereference", reference_path):
+            return self.registry.load_uri(reference_path)
 
     def __repr__(self):
         return "Context({!r}, {!r})".format(self.scope_uri, self.registry)
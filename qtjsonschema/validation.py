@@ -0,0 +1,231 @@
+"""
+Whole-document validation helpers.
+
+jsonschema is imported when the first validator is built, rather than with this module.
+"""
+
+from collections import namedtuple
+from time import perf_counter
+from typing import TYPE_CHECKING
+from urllib.parse import urldefrag
+
+if TYPE_CHECKING:
+    import jsonschema
+
+
+ValidationIssue = namedtuple("ValidationIssue", "path schema_path message")
+ValidationTarget = namedtuple("ValidationTarget", "path schema scope_uri instance")
+
+# Keywords whose result for an object or array depends upon the values of its children.
+# A change beneath a schema using any of these must be validated from that schema, rather than from a descendant.
+# Note that `required` only depends upon the presence of keys, which is fixed by the widget structure.
+CONTEXT_KEYWORDS = frozenset(("dependencies", "uniqueItems", "enum", "allOf", "anyOf", "oneOf", "not",
+                              "patternProperties", "additionalProperties"))
+
+
+def iter_validation_issues(validator: 'jsonschema.Draft4Validator', instance):
+    """Yield a ValidationIssue for each error raised by the validator for the given instance
+
+    :param validator: jsonschema validator object
+    :param instance: JSON object to validate
+    """
+    for error in validator.iter_errors(instance):
+        yield ValidationIssue(tuple(error.absolute_path), tuple(error.absolute_schema_path), error.message)
+
+
+def iter_subschema_issues(validator: 'jsonschema.Draft4Validator', target: ValidationTarget):
+    """Yield a ValidationIssue for each error raised when validating the target instance against its sub-schema.
+
+    Issue paths are absolute, whilst schema paths are relative to the target sub-schema.
+
+    :param validator: jsonschema validator object for the root schema
+    :param target: ValidationTarget object
+    """
+    if not target.path and target.scope_uri is None:
+        yield from iter_validation_issues(validator, target.instance)
+        return
+
+    # Evolved validators resolve references against the root schema. A sub-schema with a scope of its own is
+    # validated beneath a schema identified by that scope, so that its relative references are resolved against it,
+    # and the schema paths of its errors are relative to that wrapper
+    schema = target.schema
+    prefix_length = 0
+    if target.scope_uri is not None:
+        schema = _identify_subschema(schema, target.scope_uri)
+        prefix_length = SUBSCHEMA_PREFIX_LENGTH
+
+    for error in validator.evolve(schema=schema).iter_errors(target.instance):
+        yield ValidationIssue(target.path + tuple(error.absolute_path),
+                              tuple(error.absolute_schema_path)[prefix_length:], error.message)
+
+
+# Length of the schema path from a schema returned by `_identify_subschema` to the wrapped sub-schema
+SUBSCHEMA_PREFIX_LENGTH = 4
+
+
+def _identify_subschema(schema: dict, scope_uri: str) -> dict:
+    """Return a schema which validates an instance against schema within the resolution scope of scope_uri
+
+    :param schema: dict-like JSON schema
+    :param scope_uri: URI of the scope of the schema, which already follows any 'id' of the schema
+    """
+    # Only the 'id' of a descendant schema is followed whilst validating, and not if it has a sibling '$ref', so the
+    # scope is given by an intermediate schema. Fragment references are resolved within the document of the scope
+    schema = {k: v for k, v in schema.items() if k != "id"}
+    return {"allOf": [{"id": urldefrag(scope_uri)[0], "allOf": [schema]}]}
+
+
+def create_validator(schema: dict, base_uri: str = '', resources: dict = None, handlers: dict = None,
+                     format_checker: 'jsonschema.FormatChecker' = None) -> 'jsonschema.Draft4Validator':
+    """Return Draft4Validator for schema, resolving references through a `referencing.Registry`
+
+    :param schema: dict-like JSON schema
+    :param base_uri: URI against which relative references are resolved
+    :param resources: mapping from location URI to JSON object for referenced documents which are already loaded
+    :param handlers: mapping from URI scheme to callable loading other referenced documents
+    :param format_checker: jsonschema FormatChecker object
+    """
+    from urllib.parse import urljoin, urlsplit
+
+    from jsonschema import Draft4Validator
+    from referencing import Registry
+    from referencing.jsonschema import DRAFT4
+
+    resources = resources or {}
+    handlers = handlers or {}
+
+    def retrieve(uri: str):
+        # References are relative to an empty base URI if the root schema cannot be identified by base_uri
+        # (e.g. if it has a '$ref')
+        uri = urljoin(base_uri, uri)
+        if uri in resources:
+            return DRAFT4.create_resource(resources[uri])
+
+        scheme = urlsplit(uri).scheme
+        try:
+            handler = handlers[scheme]
+        except KeyError:
+            raise LookupError("No handler for URI scheme {!r}".format(scheme))
+        return DRAFT4.create_resource(handler(uri))
+
+    # Draft 4 schemas without an `id` have no base URI of their own, so the root schema is identified by base_uri
+    if base_uri and "id" not in schema:
+        schema = dict(schema, id=base_uri)
+
+    registry = Registry(retrieve=retrieve).with_resources(
+        (uri, DRAFT4.create_resource(resource)) for uri, resource in resources.items())
+    registry = registry.with_resource(base_uri, DRAFT4.create_resource(schema))
+
+    return Draft4Validator(schema, registry=registry, format_checker=format_checker)
+
+
+def get_json_value(document, path: tuple):
+    """Return the value at path in a JSON document, raising LookupError if there is none
+
+    :param document: JSON object
+    :param path: sequence of object keys and array indices
+    """
+    for key in path:
+        try:
+            document = document[key]
+        except TypeError:
+            raise LookupError(path)
+
+    return document
+
+
+def merge_validation_issues(issues_by_path: dict, path: tuple, issues: tuple):
+    """Replace the issues for the instance at path with those given, in-place.
+
+    Results previously recorded for descendants of path are discarded, and results recorded for ancestors
+    lose any issues located at, or beneath, path.
+
+    :param issues_by_path: mapping from validated path to tuple of ValidationIssue objects
+    :param path: path of validated instance
+    :param issues: tuple of ValidationIssue objects
+    """
+    depth = len(path)
+
+    for key in list(issues_by_path):
+        if key[:depth] == path:
+            del issues_by_path[key]
+
+        elif path[:len(key)] == key:
+            issues_by_path[key] = tuple(i for i in issues_by_path[key] if i.path[:depth] != path)
+
+    issues_by_path[path] = issues
+
+
+def format_json_pointer(path) -> str:
+    """Return URI fragment JSON pointer for sequence of keys
+
+    :param path: sequence of object keys and array indices
+    """
+    return '#/' + '/'.join(str(p).replace('~', '~0').replace('/', '~1') for p in path)
+
+
+class ValidatorCache:
+    """Cache of compiled Draft4Validator objects, keyed by schema identity and base URI.
+
+    Building a validator creates its reference registry and keyword dispatch, so a validator is built once per schema
+    and reused until the cache is cleared.
+    """
+
+    def __init__(self, format_checker: 'jsonschema.FormatChecker' = None):
+        self._format_checker = format_checker
+
+        self._validators = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.build_time = 0.0
+
+    @property
+    def format_checker(self) -> 'jsonschema.FormatChecker':
+        if self._format_checker is None:
+            from jsonschema import FormatChecker
+            self._format_checker = FormatChecker()
+
+        return self._format_checker
+
+    def get_validator(self, schema: dict, base_uri: str = '', resources: dict = None,
+                      handlers: dict = None) -> 'jsonschema.Draft4Validator':
+        """Return compiled validator for schema, building it if it is not already cached
+
+        :param schema: dict-like JSON schema
+        :param base_uri: URI against which relative references are resolved
+        :param resources: mapping from location URI to JSON object for referenced documents which are already loaded
+        :param handlers: mapping from URI scheme to callable loading other referenced documents
+        """
+        key = id(schema), base_uri
+
+        try:
+            # Entries hold a reference to the schema, so its id cannot be reused whilst cached
+            _, validator = self._validators[key]
+
+        except KeyError:
+            self.misses += 1
+
+            start_time = perf_counter()
+            validator = create_validator(schema, base_uri, resources, handlers, self.format_checker)
+            self.build_time += perf_counter() - start_time
+
+            self._validators[key] = schema, validator
+
+        else:
+            self.hits += 1
+
+        return validator
+
+    def clear(self):
+        """Remove all cached validators"""
+        self._validators.clear()
+
+    def stats(self) -> dict:
+        """Return dictionary of cache statistics"""
+        return {'size': len(self._validators), 'hits': self.hits, 'misses': self.misses,
+                'build_time': self.build_time}
+
+    def __repr__(self):
+        return "ValidatorCache(size={size}, hits={hits}, misses={misses}, build_time={build_time:.6f})" \
+            .format(**self.stats())
@@ -1,50 +1,152 @@
 import re
+from typing import TYPE_CHECKING
 
 from PyQt5 import QtGui
-from jsonschema import FormatChecker, FormatError
 
 from .errors import ValidationError
 
+if TYPE_CHECKING:
+    import jsonschema
+
+_format_checker = None
+
+
+def get_format_checker() -> 'jsonschema.FormatChecker':
+    """Return the FormatChecker shared by all format validators, importing jsonschema on first use"""
+    global _format_checker
+
+    # FormatChecker holds no per-value state, so a single instance is shared
+    if _format_checker is None:
+        from jsonschema import FormatChecker
+        _format_checker = FormatChecker()
+
+    return _format_checker
+
 
 class FormatValidator:
+    """Validator for the 'format' keyword. Instances are immutable, and may be shared"""
+
+    __slots__ = '_format',
+
     def __init__(self, format):
         self._format = format
-        self._checker = FormatChecker()
+
+    @property
+    def format(self):
+        return self._format
 
     def __call__(self, text):
+        from jsonschema import FormatError
+
         try:
-            self._checker.check(text, self._format)
+            get_format_checker().check(text, self._format)
         except FormatError:
             raise ValidationError("Value {!r} does not confirm to format {!r}".format(text, self._format))
         return True
 
 
 class RegexValidator:
+    """Validator for the 'pattern' keyword. Instances are immutable, and may be shared"""
+
+    __slots__ = '_matcher',
+
     def __init__(self, pattern):
         self._matcher = re.compile(pattern)
 
+    @property
+    def pattern(self):
+        return self._matcher.pattern
+
     def __call__(self, text):
-        if self._matcher.match(text) is not None:
-            raise ValidationError("Value {!r} does not conform to regex {!r}".format(text, self._matcher))
+        # JSON schema patterns are not anchored
+        if self._matcher.search(text) is None:
+            raise ValidationError("Value {!r} does not conform to regex {!r}".format(text, self._matcher.pattern))
 
 
 class LengthValidator:
+    """Validator for the 'minLength' and 'maxLength' keywords. Instances are immutable, and may be shared"""
+
+    __slots__ = '_minimum', '_maximum'
+
     def __init__(self, minimum=None, maximum=None):
-        self.minimum = minimum
-        self.maximum = maximum
+        self._minimum = minimum
+        self._maximum = maximum
+
+    @property
+    def minimum(self):
+        return self._minimum
+
+    @property
+    def maximum(self):
+        return self._maximum
 
     def __call__(self, text):
-        if self.minimum is not None:
-            if len(text) < self.minimum:
-                raise ValidationError("Length of string {!r} is less than permitted ({})".format(text, self.minimum))
+        if self._minimum is not None:
+            if len(text) < self._minimum:
+                raise ValidationError("Length of string {!r} is less than permitted ({})".format(text, self._minimum))
+
+        if self._maximum is not None:
+            if len(text) > self._maximum:
+                raise ValidationError("Length of string {!r} is greater than permitted ({})"
+                                      .format(text, self._maximum))
+
 
-        if self.maximum is not None:
-            if len(text) > self.maximum:
-                raise ValidationError("Length of string {!r} is greater than permitted ({})".format(text, self.maximum))
+class ValidatorInterner:
+    """Cache of validator instances, so that identical constraints share a single instance"""
+
+    def __init__(self):
+        self._validators = {}
+
+        self.created = 0
+        self.saved = 0
+
+    def get_validator(self, validator_class: type, *args):
+        """Return validator_class(*args), reusing an existing instance if one was created with the same arguments
+
+        :param validator_class: validator class, whose instances are immutable
+        :param args: hashable constructor arguments
+        """
+        key = (validator_class,) + args
+
+        try:
+            validator = self._validators[key]
+        except KeyError:
+            validator = self._validators[key] = validator_class(*args)
+            self.created += 1
+        else:
+            self.saved += 1
+
+        return validator
+
+    def clear(self):
+        """Remove all interned validators"""
+        self._validators.clear()
+
+    def stats(self) -> dict:
+        """Return dictionary of interning statistics"""
+        return {'size': len(self._validators), 'created': self.created, 'saved': self.saved}
+
+    def __repr__(self):
+        return "ValidatorInterner(size={size}, created={created}, saved={saved})".format(**self.stats())
+
+
+interned_validators = ValidatorInterner()
+
+
+def intern_validator(validator_class: type, *args):
+    """Return shared validator_class(*args) instance from the default ValidatorInterner
+
+    :param validator_class: validator class, whose instances are immutable
+    :param args: hashable constructor arguments
+    """
+    return interned_validators.get_validator(validator_class, *args)
 
 
 class ValidationFormatter:
-    """Format widget according to validator state"""
+    """Format widget according to validator state.
+
+    The valid and invalid palettes are built once, and the widget is only restyled when its state changes.
+    """
     VALID_COLOUR = '#c4df9b'
     INVALID_COLOUR = '#f6989d'
 
@@ -54,9 +156,21 @@ class ValidationFormatter:
         self._default_tooltip = widget.toolTip()
         self._require_validator = require_validator
 
+        self._palettes = None
+        self._color_string = None
+        self._tooltip = None
+
     def add_validator(self, validator):
         self._validators.append(validator)
 
+    def _build_palettes(self) -> dict:
+        palettes = {}
+        for color_string in (self.VALID_COLOUR, self.INVALID_COLOUR):
+            palette = QtGui.QPalette(self._widget.palette())
+            palette.setColor(self._widget.backgroundRole(), QtGui.QColor(color_string))
+            palettes[color_string] = palette
+        return palettes
+
     def __call__(self, value):
         # Don't perform validation if no validators
         if not self._validators and self._require_validator:
@@ -73,10 +187,13 @@ class ValidationFormatter:
                 color_string = self.INVALID_COLOUR
                 break
 
-        palette = self._widget.palette()
-        colour = QtGui.QColor()
-        colour.setNamedColor(color_string)
-        palette.setColor(self._widget.backgroundRole(), colour)
+        if color_string != self._color_string:
+            if self._palettes is None:
+                self._palettes = self._build_palettes()
+
+            self._widget.setPalette(self._palettes[color_string])
+            self._color_string = color_string
 
-        self._widget.setPalette(palette)
-        self._widget.setToolTip(tooltip)
+        if tooltip != self._tooltip:
+            self._widget.setToolTip(tooltip)
+            self._tooltip = tooltip
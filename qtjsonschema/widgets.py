@@ -4,9 +4,13 @@ Widget definitions for JSON schema elements.
 
 from PyQt5 import QtCore, QtWidgets, QtGui
 
+from .compiler import SchemaCompiler, SchemaNode
 from .errors import UnsupportedSchemaError
-from .tools import FileResourceLoader, HTTPResourceLoader, Context, DocumentLoader, create_cached_uri_loader_registry
-from .validators import ValidationFormatter, FormatValidator, LengthValidator, RegexValidator
+from .instrumentation import profiler
+from .journal import PatchOperation, apply_patch_operation
+from .streaming import JSONArraySource, JSONObjectSource, JSONStreamReader
+from .tools import Context, URILoaderRegistry, create_default_uri_loader_registry, prefetch_references
+from .validators import ValidationFormatter, FormatValidator, LengthValidator, RegexValidator, intern_validator
 
 
 # Widgets supporting $ref
@@ -25,6 +29,38 @@ def iter_widgets(object):
         yield object.widget(i)
 
 
+def merge_json_objects(base, data):
+    """Return a copy of JSON object `base`, updated with `data` by its structure alone.
+
+    Objects are merged by key, ignoring keys which are not in `base`, and arrays are merged by index,
+    taking the length of `data`. Widgets merge values with `JSONBaseWidget.merge_json_object`, which follows the
+    schema node.
+
+    :param base: JSON object
+    :param data: JSON object, or None to copy `base`
+    """
+    if isinstance(base, dict):
+        if not isinstance(data, dict):
+            data = {}
+        return {k: merge_json_objects(v, data[k]) if k in data else merge_json_objects(v, None)
+                for k, v in base.items()}
+
+    if isinstance(base, list):
+        if not isinstance(data, list):
+            data = base
+        merged = [merge_json_objects(b, d) for b, d in zip(base, data)]
+        merged.extend(merge_json_objects(d, None) for d in data[len(base):])
+        return merged
+
+    if data is None:
+        return base
+    return data
+
+
+# Marks a widget whose value has not been dumped since it last changed
+_NOT_DUMPED = object()
+
+
 def not_implemented_property():
     """Property descriptor which raises NotImplementedError on __get__"""
 
@@ -79,21 +115,133 @@ class QColorButton(QtWidgets.QPushButton):
 class JSONBaseWidget:
     """Base class for JSON handling widgets"""
 
-    def __init__(self, name: str, schema: dict, ctx: Context, parent: 'JSONBaseWidget'):
+    # Emitted by this widget and each of its ancestors when a value changes, with the originating widget
+    valueChanged = QtCore.pyqtSignal(object)
+
+    # Emitted by the root widget for each edit within its tree, with a PatchOperation
+    edited = QtCore.pyqtSignal(object)
+
+    # Schema 'type', 'format' and presence of 'enum' under which the class is indexed by WidgetClassRegistry,
+    # where None matches any value. Candidates are then tried in descending PRIORITY with `supports_schema`
+    SCHEMA_TYPE = None
+    SCHEMA_FORMAT = None
+    SCHEMA_HAS_ENUM = None
+    PRIORITY = 0
+
+    # Whether the parent dumps its value from this widget, so that changes to this widget invalidate the parent
+    _is_dumped_by_parent = True
+
+    def __init__(self, name: str, node: SchemaNode, parent: 'JSONBaseWidget'):
         super().__init__()
 
         self.name = name
-        self.schema = schema
+        self.node = node
+        self.schema = node.schema
         self.parent = parent
-        self.ctx = ctx
+        self.ctx = node.ctx
+
+        self._dumped_value = _NOT_DUMPED
 
     @classmethod
     def supports_schema(cls, schema: dict) -> bool:
         raise NotImplementedError
 
+    @classmethod
+    def compile_options(cls, node: SchemaNode) -> dict:
+        """Return widget-specific values for the schema node, which are shared by all of its widgets
+
+        :param node: SchemaNode object
+        """
+        return {}
+
+    @classmethod
+    def get_default_json_object(cls, node: SchemaNode):
+        """Return the value dumped by a newly created widget for the given schema node, without creating the widget
+
+        :param node: SchemaNode object
+        """
+        value = cls.get_empty_json_object(node)
+        if 'default' in node.schema:
+            value = cls.merge_json_object(node, value, node.schema['default'])
+        return value
+
+    @classmethod
+    def get_empty_json_object(cls, node: SchemaNode):
+        """Return the value dumped by a newly created widget for the given schema node, ignoring any default
+
+        :param node: SchemaNode object
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def get_recursive_json_object(cls, node: SchemaNode):
+        """Return the value standing in for the default value of the given schema node within that default value,
+        where the schema is recursive
+
+        :param node: SchemaNode object
+        """
+        return cls.get_empty_json_object(node)
+
+    @classmethod
+    def merge_json_object(cls, node: SchemaNode, base, data):
+        """Return the value dumped by a widget for the given schema node holding `base`, once `data` is loaded into it,
+        without creating the widget
+
+        :param node: SchemaNode object
+        :param base: JSON object
+        :param data: JSON object, or None to copy `base`
+        """
+        return merge_json_objects(base, data)
+
+    @classmethod
+    def iter_merge_json_stream(cls, node: SchemaNode, base, reader: JSONStreamReader):
+        """Merge the next value from a JSON stream, as `merge_json_object` does, yielding between items so that large
+        values are merged in steps. The merged value is returned by the generator.
+
+        :param node: SchemaNode object
+        :param base: JSON object
+        :param reader: JSONStreamReader object
+        """
+        data = yield from reader.iter_value()
+        return cls.merge_json_object(node, base, data)
+
+    @property
+    def json_path(self) -> tuple:
+        """Path of object keys and array indices from the root widget to this widget"""
+        if self.parent is None:
+            return ()
+        return self.parent.json_path + (self.parent.get_child_key(self),)
+
+    @property
+    def is_dump_cached(self) -> bool:
+        """Whether the value of this widget is unchanged since it was last dumped"""
+        return self._dumped_value is not _NOT_DUMPED
+
     def dump_json_object(self):
+        """Return the value of this widget.
+
+        The value is cached until this widget or one of its descendants changes, and containers share the cached
+        values of their children, so the returned object must not be modified.
+        """
+        if self._dumped_value is _NOT_DUMPED:
+            self._dumped_value = self._dump_json_object()
+        return self._dumped_value
+
+    def _dump_json_object(self):
         raise NotImplementedError
 
+    def dump_json_source(self):
+        """Return the value of this widget for `iter_encode`, in which the children of containers may be produced
+        when they are encoded"""
+        return self.dump_json_object()
+
+    def get_child_key(self, child: 'JSONBaseWidget'):
+        """Return the object key or array index of a child widget
+
+        :param child: child widget
+        """
+        raise LookupError(child)
+
     def initialise(self):
         if 'default' in self.schema:
             self.load_json_object(self.schema['default'])
@@ -101,6 +249,81 @@ class JSONBaseWidget:
     def load_json_object(self, data):
         raise NotImplementedError
 
+    def apply_patch_operation(self, op: str, path: tuple, value=None):
+        """Apply a JSON Patch operation to the value of this widget
+
+        :param op: 'add', 'remove' or 'replace'
+        :param path: sequence of object keys and array indices, relative to this widget
+        :param value: added or replacing value
+        """
+        if path or op != 'replace':
+            raise LookupError(path)
+
+        self.load_json_object(value)
+
+    def iter_load_json_object(self, reader: JSONStreamReader):
+        """Load the next value from a JSON stream, yielding between items so that large values are loaded in steps
+
+        :param reader: JSONStreamReader object
+        """
+        self.load_json_object(reader.read_value())
+        yield
+
+    def _notify_value_changed(self, *args):
+        """Invalidate the dumped value of this widget and its ancestors, and emit valueChanged on each of them.
+
+        Propagation of the signal stops at the first widget whose signals are blocked.
+        """
+        self._invalidate_dumped_value()
+
+        widget = self
+        while widget is not None and not widget.signalsBlocked():
+            widget.valueChanged.emit(self)
+            widget = widget.parent
+
+    def _record_edit(self, op: str, value=None, old_value=None, key=None):
+        """Emit edited on the root widget for an edit of this widget, or of its item at key.
+
+        Edits are not recorded whilst the signals of this widget or any of its ancestors are blocked (e.g. whilst
+        loading), or if this widget is not attached to the root.
+
+        :param op: 'add', 'remove' or 'replace'
+        :param value: added or replacing value
+        :param old_value: removed or replaced value
+        :param key: object key or array index of an added or removed item
+        """
+        root = self
+        while root.parent is not None:
+            if root.signalsBlocked():
+                return
+            root = root.parent
+
+        if root.signalsBlocked() or not root.receivers(root.edited):
+            return
+
+        try:
+            path = self.json_path
+        except LookupError:
+            return
+
+        if key is not None:
+            path += (key,)
+
+        root.edited.emit(PatchOperation(op, path, value, old_value))
+
+    def _invalidate_dumped_value(self):
+        """Invalidate the dumped value of this widget and its ancestors, regardless of blocked signals.
+
+        A container is dumped from its children, so the ancestors of an invalidated widget are already invalidated,
+        and the walk stops there. It also stops at a widget which its parent does not dump from.
+        """
+        widget = self
+        while widget is not None and widget._dumped_value is not _NOT_DUMPED:
+            widget._dumped_value = _NOT_DUMPED
+            if not widget._is_dumped_by_parent:
+                break
+            widget = widget.parent
+
 
 class UnsupportedSchemaWidget(JSONBaseWidget, QtWidgets.QLabel):
     """Widget representation of an unsupported schema element.
@@ -109,18 +332,26 @@ class UnsupportedSchemaWidget(JSONBaseWidget, QtWidgets.QLabel):
     If the element is a reference, the reference name is listed instead of a type.
     """
 
-    def __init__(self, name: str, schema: dict, ctx: Context, parent: JSONBaseWidget):
-        super().__init__(name, schema, ctx, parent)
+    def __init__(self, name: str, node: SchemaNode, parent: JSONBaseWidget):
+        super().__init__(name, node, parent)
 
         QtWidgets.QLabel.__init__(self, "(Unsupported schema entry: {}, {})"
-                                  .format(name, schema.get("type", "(?)")), parent)
+                                  .format(name, self.schema.get("type", "(?)")), parent)
         self.setStyleSheet("QLabel { font-style: italic; }")
 
     @classmethod
     def supports_schema(cls, schema: dict) -> bool:
         return True
 
-    def dump_json_object(self):
+    @classmethod
+    def get_empty_json_object(cls, node: SchemaNode):
+        return "(unsupported)"
+
+    @classmethod
+    def merge_json_object(cls, node: SchemaNode, base, data):
+        return "(unsupported)"
+
+    def _dump_json_object(self):
         return "(unsupported)"
 
     def load_json_object(self, value):
@@ -132,10 +363,17 @@ class JSONObjectWidget(JSONBaseWidget, QtWidgets.QGroupBox):
 
     Objects have properties, each of which is a widget of its own.
     We display these in a group-box, which on most platforms will include a border.
+
+    Objects nested within other objects are collapsed, and their property widgets are only created when first expanded.
+    Until then, loaded values are held as plain JSON data.
     """
 
-    def __init__(self, name: str, schema: dict, ctx: Context, parent: JSONBaseWidget):
-        super().__init__(name, schema, ctx, parent)
+    SCHEMA_TYPE = 'object'
+    # Objects with an enum are still edited as objects
+    PRIORITY = 2
+
+    def __init__(self, name: str, node: SchemaNode, parent: JSONBaseWidget):
+        super().__init__(name, node, parent)
 
         self.setTitle(self.name)
         self.layout = QtWidgets.QVBoxLayout()
@@ -143,32 +381,117 @@ class JSONObjectWidget(JSONBaseWidget, QtWidgets.QGroupBox):
         self.setLayout(self.layout)
         self.setFlat(False)
 
-        if "description" in schema:
-            self.setToolTip(schema['description'])
+        if node.description is not None:
+            self.setToolTip(node.description)
 
         self.properties = {}
 
-        if "properties" not in schema:
-            label = QtWidgets.QLabel("Invalid object description (missing properties)", self)
-            label.setStyleSheet("QLabel { color: red; }")
-            self.layout.addWidget(label)
+        self._is_built = False
+        self._pending_data = None
 
-        else:
-            for k, v in schema['properties'].items():
-                widget = _create_widget(k, v, ctx, self)
-                self.layout.addWidget(widget)
-                self.properties[k] = widget
+        self._expand_button = QtWidgets.QToolButton(self)
+        self._expand_button.setCheckable(True)
+        self._expand_button.setAutoRaise(True)
+        self._expand_button.toggled.connect(self.set_expanded)
+        self.layout.addWidget(self._expand_button)
 
-                # TODO pattern properties control widget
+        self._content = QtWidgets.QWidget(self)
+        self.properties_layout = QtWidgets.QVBoxLayout(self._content)
+        self.properties_layout.setAlignment(QtCore.Qt.AlignTop)
+        self.properties_layout.setContentsMargins(0, 0, 0, 0)
+        self.layout.addWidget(self._content)
+
+        is_collapsed = isinstance(parent, JSONObjectWidget)
+        self._expand_button.setVisible(is_collapsed)
+        self._expand_button.setChecked(not is_collapsed)
+        self.set_expanded(not is_collapsed)
+
+    @property
+    def is_built(self) -> bool:
+        return self._is_built
+
+    @property
+    def is_expanded(self) -> bool:
+        return self._content.isVisible()
 
     @classmethod
     def supports_schema(cls, schema: dict) -> bool:
         return schema.get("type") == "object"
 
-    def dump_json_object(self) -> dict:
+    @classmethod
+    def get_empty_json_object(cls, node: SchemaNode) -> dict:
+        return {k: merge_json_objects(n.default_value, None) for k, n in node.properties.items()}
+
+    @classmethod
+    def get_recursive_json_object(cls, node: SchemaNode) -> dict:
+        # Properties are filled in from their nodes when values are merged into the object
+        return {}
+
+    @classmethod
+    def merge_json_object(cls, node: SchemaNode, base, data) -> dict:
+        # Copies are not filled in from the node, which would not terminate for recursive values
+        if not isinstance(data, dict):
+            return merge_json_objects(base, None)
+        if not isinstance(base, dict):
+            base = {}
+
+        return {k: n.widget_class.merge_json_object(n, base[k] if k in base else n.default_value, data.get(k))
+                for k, n in node.properties.items()}
+
+    @classmethod
+    def iter_merge_json_stream(cls, node: SchemaNode, base, reader: JSONStreamReader):
+        if reader.peek() != '{':
+            yield from reader.iter_value()
+            return merge_json_objects(base, None)
+
+        if not isinstance(base, dict):
+            base = {}
+
+        merged = {}
+        for k in reader.iter_object():
+            try:
+                n = node.properties[k]
+            except KeyError:
+                yield from reader.iter_value()
+            else:
+                b = merged[k] if k in merged else base[k] if k in base else n.default_value
+                merged[k] = yield from n.widget_class.iter_merge_json_stream(n, b, reader)
+            yield
+
+        # Merged values are ordered as the properties of the node
+        result = {}
+        for k, n in node.properties.items():
+            if k in merged:
+                result[k] = merged.pop(k)
+            else:
+                result[k] = n.widget_class.merge_json_object(n, base[k] if k in base else n.default_value, None)
+            yield
+        return result
+
+    def _dump_json_object(self) -> dict:
+        if not self._is_built:
+            if self._pending_data is None:
+                return merge_json_objects(self.node.default_value, None)
+            return merge_json_objects(self._pending_data, None)
+
         return {k: v.dump_json_object() for k, v in self.properties.items()}
 
+    def get_child_key(self, child: JSONBaseWidget) -> str:
+        if self.properties.get(child.name) is not child:
+            raise LookupError(child)
+        return child.name
+
+    def dump_json_source(self):
+        if not self._is_built or self.is_dump_cached:
+            return self.dump_json_object()
+        return JSONObjectSource(lambda: ((k, w.dump_json_source()) for k, w in self.properties.items()))
+
     def load_json_object(self, data: dict):
+        if not self._is_built:
+            self._pending_data = self.merge_json_object(self.node, self.dump_json_object(), data)
+            self._notify_value_changed()
+            return
+
         for k, v in data.items():
             try:
                 widget = self.properties[k]
@@ -177,46 +500,154 @@ class JSONObjectWidget(JSONBaseWidget, QtWidgets.QGroupBox):
 
             widget.load_json_object(v)
 
+    def apply_patch_operation(self, op: str, path: tuple, value=None):
+        if not path:
+            super().apply_patch_operation(op, path, value)
+
+        elif not self._is_built:
+            self.load_json_object(apply_patch_operation(self.dump_json_object(), op, path, value))
+
+        else:
+            self.properties[path[0]].apply_patch_operation(op, path[1:], value)
+
+    def iter_load_json_object(self, reader: JSONStreamReader):
+        # Unbuilt objects hold plain data, into which the stream is merged
+        if not self._is_built:
+            self._pending_data = yield from self.iter_merge_json_stream(self.node, self.dump_json_object(), reader)
+            self._notify_value_changed()
+            return
+
+        if reader.peek() != '{':
+            yield from super().iter_load_json_object(reader)
+            return
+
+        for k in reader.iter_object():
+            try:
+                widget = self.properties[k]
+            except KeyError:
+                reader.skip_value()
+                continue
+
+            yield from widget.iter_load_json_object(reader)
+
+    def set_expanded(self, expanded: bool):
+        """Show or hide the property widgets, creating them when first shown
+
+        :param expanded: whether to expand the object
+        """
+        if expanded and not self._is_built:
+            self._build_properties()
+
+        self._expand_button.setArrowType(QtCore.Qt.DownArrow if expanded else QtCore.Qt.RightArrow)
+        self._expand_button.setChecked(expanded)
+        self._content.setVisible(expanded)
+
+    def _build_properties(self):
+        self._is_built = True
+
+        if "properties" not in self.schema:
+            label = QtWidgets.QLabel("Invalid object description (missing properties)", self)
+            label.setStyleSheet("QLabel { color: red; }")
+            self.properties_layout.addWidget(label)
+            return
+
+        # Restoring pending data does not change the value of this object
+        was_blocked = self.blockSignals(True)
+
+        try:
+            for k, property_node in self.node.properties.items():
+                widget = _create_widget(k, property_node, self)
+                self.properties_layout.addWidget(widget)
+                self.properties[k] = widget
+
+                # TODO pattern properties control widget
+
+            if self._pending_data is not None:
+                self.load_json_object(self._pending_data)
+                self._pending_data = None
+
+        finally:
+            self.blockSignals(was_blocked)
+
+        # The value is unchanged, but was cached from pending data rather than dumped from the new property widgets
+        self._invalidate_dumped_value()
+
 
 class JSONPrimitiveBaseWidget(JSONBaseWidget, QtWidgets.QWidget):
     """Base class for JSON serialising widgets which have a single input widget"""
 
     PRIMITIVE_CLASS = not_implemented_property()
+    PRIMITIVE_SIGNAL = not_implemented_property()
 
-    def __init__(self, name: str, schema: dict, ctx: Context, parent: JSONBaseWidget):
-        super().__init__(name, schema, ctx, parent)
+    def __init__(self, name: str, node: SchemaNode, parent: JSONBaseWidget):
+        super().__init__(name, node, parent)
         layout = QtWidgets.QHBoxLayout()
 
-        self.label = QtWidgets.QLabel(schema.get('title', name))
-        if "description" in schema:
-            self.label.setToolTip(schema['description'])
+        self.label = QtWidgets.QLabel(node.title or name)
+        if node.description is not None:
+            self.label.setToolTip(node.description)
 
         self._primitive_widget = self._create_primitive_widget()
+        getattr(self._primitive_widget, self.PRIMITIVE_SIGNAL).connect(self._primitive_value_changed)
 
         layout.addWidget(self.label)
         layout.addWidget(self._primitive_widget)
 
         self.setLayout(layout)
 
+    def initialise(self):
+        super().initialise()
+
+        # The cached value is the old value of the next edit
+        self.dump_json_object()
+
     def _create_primitive_widget(self):
         return self.PRIMITIVE_CLASS(self)
 
+    def _primitive_value_changed(self, *args):
+        old_value = self._dumped_value
+        self._notify_value_changed()
+
+        value = self.dump_json_object()
+        if old_value is not _NOT_DUMPED and value != old_value:
+            self._record_edit('replace', value, old_value)
+
+
 class JSONEnumWidget(JSONPrimitiveBaseWidget):
     """Widget representation of an enumerated property."""
 
+    SCHEMA_HAS_ENUM = True
+    PRIORITY = 1
+
     PRIMITIVE_CLASS = QtWidgets.QComboBox
+    PRIMITIVE_SIGNAL = 'currentIndexChanged'
 
-    def __init__(self, name: str, schema: dict, ctx: Context, parent: JSONBaseWidget):
-        super().__init__(name, schema, ctx, parent)
+    def __init__(self, name: str, node: SchemaNode, parent: JSONBaseWidget):
+        super().__init__(name, node, parent)
 
-        self._enum_values = schema['enum']
-        self._primitive_widget.addItems([str(e) for e in schema['enum']])
+        self._enum_values = self.schema['enum']
+        self._primitive_widget.addItems(node.options['labels'])
 
     @classmethod
     def supports_schema(cls, schema: dict) -> bool:
         return "enum" in schema
 
-    def dump_json_object(self):
+    @classmethod
+    def compile_options(cls, node: SchemaNode) -> dict:
+        return {'labels': [str(e) for e in node.schema['enum']]}
+
+    @classmethod
+    def get_empty_json_object(cls, node: SchemaNode):
+        return node.schema['enum'][0]
+
+    @classmethod
+    def merge_json_object(cls, node: SchemaNode, base, data):
+        # Values which are not enumerated are rejected by the widget
+        if data is not None and data in node.schema['enum']:
+            return data
+        return base
+
+    def _dump_json_object(self):
         index = self._primitive_widget.currentIndex()
         return self._enum_values[index]
 
@@ -228,14 +659,22 @@ class JSONEnumWidget(JSONPrimitiveBaseWidget):
 class JSONColorStringWidget(JSONPrimitiveBaseWidget):
     """Widget representation of a string with the 'color' format keyword."""
 
+    SCHEMA_TYPE = 'string'
+    SCHEMA_FORMAT = 'color'
+
     PRIMITIVE_CLASS = QColorButton
+    PRIMITIVE_SIGNAL = 'colorChanged'
 
     @classmethod
     def supports_schema(cls, schema: dict) -> bool:
         return (schema.get('type') == 'string' and
                 schema.get('format') == 'color')
 
-    def dump_json_object(self) -> str:
+    @classmethod
+    def get_empty_json_object(cls, node: SchemaNode):
+        return None
+
+    def _dump_json_object(self) -> str:
         return self._primitive_widget.color()
 
     def load_json_object(self, data: str):
@@ -244,6 +683,13 @@ class JSONColorStringWidget(JSONPrimitiveBaseWidget):
 
 class JSONDateTimeStringWidget(JSONPrimitiveBaseWidget):
     """Widget representation of a string with the 'date-time' format keyword."""
+
+    SCHEMA_TYPE = 'string'
+    SCHEMA_FORMAT = 'date-time'
+
+    PRIMITIVE_SIGNAL = 'dateTimeChanged'
+    DATE_TIME_FORMAT = "yyyy-MM-ddThh:mm:ssZ"
+
     def _create_primitive_widget(self):
         widget = QtWidgets.QDateTimeEdit()
         widget.setCalendarPopup(True)
@@ -254,12 +700,18 @@ class JSONDateTimeStringWidget(JSONPrimitiveBaseWidget):
         return (schema.get('type') == 'string' and
                 schema.get('format') == 'date-time')
 
-    def dump_json_object(self) -> str:
+    @classmethod
+    def get_empty_json_object(cls, node: SchemaNode) -> str:
+        # QDateTimeEdit defaults to the start of the year 2000
+        date_time = QtCore.QDateTime(QtCore.QDate(2000, 1, 1), QtCore.QTime(0, 0))
+        return date_time.toString(cls.DATE_TIME_FORMAT)
+
+    def _dump_json_object(self) -> str:
         date_time = self._primitive_widget.dateTime()
-        return date_time.toString("yyyy-MM-ddThh:mm:ssZ")
+        return date_time.toString(self.DATE_TIME_FORMAT)
 
     def load_json_object(self, data: str):
-        date_time = QtCore.QDateTime.fromString(data, "yyyy-MM-ddThh:mm:ssZ")
+        date_time = QtCore.QDateTime.fromString(data, self.DATE_TIME_FORMAT)
         self._primitive_widget.setDateTime(date_time)
 
 
@@ -270,43 +722,65 @@ class JSONStringWidget(JSONPrimitiveBaseWidget):
     Strings are text boxes with labels for names.
     """
 
+    SCHEMA_TYPE = 'string'
+    PRIORITY = -1
+
     PRIMITIVE_CLASS = QtWidgets.QLineEdit
+    PRIMITIVE_SIGNAL = 'textChanged'
+
+    # Delay between the last edit and validation of the text (ms)
+    VALIDATION_INTERVAL = 150
 
-    def __init__(self, name: str, schema: dict, ctx: Context, parent: JSONBaseWidget):
-        super().__init__(name, schema, ctx, parent)
+    def __init__(self, name: str, node: SchemaNode, parent: JSONBaseWidget):
+        super().__init__(name, node, parent)
 
+        schema = self.schema
         self._validator = ValidationFormatter(self._primitive_widget)
+        self._validation_timer = None
 
-        if 'pattern' in schema:
-            pattern = schema["pattern"]
-            self._validator.add_validator(RegexValidator(pattern))
+        for validator in node.options['validators']:
+            self._validator.add_validator(validator)
 
         if 'format' in schema:
-            format = schema["format"]
-            self._validator.add_validator(FormatValidator(format))
-
-            if format == 'uri':
+            if schema["format"] == 'uri':
                 dialogue_button = QtWidgets.QPushButton()
                 icon = dialogue_button.style().standardIcon(QtWidgets.QStyle.SP_FileLinkIcon)
                 dialogue_button.setIcon(icon)
                 dialogue_button.clicked.connect(self._load_uri_from_file)
                 self.layout().addWidget(dialogue_button)
 
-        if 'minLength' in schema:
-            min_length = schema["minLength"]
-            self._validator.add_validator(LengthValidator(minimum=min_length))
-
         max_length = schema.get("maxLength")
         if max_length is not None:
             self._primitive_widget.setMaxLength(max_length)
 
-        self._primitive_widget.textChanged.connect(self._validate_text)
+        if node.options['validators']:
+            self._primitive_widget.textChanged.connect(self._schedule_validation)
 
     @classmethod
     def supports_schema(cls, schema):
         return schema.get('type') == 'string'
 
-    def dump_json_object(self):
+    @classmethod
+    def compile_options(cls, node: SchemaNode) -> dict:
+        schema = node.schema
+        validators = []
+
+        if 'pattern' in schema:
+            validators.append(intern_validator(RegexValidator, schema["pattern"]))
+
+        if 'format' in schema:
+            validators.append(intern_validator(FormatValidator, schema["format"]))
+
+        if 'minLength' in schema:
+            validators.append(intern_validator(LengthValidator, schema["minLength"]))
+
+        return {'validators': validators}
+
+    @classmethod
+    def get_empty_json_object(cls, node: SchemaNode) -> str:
+        return ""
+
+    def _dump_json_object(self):
         return str(self._primitive_widget.text())
 
     def load_json_object(self, data):
@@ -319,6 +793,16 @@ class JSONStringWidget(JSONPrimitiveBaseWidget):
 
         self._primitive_widget.setText(url.toString())
 
+    def _schedule_validation(self):
+        # Timers are only created for fields which are edited
+        if self._validation_timer is None:
+            self._validation_timer = QtCore.QTimer(self)
+            self._validation_timer.setSingleShot(True)
+            self._validation_timer.setInterval(self.VALIDATION_INTERVAL)
+            self._validation_timer.timeout.connect(self._validate_text)
+
+        self._validation_timer.start()
+
     def _validate_text(self):
         self._validator(self._primitive_widget.text())
 
@@ -327,40 +811,94 @@ class SpinBoxWidgetBase(JSONPrimitiveBaseWidget):
     """Base class for spinbox JSON serialising widgets."""
 
     PRIMITIVE_CLASS = not_implemented_property()
+    DEFAULT_RANGE = not_implemented_property()
+    VALUE_TYPE = not_implemented_property()
     step = not_implemented_property()
+    decimals = not_implemented_property()
 
-    def __init__(self, name: str, schema: dict, ctx: Context, parent: JSONBaseWidget):
-        super().__init__(name, schema, ctx, parent)
+    def __init__(self, name: str, node: SchemaNode, parent: JSONBaseWidget):
+        super().__init__(name, node, parent)
 
-        self._set_limits(schema)
+        self._set_limits(*node.options['limits'])
 
-    def dump_json_object(self):
+    @classmethod
+    def compile_options(cls, node: SchemaNode) -> dict:
+        return {'limits': cls._get_limits(node.schema)}
+
+    @classmethod
+    def get_empty_json_object(cls, node: SchemaNode):
+        # Emulate the spinbox clamping its initial value of zero
+        return cls._clamp_value(node, 0)
+
+    @classmethod
+    def merge_json_object(cls, node: SchemaNode, base, data):
+        # Emulate the spinbox clamping a loaded value. Other values are rejected by the spinbox
+        if isinstance(data, bool) or not isinstance(data, (int, cls.VALUE_TYPE)):
+            return super().merge_json_object(node, base, data)
+        return cls._clamp_value(node, data)
+
+    @classmethod
+    def _clamp_value(cls, node: SchemaNode, value):
+        """Return value clamped to the range of the spinbox for a schema node, and rounded to its decimals
+
+        :param node: SchemaNode object
+        :param value: number
+        """
+        # The range is that of a spinbox whose limits are set in turn
+        minimum, maximum = cls.DEFAULT_RANGE
+        schema_minimum, schema_maximum = node.options['limits']
+
+        if schema_minimum is not None:
+            minimum = schema_minimum
+            maximum = max(maximum, minimum)
+
+        if schema_maximum is not None:
+            maximum = schema_maximum
+            minimum = min(minimum, maximum)
+
+        return cls.VALUE_TYPE(round(min(max(value, minimum), maximum), cls.decimals))
+
+    def _dump_json_object(self):
         return self._primitive_widget.value()
 
     def load_json_object(self, data):
         self._primitive_widget.setValue(data)
 
-    def _set_limits(self, schema: dict):
+    @classmethod
+    def _get_limits(cls, schema: dict) -> tuple:
+        minimum = maximum = None
+
         if "minimum" in schema:
             minimum = schema['minimum']
             if schema.get("exclusiveMinimum", False):
-                minimum += self.step
-
-            self._primitive_widget.setMinimum(minimum)
+                minimum += cls.step
 
         if "maximum" in schema:
             maximum = schema['maximum']
             if schema.get("exclusiveMaximum", False):
-                maximum -= self.step
+                maximum -= cls.step
 
+        return minimum, maximum
+
+    def _set_limits(self, minimum, maximum):
+        if minimum is not None:
+            self._primitive_widget.setMinimum(minimum)
+
+        if maximum is not None:
             self._primitive_widget.setMaximum(maximum)
 
 
 class JSONIntegerWidget(SpinBoxWidgetBase):
     """Widget representation of an integer (SpinBox)."""
 
+    SCHEMA_TYPE = 'integer'
+
     PRIMITIVE_CLASS = QtWidgets.QSpinBox
+    PRIMITIVE_SIGNAL = 'valueChanged'
+    DEFAULT_RANGE = 0, 99
+    VALUE_TYPE = int
     step = 1
+    decimals = 0
 
     @classmethod
     def supports_schema(cls, schema):
@@ -370,8 +908,14 @@ class JSONIntegerWidget(SpinBoxWidgetBase):
 class JSONNumberWidget(SpinBoxWidgetBase):
     """Widget representation of a number (DoubleSpinBox)."""
 
+    SCHEMA_TYPE = 'number'
+
     PRIMITIVE_CLASS = QtWidgets.QDoubleSpinBox
+    PRIMITIVE_SIGNAL = 'valueChanged'
+    DEFAULT_RANGE = 0, 99.99
+    VALUE_TYPE = float
     step = 0.01
+    decimals = 2
 
     @classmethod
     def supports_schema(cls, schema):
@@ -381,27 +925,36 @@ class JSONNumberWidget(SpinBoxWidgetBase):
 class JSONBooleanWidget(JSONPrimitiveBaseWidget):
     """Widget representing a boolean (CheckBox)."""
 
+    SCHEMA_TYPE = 'boolean'
+
     PRIMITIVE_CLASS = QtWidgets.QCheckBox
+    PRIMITIVE_SIGNAL = 'toggled'
 
     @classmethod
     def supports_schema(cls, schema):
         return schema.get('type') == 'boolean'
 
-    def dump_json_object(self):
+    @classmethod
+    def get_empty_json_object(cls, node: SchemaNode) -> bool:
+        return False
+
+    def _dump_json_object(self):
         return self._primitive_widget.isChecked()
 
     def load_json_object(self, data):
         self._primitive_widget.setChecked(data)
 
 
-class JSONArrayWidget(JSONBaseWidget, QtWidgets.QWidget):
-    """Widget representation of an array.
+class JSONArrayWidgetBase(JSONBaseWidget, QtWidgets.QWidget):
+    """Base class for widget representations of an array.
 
     Arrays can contain multiple objects of a type, or they can contain objects of specific types.
     We include a label and button for adding types. """
 
-    def __init__(self, name: str, schema: dict, ctx: Context, parent: JSONBaseWidget):
-        super().__init__(name, schema, ctx, parent)
+    SCHEMA_TYPE = 'array'
+
+    def __init__(self, name: str, node: SchemaNode, parent: JSONBaseWidget):
+        super().__init__(name, node, parent)
 
         self.layout = QtWidgets.QVBoxLayout()
         self.controls_layout = QtWidgets.QHBoxLayout()
@@ -409,8 +962,8 @@ class JSONArrayWidget(JSONBaseWidget, QtWidgets.QWidget):
 
         label = QtWidgets.QLabel(name, self)
         label.setStyleSheet("QLabel { font-weight: bold; }")
-        if "description" in schema:
-            label.setToolTip(schema['description'])
+        if node.description is not None:
+            label.setToolTip(node.description)
 
         append_button = QtWidgets.QPushButton("", self)
         icon = append_button.style().standardIcon(QtWidgets.QStyle.SP_FileIcon)
@@ -434,37 +987,51 @@ class JSONArrayWidget(JSONBaseWidget, QtWidgets.QWidget):
 
         self.layout.addLayout(self.controls_layout)
 
-        self.items_list = QtWidgets.QListWidget(self)
-        self.widget_stack = QtWidgets.QStackedWidget(self)
-
-        self.items_list.currentItemChanged.connect(self._current_item_changed)
-
-        self.layout.addWidget(self.items_list)
-        self.layout.addWidget(self.widget_stack)
-
         self.setLayout(self.layout)
 
-        try:
-            self.items_schema = schema['items']
-        except KeyError:
+        if node.items is None:
             raise UnsupportedSchemaError("Arrays require items")
 
-        self.additional_item_schema = schema.get("additionalItems")
-
     @classmethod
     def supports_schema(cls, schema):
         return schema.get('type') == 'array'
 
-    def add_item(self, data=None):
-        index = self.items_list.count()
-        schema = self._get_item_schema(index)
-        obj = _create_widget("Item #{:d}".format(index), schema, self.ctx, self)
+    @classmethod
+    def get_empty_json_object(cls, node: SchemaNode) -> list:
+        return []
 
-        self.items_list.addItem("# {}".format(index))
-        self.widget_stack.addWidget(obj)
+    @classmethod
+    def merge_json_object(cls, node: SchemaNode, base, data) -> list:
+        if not isinstance(data, list):
+            return merge_json_objects(base, None)
+        if not isinstance(base, list):
+            base = []
+
+        merged = []
+        for i, d in enumerate(data):
+            n = node.get_item_node(i)
+            merged.append(n.widget_class.merge_json_object(n, base[i] if i < len(base) else n.default_value, d))
+        return merged
+
+    @classmethod
+    def iter_merge_json_stream(cls, node: SchemaNode, base, reader: JSONStreamReader):
+        if reader.peek() != '[':
+            yield from reader.iter_value()
+            return merge_json_objects(base, None)
+
+        if not isinstance(base, list):
+            base = []
+
+        merged = []
+        for i in reader.iter_array():
+            n = node.get_item_node(i)
+            b = base[i] if i < len(base) else n.default_value
+            merged.append((yield from n.widget_class.iter_merge_json_stream(n, b, reader)))
+            yield
+        return merged
 
-        if data is not None:
-            obj.load_json_object(data)
+    def add_item(self, data=None):
+        raise NotImplementedError
 
     def click_add(self):
         self.add_item()
@@ -472,15 +1039,188 @@ class JSONArrayWidget(JSONBaseWidget, QtWidgets.QWidget):
     def click_remove(self):
         self.remove_item()
 
-    def dump_json_object(self):
+    def remove_item(self):
+        raise NotImplementedError
+
+    def _get_item_node(self, index: int) -> SchemaNode:
+        return self.node.get_item_node(index)
+
+
+class WidgetPool:
+    """Bounded pool of detached widgets, held by schema node for reuse.
+
+    When a node's pool is full, its least recently released widget is deleted.
+
+    :param max_size: maximum number of widgets held for each node
+    """
+
+    def __init__(self, max_size: int = 16):
+        self.max_size = max_size
+
+        self._widgets = {}
+
+    def acquire(self, node: SchemaNode) -> JSONBaseWidget:
+        """Return the most recently released widget for node, or None if there are none
+
+        :param node: SchemaNode object
+        """
+        try:
+            return self._widgets[node].pop()
+        except (KeyError, IndexError):
+            return None
+
+    def release(self, widget: JSONBaseWidget):
+        """Add detached widget to the pool
+
+        :param widget: JSONBaseWidget object
+        """
+        widgets = self._widgets.setdefault(widget.node, [])
+        widgets.append(widget)
+
+        if len(widgets) > self.max_size:
+            widgets.pop(0).deleteLater()
+
+    def clear(self):
+        """Delete all pooled widgets"""
+        for widgets in self._widgets.values():
+            for widget in widgets:
+                widget.deleteLater()
+
+        self._widgets.clear()
+
+    def __len__(self):
+        return sum(len(w) for w in self._widgets.values())
+
+
+class JSONArrayWidget(JSONArrayWidgetBase):
+    """Widget representation of an array, with a widget for each item.
+
+    Used for arrays which are known to be small.
+    Removed item widgets are pooled, and reset when they are added again.
+    """
+
+    POOL_SIZE = 16
+
+    def __init__(self, name: str, node: SchemaNode, parent: JSONBaseWidget):
+        super().__init__(name, node, parent)
+
+        self.items_list = QtWidgets.QListWidget(self)
+        self.widget_stack = QtWidgets.QStackedWidget(self)
+
+        self._widget_pool = WidgetPool(self.POOL_SIZE)
+
+        self.items_list.currentItemChanged.connect(self._current_item_changed)
+
+        self.layout.addWidget(self.items_list)
+        self.layout.addWidget(self.widget_stack)
+
+    def add_item(self, data=None):
+        index = self.items_list.count()
+        obj = self._create_item_widget(index, data)
+
+        self.items_list.addItem("# {}".format(index))
+        self.widget_stack.addWidget(obj)
+
+        self._notify_value_changed()
+        self._record_edit('add', obj.dump_json_object(), key=index)
+
+    def apply_patch_operation(self, op: str, path: tuple, value=None):
+        count = self.widget_stack.count()
+
+        # Items are only added and removed at the end of the array
+        if len(path) == 1 and op == 'add':
+            if path[0] != count:
+                raise LookupError(path)
+            self.add_item(value)
+
+        elif len(path) == 1 and op == 'remove':
+            if path[0] != count - 1:
+                raise LookupError(path)
+            self.remove_item()
+
+        elif path:
+            if not 0 <= path[0] < count:
+                raise LookupError(path)
+            self.widget_stack.widget(path[0]).apply_patch_operation(op, path[1:], value)
+
+        else:
+            super().apply_patch_operation(op, path, value)
+
+    def _dump_json_object(self):
         return [w.dump_json_object() for w in iter_widgets(self.widget_stack)]
 
+    def dump_json_source(self):
+        if self.is_dump_cached:
+            return self.dump_json_object()
+        return JSONArraySource(lambda: (w.dump_json_source() for w in iter_widgets(self.widget_stack)))
+
+    def get_child_key(self, child: JSONBaseWidget) -> int:
+        index = self.widget_stack.indexOf(child)
+        if index < 0:
+            raise LookupError(child)
+        return index
+
     def load_json_object(self, data):
-        for i, datum in enumerate(data):
-            if i < self.widget_stack.count():
+        """Load array items in a single batch, removing any surplus items.
+
+        Updates and change notifications are suspended until all items are loaded.
+
+        :param data: JSON array
+        """
+        was_blocked = self.blockSignals(True)
+        self.setUpdatesEnabled(False)
+
+        try:
+            count = self.widget_stack.count()
+
+            for i, datum in enumerate(data[:count]):
                 self.widget_stack.widget(i).load_json_object(datum)
-            else:
-                self.add_item(datum)
+
+            for i, datum in enumerate(data[count:], count):
+                self.widget_stack.addWidget(self._create_item_widget(i, datum))
+
+            self._trim_item_widgets(len(data))
+
+        finally:
+            self._sync_item_labels()
+            self.setUpdatesEnabled(True)
+            self.blockSignals(was_blocked)
+            self._notify_value_changed()
+
+    def iter_load_json_object(self, reader: JSONStreamReader):
+        """Load array items from a JSON stream, one at a time, removing any surplus items.
+
+        :param reader: JSONStreamReader object
+        """
+        if reader.peek() != '[':
+            yield from super().iter_load_json_object(reader)
+            return
+
+        was_blocked = self.blockSignals(True)
+        self.setUpdatesEnabled(False)
+
+        try:
+            count = self.widget_stack.count()
+            length = 0
+
+            for i in reader.iter_array():
+                if i < count:
+                    widget = self.widget_stack.widget(i)
+                else:
+                    widget = self._create_item_widget(i)
+                    self.widget_stack.addWidget(widget)
+
+                yield from widget.iter_load_json_object(reader)
+                length = i + 1
+
+            self._trim_item_widgets(length)
+
+        finally:
+            # Items loaded before the generator is closed, or fails, are kept
+            self._sync_item_labels()
+            self.setUpdatesEnabled(True)
+            self.blockSignals(was_blocked)
+            self._notify_value_changed()
 
     def remove_item(self):
         last_item_index = self.items_list.count() - 1
@@ -489,25 +1229,382 @@ class JSONArrayWidget(JSONBaseWidget, QtWidgets.QWidget):
 
         self.items_list.takeItem(last_item_index)
 
-        widget = self.widget_stack.widget(last_item_index)
-        self.widget_stack.removeWidget(widget)
+        old_value = self.widget_stack.widget(last_item_index).dump_json_object()
+        self._trim_item_widgets(last_item_index)
+
+        self._notify_value_changed()
+        self._record_edit('remove', old_value=old_value, key=last_item_index)
+
+    def _create_item_widget(self, index: int, data=None) -> JSONBaseWidget:
+        """Return widget for the item at index, holding data, reusing a pooled widget if possible
+
+        :param index: array index
+        :param data: JSON object, or None for the default value
+        """
+        node = self._get_item_node(index)
+        widget = self._widget_pool.acquire(node)
+
+        # Items are only added and removed at the end of the array, so a pooled widget was last used at this index
+        if widget is None:
+            widget = _create_widget("Item #{:d}".format(index), node, self)
+            if data is None:
+                return widget
+        else:
+            # Reset to the value of a new widget
+            data = node.widget_class.merge_json_object(node, node.default_value, data)
+
+        # The caller notifies once the item is added
+        was_blocked = widget.blockSignals(True)
+        try:
+            widget.load_json_object(data)
+        finally:
+            widget.blockSignals(was_blocked)
+
+        return widget
+
+    def _trim_item_widgets(self, count: int):
+        """Remove item widgets beyond the first count, releasing them to the pool
+
+        :param count: number of item widgets to keep
+        """
+        # QStackedWidget.removeWidget searches for the widget, so widgets are taken from the end of its layout by index
+        layout = self.widget_stack.layout()
+        for i in reversed(range(count, layout.count())):
+            self._widget_pool.release(layout.takeAt(i).widget())
+
+    def _sync_item_labels(self):
+        """Add or remove item labels to match the item widgets"""
+        count = self.widget_stack.count()
+        label_count = self.items_list.count()
+
+        was_blocked = self.items_list.blockSignals(True)
+        try:
+            for i in reversed(range(count, label_count)):
+                self.items_list.takeItem(i)
+
+            self.items_list.addItems(["# {}".format(i) for i in range(label_count, count)])
+        finally:
+            self.items_list.blockSignals(was_blocked)
 
     def _current_item_changed(self, current, previous):
         index = self.items_list.indexFromItem(current).row()
         self.widget_stack.setCurrentIndex(index)
 
-    def _get_item_schema(self, index):
-        if isinstance(self.items_schema, list):
-            try:
-                schema = self.items_schema[index]
-            except IndexError:
-                schema = self.additional_item_schema
-                assert schema is not None
+
+class JSONArrayItemModel(QtCore.QAbstractListModel):
+    """List model holding the items of a JSON array as plain JSON data"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self._values = []
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._values)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role != QtCore.Qt.DisplayRole:
+            return None
+        return "# {}".format(index.row())
+
+    def values(self) -> list:
+        return self._values
+
+    def value(self, row: int):
+        return self._values[row]
+
+    def set_value(self, row: int, value):
+        self._values[row] = value
+
+    def set_values(self, values: list):
+        self.beginResetModel()
+        self._values = values
+        self.endResetModel()
+
+    def append_value(self, value):
+        row = len(self._values)
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self._values.append(value)
+        self.endInsertRows()
+
+    def pop_value(self):
+        row = len(self._values) - 1
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        value = self._values.pop()
+        self.endRemoveRows()
+        return value
+
+
+class JSONVirtualArrayWidget(JSONArrayWidgetBase):
+    """Widget representation of an array, backed by a list model of JSON data.
+
+    An editor widget is only created for the selected item, and reused between items with the same schema,
+    so the cost of loading and dumping is linear in the data rather than in widgets.
+    Used for arrays whose schema opts in with the HINT_KEYWORD keyword, e.g. ``{"type": "array", "x-virtual": true}``.
+    """
+
+    # Arrays without the hint fall through to JSONArrayWidget
+    PRIORITY = 1
+
+    HINT_KEYWORD = "x-virtual"
+
+    def __init__(self, name: str, node: SchemaNode, parent: JSONBaseWidget):
+        super().__init__(name, node, parent)
+
+        self.items_model = JSONArrayItemModel(self)
+        self.items_view = QtWidgets.QListView(self)
+        self.items_view.setUniformItemSizes(True)
+        self.items_view.setModel(self.items_model)
+        self.items_view.selectionModel().currentChanged.connect(self._current_index_changed)
+
+        self.editor_stack = QtWidgets.QStackedWidget(self)
+        self.editor_stack.setVisible(False)
+
+        self.layout.addWidget(self.items_view)
+        self.layout.addWidget(self.editor_stack)
+
+        self._editors = {}
+        self._current_row = -1
+
+    @classmethod
+    def supports_schema(cls, schema):
+        return schema.get('type') == 'array' and schema.get(cls.HINT_KEYWORD) is True
+
+    @property
+    def current_editor(self) -> JSONBaseWidget:
+        if self._current_row < 0:
+            return None
+        return self.editor_stack.currentWidget()
+
+    def add_item(self, data=None):
+        index = self.items_model.rowCount()
+        node = self._get_item_node(index)
+        value = node.widget_class.merge_json_object(node, node.default_value, data)
+        self.items_model.append_value(value)
+
+        self._notify_value_changed()
+        self._record_edit('add', value, key=index)
+
+    def apply_patch_operation(self, op: str, path: tuple, value=None):
+        count = self.items_model.rowCount()
+
+        # Items are only added and removed at the end of the array
+        if len(path) == 1 and op == 'add':
+            if path[0] != count:
+                raise LookupError(path)
+            self.add_item(value)
+
+        elif len(path) == 1 and op == 'remove':
+            if path[0] != count - 1:
+                raise LookupError(path)
+            self.remove_item()
+
+        elif path:
+            row = path[0]
+            if not 0 <= row < count:
+                raise LookupError(path)
+
+            self.items_model.set_value(row, apply_patch_operation(self.items_model.value(row), op, path[1:], value))
+            if row == self._current_row:
+                self._show_editor(row)
+
+            self._notify_value_changed()
+
+        else:
+            super().apply_patch_operation(op, path, value)
+
+    def _dump_json_object(self):
+        return [merge_json_objects(v, None) for v in self.items_model.values()]
+
+    def dump_json_source(self):
+        # Items are already plain data, and are encoded without copying
+        return self.items_model.values()
+
+    def get_child_key(self, child: JSONBaseWidget) -> int:
+        if child is not self.current_editor:
+            raise LookupError(child)
+        return self._current_row
+
+    def load_json_object(self, data):
+        self._set_loaded_values(self.merge_json_object(self.node, self.items_model.values(), data))
+
+    def iter_load_json_object(self, reader: JSONStreamReader):
+        """Load array items from a JSON stream, one at a time.
+
+        Items are merged into the model as they are decoded, so the array is never held twice.
+
+        :param reader: JSONStreamReader object
+        """
+        if reader.peek() != '[':
+            yield from super().iter_load_json_object(reader)
+            return
+
+        values = self.items_model.values()
+        loaded = []
+
+        for i in reader.iter_array():
+            node = self._get_item_node(i)
+            base = values[i] if i < len(values) else node.default_value
+            loaded.append(node.widget_class.merge_json_object(node, base, reader.read_value()))
+            yield
+
+        self._set_loaded_values(loaded)
+
+    def _set_loaded_values(self, loaded: list):
+        current_row = self._current_row
+        self.items_model.set_values(loaded)
+        self._select_row(current_row if current_row < len(loaded) else -1)
+
+        self._notify_value_changed()
+
+    def remove_item(self):
+        last_item_index = self.items_model.rowCount() - 1
+        if last_item_index < 0:
+            return
+
+        if self._current_row == last_item_index:
+            self._select_row(-1)
+
+        old_value = self.items_model.pop_value()
+
+        self._notify_value_changed()
+        self._record_edit('remove', old_value=old_value, key=last_item_index)
+
+    def _current_index_changed(self, current, previous):
+        row = current.row() if current.isValid() else -1
+        self._show_editor(row)
+
+    def _editor_value_changed(self, source):
+        if self._current_row >= 0:
+            self.items_model.set_value(self._current_row, self.current_editor.dump_json_object())
+            # The editor is not dumped with the array, so its changes are not invalidated beyond it
+            self._invalidate_dumped_value()
+
+    def _get_editor(self, index: int) -> JSONBaseWidget:
+        node = self._get_item_node(index)
+
+        try:
+            editor = self._editors[node]
+        except KeyError:
+            editor = self._editors[node] = _create_widget("Item", node, self)
+            editor._is_dumped_by_parent = False
+            editor.valueChanged.connect(self._editor_value_changed)
+            self.editor_stack.addWidget(editor)
+
+        return editor
+
+    def _select_row(self, row: int):
+        if row < 0:
+            self.items_view.selectionModel().clearCurrentIndex()
         else:
-            assert isinstance(self.items_schema, dict)
-            schema = self.items_schema
+            self.items_view.setCurrentIndex(self.items_model.index(row))
+
+        self._show_editor(row)
+
+    def _show_editor(self, row: int):
+        self._current_row = -1
+
+        if row < 0:
+            self.editor_stack.setVisible(False)
+            return
+
+        editor = self._get_editor(row)
+
+        # Loading the item value does not change the value of this array
+        was_blocked = editor.blockSignals(True)
+        try:
+            editor.load_json_object(self.items_model.value(row))
+        finally:
+            editor.blockSignals(was_blocked)
+
+        self.editor_stack.setCurrentWidget(editor)
+        self.editor_stack.setVisible(True)
+        self._current_row = row
+
+
+class WidgetClassRegistry:
+    """Registry of widget classes, indexed by schema 'type', 'format' and presence of 'enum'.
 
-        return schema
+    Each lookup key maps to the registered classes which may support it, in descending priority (then registration
+    order). Candidates are confirmed with `supports_schema`, and the fallback class is used if none support the schema.
+
+    :param fallback_widget_class: widget class for unsupported schemas
+    """
+
+    def __init__(self, fallback_widget_class: type):
+        self.fallback_widget_class = fallback_widget_class
+
+        self._entries = []
+        self._candidates = {}
+
+    def register(self, widget_class: type, priority: int = None):
+        """Register widget class, indexed by its SCHEMA_TYPE, SCHEMA_FORMAT and SCHEMA_HAS_ENUM attributes
+
+        :param widget_class: JSONBaseWidget subclass
+        :param priority: priority relative to other candidates (widget class PRIORITY if omitted)
+        """
+        if priority is None:
+            priority = widget_class.PRIORITY
+
+        self._entries.append((-priority, len(self._entries), widget_class))
+        self._entries.sort(key=lambda e: e[:2])
+        self._candidates.clear()
+
+    def unregister(self, widget_class: type):
+        """Remove widget class from registry
+
+        :param widget_class: JSONBaseWidget subclass
+        """
+        self._entries = [e for e in self._entries if e[2] is not widget_class]
+        self._candidates.clear()
+
+    def get_candidates(self, key: tuple) -> tuple:
+        """Return widget classes which may support schemas with the given key, in the order they are tried
+
+        :param key: (type, format, has_enum) tuple
+        """
+        try:
+            return self._candidates[key]
+        except KeyError:
+            pass
+
+        schema_type, schema_format, has_enum = key
+        candidates = self._candidates[key] = tuple(
+            c for _, _, c in self._entries
+            if c.SCHEMA_TYPE in (None, schema_type) and c.SCHEMA_FORMAT in (None, schema_format)
+            and c.SCHEMA_HAS_ENUM in (None, has_enum)
+        )
+        return candidates
+
+    @staticmethod
+    def get_schema_key(schema: dict) -> tuple:
+        """Return (type, format, has_enum) lookup key for schema
+
+        :param schema: dict-like JSON schema
+        """
+        schema_type = schema.get('type')
+        schema_format = schema.get('format')
+
+        # Unions of types, and invalid values, match only wildcard entries
+        if not isinstance(schema_type, str):
+            schema_type = None
+        if not isinstance(schema_format, str):
+            schema_format = None
+
+        return schema_type, schema_format, 'enum' in schema
+
+    def get_widget_class(self, schema: dict) -> type:
+        """Return widget class for resolved schema
+
+        :param schema: dict-like JSON schema
+        """
+        for widget_class in self.get_candidates(self.get_schema_key(schema)):
+            if widget_class.supports_schema(schema):
+                return widget_class
+
+        return self.fallback_widget_class
 
 
 supported_widgets = (
@@ -516,52 +1613,52 @@ supported_widgets = (
     JSONIntegerWidget,
     JSONNumberWidget,
     JSONBooleanWidget,
+    JSONVirtualArrayWidget,
     JSONArrayWidget,
     JSONDateTimeStringWidget,
     JSONColorStringWidget,
     JSONStringWidget,
 )
 
+default_widget_registry = WidgetClassRegistry(UnsupportedSchemaWidget)
+for widget_class in supported_widgets:
+    default_widget_registry.register(widget_class)
+
 
-def create_widget(name: str, schema: dict, schema_uri: str = None) -> JSONBaseWidget:
+def create_widget(name: str, schema: dict, schema_uri: str = None, registry: URILoaderRegistry = None,
+                  widget_registry: WidgetClassRegistry = None) -> JSONBaseWidget:
     """Create widget according to given JSON schema.
     if `schema_uri` is omitted, external references may only be resolved against absolute URI `id` fields--
     
     :param name: widget name
     :param schema: dict-like JSON object
     :param schema_uri: URI corresponding to given schema object
+    :param registry: URILoaderRegistry used to load references (default registry for schema if omitted)
+    :param widget_registry: WidgetClassRegistry used to select widget classes (default registry if omitted)
     """
-    registry_class = create_cached_uri_loader_registry()
-    registry = registry_class()
+    if registry is None:
+        registry = create_default_uri_loader_registry(schema, schema_uri)
 
-    http_loader = HTTPResourceLoader()
-    file_resource_loader = FileResourceLoader()
-    document_loader = DocumentLoader(schema, schema_uri)
+    if widget_registry is None:
+        widget_registry = default_widget_registry
 
-    registry.register_for_scheme('http', http_loader)
-    registry.register_for_scheme('https', http_loader)
-    registry.register_for_scheme('file', file_resource_loader)
-    registry.register_for_scheme(None, document_loader)
+    # Load external references concurrently, rather than one at a time whilst compiling
+    prefetch_references(registry, schema, schema_uri or "#")
 
     ctx = Context(schema_uri or "#", registry)
-    return _create_widget(name, schema, ctx, None)
+    compiler = SchemaCompiler(widget_registry.get_widget_class, widget_registry.fallback_widget_class)
+    return _create_widget(name, compiler.compile(schema, ctx), None)
 
 
-def _create_widget(name: str, schema: dict, ctx: Context, parent: JSONBaseWidget) -> JSONBaseWidget:
-    if "id" in schema:
-        ctx = ctx.follow_uri(schema['id'])
-
-    while "$ref" in schema:
-        schema = ctx.dereference(schema['$ref'])
-
-    widget_class = next((c for c in supported_widgets if c.supports_schema(schema)),
-                        UnsupportedSchemaWidget)
+def _create_widget(name: str, node: SchemaNode, parent: JSONBaseWidget) -> JSONBaseWidget:
+    with profiler.span("create_widget", node.location):
+        # If instantiation fails, error
+        try:
+            widget = node.widget_class(name, node, parent)
+        except UnsupportedSchemaError:
+            widget = UnsupportedSchemaWidget(name, node, parent)
 
-    # If instantiation fails, error
-    try:
-        widget = widget_class(name, schema, ctx, parent)
-    except UnsupportedSchemaError:
-        widget = UnsupportedSchemaWidget(name, schema, ctx, parent)
+        with profiler.span("initialise", node.location):
+            widget.initialise()
 
-    widget.initialise()
     return widget
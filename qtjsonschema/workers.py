@@ -0,0 +1,67 @@
+"""
+Background tasks run on a QThreadPool.
+"""
+
+from PyQt5 import QtCore
+
+from .instrumentation import profiler
+from .validation import ValidationIssue, format_json_pointer, iter_subschema_issues
+
+
+class ValidationSignals(QtCore.QObject):
+    """Signals emitted by a ValidationTask.
+
+    QRunnable is not a QObject, so the signals are owned by this helper, which lives on the thread that created it.
+    """
+
+    finished = QtCore.pyqtSignal(int, object)
+
+
+class ValidationTask(QtCore.QRunnable):
+    """Validate snapshots of JSON objects away from the GUI thread.
+
+    Each ValidationTarget holds an instance snapshot and the sub-schema against which it is validated.
+    The `finished` signal is emitted with the task generation and a tuple of (path, issues) pairs for the targets,
+    unless the task is cancelled first.
+    """
+
+    def __init__(self, generation: int, validator, targets):
+        super().__init__()
+
+        self.generation = generation
+        self.signals = ValidationSignals()
+
+        self._validator = validator
+        self._targets = tuple(targets)
+        self._cancelled = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self):
+        """Request that the task stops; a cancelled task never emits its result"""
+        self._cancelled = True
+
+    def run(self):
+        results = []
+
+        for target in self._targets:
+            issues = []
+
+            try:
+                with profiler.span("validate", format_json_pointer(target.path)):
+                    for issue in iter_subschema_issues(self._validator, target):
+                        if self._cancelled:
+                            return
+
+                        issues.append(issue)
+
+            # Report schemas which cannot be validated (e.g. with circular references) rather than losing the result
+            except Exception as err:
+                issues.append(ValidationIssue(target.path, (), "Validation failed: {!r}".format(err)))
+
+            results.append((target.path, tuple(issues)))
+
+        if not self._cancelled:
+            self.signals.finished.emit(self.generation, tuple(results))
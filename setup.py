@@ -36,7 +36,8 @@ setup(
     keywords='qt json json-schema',
 
     packages=find_packages(exclude=["contrib", "docs", "tests*"]),
-    install_requires = ["pyqt5", "click", "jsonschema", "requests", "uritools"],
+    install_requires = ["pyqt5", "click", "jsonschema>=4.18", "requests", "uritools"],
+    extras_require={"fast": ["orjson"]},
 )
 
 
@@ -0,0 +1,42 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from qtjsonschema.batch import BatchValidator
+
+
+def create_batch_validator(output_directory) -> BatchValidator:
+    return BatchValidator({"type": "object"}, "#", {}, output_directory)
+
+
+def test_output_paths_of_outside_files_are_distinct(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    batch_validator = create_batch_validator(tmp_path / "out")
+
+    first = Path(os.path.abspath("/a/x.json"))
+    second = Path(os.path.abspath("/b/x.json"))
+    assert batch_validator.get_output_path(first) != batch_validator.get_output_path(second)
+    batch_validator.check_output_paths([first, second])
+
+
+def test_output_paths_stay_in_output_directory(tmp_path, monkeypatch):
+    (tmp_path / "cwd").mkdir()
+    monkeypatch.chdir(tmp_path / "cwd")
+    batch_validator = create_batch_validator(tmp_path / "out")
+
+    output_path = batch_validator.get_output_path(Path("../x.json"))
+    assert ".." not in output_path.parts
+    assert output_path.relative_to(tmp_path / "out").name == "x.json"
+
+
+def test_colliding_output_paths_are_rejected(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    batch_validator = create_batch_validator(tmp_path / "out")
+
+    outside = Path(os.path.abspath("/data/x.json"))
+    inside = Path(*outside.parts[1:])
+    with pytest.raises(ValueError):
+        batch_validator.check_output_paths([inside, outside])
+
+    batch_validator.check_output_paths([inside, inside.absolute()])
@@ -0,0 +1,159 @@
+import json
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5 import QtWidgets
+
+from qtjsonschema.editor import MainWindow
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string", "minLength": 1},
+        "tags": {"type": "array", "items": {"type": "string"}},
+        "people": {
+            "type": "array",
+            "x-virtual": True,
+            "items": {"type": "object", "properties": {"name": {"type": "string", "minLength": 1}}}
+        }
+    }
+}
+
+
+def create_main_window(tmp_path, recovery_directory=None, **kwargs) -> MainWindow:
+    schema_path = tmp_path / "schema.json"
+    schema_path.write_text(json.dumps(SCHEMA))
+
+    window = MainWindow(recovery_directory=recovery_directory, **kwargs)
+    window.load_schema(schema_path)
+    return window
+
+
+def validate(window: MainWindow) -> dict:
+    window._do_validation()
+    window._validation_pool.waitForDone()
+    app.processEvents()
+    return window._validation_issues
+
+
+def test_close_waits_for_validation(tmp_path):
+    window = create_main_window(tmp_path)
+    window._do_validation()
+    assert window._validation_task is not None
+
+    window.close()
+    assert window._validation_task is None
+    assert window._validation_pool.activeThreadCount() == 0
+
+    window.deleteLater()
+    app.processEvents()
+
+
+def test_incremental_validation_of_reselected_virtual_array_item(tmp_path):
+    window = create_main_window(tmp_path, incremental_validation=True)
+    widget = window.schema_widget
+    people = widget.properties["people"]
+    widget.load_json_object({"name": "a", "people": [{"name": "b"}, {"name": "c"}]})
+    assert validate(window) == {(): ()}
+
+    people._select_row(0)
+    people.current_editor.properties["name"].load_json_object("")
+    # The item editor is rebound before the edit is validated
+    people._select_row(1)
+
+    issues = [i for path_issues in validate(window).values() for i in path_issues]
+    assert [i.path for i in issues] == [("people", 0, "name")]
+
+
+def test_undo_and_redo_edits(tmp_path):
+    window = create_main_window(tmp_path)
+    widget = window.schema_widget
+    document_path = tmp_path / "document.json"
+    document_path.write_text(json.dumps({"name": "a", "tags": ["x"]}))
+    window.load_json(document_path)
+    while window._json_load is not None:
+        app.processEvents()
+    assert not window.journal.can_undo
+
+    def get_state():
+        value = widget.dump_json_object()
+        return value["name"], value["tags"]
+
+    states = [get_state()]
+    for edit in (lambda: widget.properties["name"].load_json_object("b"),
+                 lambda: widget.properties["tags"].add_item("y"),
+                 widget.properties["tags"].remove_item,
+                 widget.properties["tags"].remove_item):
+        edit()
+        states.append(get_state())
+    assert states == [("a", ["x"]), ("b", ["x"]), ("b", ["x", "y"]), ("b", ["x"]), ("b", [])]
+
+    for state in reversed(states[:-1]):
+        window.undo()
+        assert get_state() == state
+    assert not window.journal.can_undo
+
+    for state in states[1:]:
+        window.redo()
+        assert get_state() == state
+    assert not window.journal.can_redo
+
+    # A new edit discards the edits which were undone
+    window.undo()
+    widget.properties["name"].load_json_object("c")
+    assert not window.journal.can_redo
+
+
+def test_unsaved_changes_are_restored(tmp_path, monkeypatch):
+    recovery_directory = tmp_path / "recovery"
+    window = create_main_window(tmp_path, recovery_directory)
+    widget = window.schema_widget
+    widget.properties["name"].load_json_object("edited")
+    widget.properties["tags"].add_item("tag")
+    window._recovery.flush()
+
+    # Leave the session as if the editor had crashed
+    window._recovery.close()
+    window._recovery = None
+    window.deleteLater()
+
+    questions = []
+
+    def question(*args):
+        questions.append(args)
+        return QtWidgets.QMessageBox.Yes
+
+    monkeypatch.setattr(QtWidgets.QMessageBox, "question", question)
+    window = create_main_window(tmp_path, recovery_directory)
+    assert len(questions) == 1
+    assert window.is_modified
+
+    value = window.schema_widget.dump_json_object()
+    assert (value["name"], value["tags"]) == ("edited", ["tag"])
+
+    window._recovery.close(discard=True)
+    window._recovery = None
+    window.deleteLater()
+    app.processEvents()
+
+
+def test_mistyped_document_is_reported(tmp_path, monkeypatch):
+    window = create_main_window(tmp_path)
+    errors = []
+    monkeypatch.setattr(QtWidgets.QMessageBox, "critical", lambda *args: errors.append(args))
+
+    document_path = tmp_path / "document.json"
+    document_path.write_text(json.dumps({"tags": ["a", 1], "name": "b"}))
+    window.load_json(document_path)
+    while window._json_load is not None:
+        app.processEvents()
+
+    assert len(errors) == 1
+    assert str(document_path) in errors[0][2]
+    # The values loaded before the error are kept, as an unsaved document
+    assert window.schema_widget.dump_json_object()["tags"][0] == "a"
+    assert window.is_modified
@@ -0,0 +1,91 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from qtjsonschema.journal import PatchOperation
+from qtjsonschema.recovery import (RecoveryJournal, load_recovery_session, lock_recovery_session,
+                                   replay_recovery_session, unlock_recovery_session)
+
+
+def create_session(directory, operations, snapshot_interval=1000):
+    assert lock_recovery_session(directory)
+    journal = RecoveryJournal(directory, "schema.json", {"a": [1]}, "document.json",
+                              snapshot_interval=snapshot_interval)
+    for operation in operations:
+        journal.append(operation)
+        if journal.needs_snapshot:
+            journal.snapshot({"snapshot": True}, "document.json", True)
+    journal.close()
+
+
+OPERATIONS = [
+    PatchOperation('add', ("a", 1), 2, None),
+    PatchOperation('replace', ("a", 0), {"b": None}, 1),
+    PatchOperation('add', ("c",), "d", None),
+    PatchOperation('remove', ("a", 1), None, 2),
+]
+
+
+def test_session_is_restored(tmp_path):
+    create_session(tmp_path, OPERATIONS)
+
+    session = load_recovery_session(tmp_path)
+    assert (session.schema_path, session.document_path, session.is_modified) == ("schema.json", "document.json",
+                                                                                 False)
+    assert [(o.op, o.path, o.value) for o in session.operations] == [(o.op, o.path, o.value) for o in OPERATIONS]
+    assert replay_recovery_session(session) == ({"a": [{"b": None}], "c": "d"}, True)
+
+
+def test_truncated_record_is_ignored(tmp_path):
+    create_session(tmp_path, OPERATIONS)
+
+    journal_path = tmp_path / "journal.jsonl"
+    journal_path.write_text(journal_path.read_text()[:-5])
+
+    session = load_recovery_session(tmp_path)
+    assert replay_recovery_session(session) == ({"a": [{"b": None}, 2], "c": "d"}, True)
+
+
+def test_mismatched_edit_is_not_replayed(tmp_path):
+    create_session(tmp_path, [OPERATIONS[0], PatchOperation('replace', ("missing",), 1, None), OPERATIONS[2]])
+
+    session = load_recovery_session(tmp_path)
+    assert replay_recovery_session(session) == ({"a": [1, 2]}, False)
+
+
+def test_snapshot_replaces_journal(tmp_path):
+    create_session(tmp_path, OPERATIONS[:3], snapshot_interval=2)
+
+    session = load_recovery_session(tmp_path)
+    assert session.is_modified
+    assert replay_recovery_session(session) == ({"snapshot": True, "c": "d"}, True)
+    assert [p.name for p in tmp_path.glob("snapshot-*.json")] == ["snapshot-2.json"]
+
+
+def test_session_lock(tmp_path):
+    assert lock_recovery_session(tmp_path)
+    assert not lock_recovery_session(tmp_path)
+
+    unlock_recovery_session(tmp_path)
+    assert lock_recovery_session(tmp_path)
+    unlock_recovery_session(tmp_path)
+
+
+def test_lock_of_exited_process_is_released(tmp_path):
+    # A lock file left by a process which exited without unlocking
+    (tmp_path / "lock").write_text("0")
+
+    script = ("import sys\n"
+              "from qtjsonschema.recovery import lock_recovery_session\n"
+              "print(lock_recovery_session(sys.argv[1]), flush=True)\n"
+              "sys.stdin.read()\n")
+    process = subprocess.Popen([sys.executable, "-c", script, str(tmp_path)], stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, universal_newlines=True,
+                               cwd=str(Path(__file__).absolute().parent.parent))
+    with process:
+        assert process.stdout.readline() == "True\n"
+        assert not lock_recovery_session(tmp_path)
+        process.kill()
+
+    assert lock_recovery_session(tmp_path)
+    unlock_recovery_session(tmp_path)
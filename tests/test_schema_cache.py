@@ -0,0 +1,90 @@
+import json
+
+from qtjsonschema.schema_cache import SchemaCache, load_schema_file
+from qtjsonschema.tools import HTTPResourceLoader
+
+
+def write_schemas(directory):
+    (directory / "definitions.json").write_text(json.dumps({"name": {"type": "string"}}))
+    schema_path = directory / "schema.json"
+    schema_path.write_text(json.dumps({
+        "type": "object",
+        "properties": {"name": {"$ref": "definitions.json#/name"}, "count": {"type": "integer"}}
+    }))
+    return schema_path
+
+
+def test_cached_schema_is_loaded(tmp_path):
+    schema_path = write_schemas(tmp_path)
+    schema_cache = SchemaCache(tmp_path / "cache")
+
+    loaded = load_schema_file(schema_path, schema_cache)
+    cached = schema_cache.load(schema_path.absolute(), schema_path.read_bytes())
+    assert cached is not None
+    assert cached.schema == loaded.schema
+    assert list(cached.schema["properties"]) == ["name", "count"]
+    assert (tmp_path / "definitions.json").as_uri() in cached.resources
+
+    reloaded = load_schema_file(schema_path, schema_cache)
+    assert reloaded.registry.resources == loaded.registry.resources
+
+
+def test_changed_reference_invalidates_entry(tmp_path):
+    schema_path = write_schemas(tmp_path)
+    schema_cache = SchemaCache(tmp_path / "cache")
+    load_schema_file(schema_path, schema_cache)
+
+    (tmp_path / "definitions.json").write_text(json.dumps({"name": {"type": "integer", "minimum": 1}}))
+    assert schema_cache.load(schema_path.absolute(), schema_path.read_bytes()) is None
+
+
+def test_entries_are_not_unpickled(tmp_path):
+    schema_path = write_schemas(tmp_path)
+    schema_cache = SchemaCache(tmp_path / "cache")
+    load_schema_file(schema_path, schema_cache)
+
+    entry_path, = (tmp_path / "cache").iterdir()
+    entry_path.write_bytes(b"cos\nsystem\n(S'exit 1'\ntR.")
+    assert schema_cache.load(schema_path.absolute(), schema_path.read_bytes()) is None
+
+
+class DocumentHTTPLoader(HTTPResourceLoader):
+    """HTTPResourceLoader serving documents from a dict"""
+
+    def __init__(self, documents):
+        super().__init__()
+        self.documents = documents
+        self.loaded = []
+
+    def load_resource(self, uri):
+        self.loaded.append(uri)
+        return json.loads(json.dumps(self.documents[uri]))
+
+
+def test_changed_remote_reference_invalidates_entry(tmp_path):
+    uri = "http://example.com/definitions.json"
+    http_loader = DocumentHTTPLoader({uri: {"name": {"type": "string"}}})
+    schema_path = tmp_path / "schema.json"
+    schema_path.write_text(json.dumps({"properties": {"name": {"$ref": uri + "#/name"}}}))
+    schema_cache = SchemaCache(tmp_path / "cache")
+
+    load_schema_file(schema_path, schema_cache, http_loader)
+    cached = schema_cache.load(schema_path.absolute(), schema_path.read_bytes(), http_loader)
+    assert cached.resources[uri] == {"name": {"type": "string"}}
+    assert http_loader.loaded == [uri, uri]
+
+    http_loader.documents[uri] = {"name": {"type": "integer"}}
+    assert schema_cache.load(schema_path.absolute(), schema_path.read_bytes(), http_loader) is None
+
+    reloaded = load_schema_file(schema_path, schema_cache, http_loader)
+    assert reloaded.registry.resources[uri] == {"name": {"type": "integer"}}
+
+
+def test_unwritable_cache_is_ignored(tmp_path):
+    schema_path = write_schemas(tmp_path)
+    (tmp_path / "cache").write_text("")
+    schema_cache = SchemaCache(tmp_path / "cache")
+
+    loaded = load_schema_file(schema_path, schema_cache)
+    assert list(loaded.schema["properties"]) == ["name", "count"]
+    assert schema_cache.load(schema_path.absolute(), schema_path.read_bytes()) is None
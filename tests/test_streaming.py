@@ -0,0 +1,132 @@
+import io
+import json
+import os
+import random
+
+import pytest
+
+from qtjsonschema.streaming import (BATCH_SIZE, JSONArraySource, JSONObjectSource, JSONStreamReader, iter_encode,
+                                    json_encoder, orjson, orjson_encoder, write_json)
+
+ENCODERS = [json_encoder] + ([orjson_encoder] if orjson is not None else [])
+
+
+def random_scalar(r: random.Random):
+    kind = r.randrange(7)
+    if kind == 0:
+        return None
+    if kind == 1:
+        return r.random() < 0.5
+    if kind == 2:
+        return r.randint(-10 ** 12, 10 ** 12)
+    if kind == 3:
+        return r.uniform(-1e6, 1e6) * 10 ** r.randint(-20, 20)
+    if kind == 4:
+        return ""
+    return "".join(r.choice('ab"\\\n\té€😀 ,:[]{}') for _ in range(r.randint(1, 12)))
+
+
+def random_value(r: random.Random, depth: int = 0):
+    kind = r.randrange(3 if depth < 4 else 1)
+    if kind == 0:
+        return random_scalar(r)
+
+    # Only containers near the root are larger than a batch, holding scalars
+    length = r.choice((0, 1, r.randint(2, 6)) + ((BATCH_SIZE + r.randint(1, 50),) if depth < 2 else ()))
+    depth = 4 if length > BATCH_SIZE else depth + 1
+    if kind == 1:
+        return [random_value(r, depth) for _ in range(length)]
+    return {"k{}{}".format(i, random_scalar(r)): random_value(r, depth) for i in range(length)}
+
+
+def as_sources(value):
+    """Return value with its containers replaced by JSONObjectSource and JSONArraySource objects"""
+    if isinstance(value, dict):
+        return JSONObjectSource(lambda: ((k, as_sources(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return JSONArraySource(lambda: (as_sources(v) for v in value))
+    return value
+
+
+def test_encoded_values_round_trip():
+    r = random.Random(0)
+
+    for _ in range(40):
+        value = random_value(r)
+
+        for encoder in ENCODERS:
+            for indent in (None, 2):
+                for sort_keys in (False, True):
+                    expected = json_encoder(value, indent, sort_keys)
+                    assert "".join(iter_encode(value, indent, sort_keys, encoder)) == expected
+                    assert "".join(iter_encode(as_sources(value), indent, sort_keys, encoder)) == expected
+                    assert json.loads(expected) == value
+
+
+def test_streamed_values_round_trip():
+    r = random.Random(1)
+
+    for _ in range(40):
+        value = random_value(r)
+        data = json.dumps(value, indent=r.choice((None, 1))).encode('utf-8')
+
+        for chunk_size in (1, 7, 4096) if len(data) < 4096 else (7, 4096):
+            reader = JSONStreamReader(io.BytesIO(data), chunk_size=chunk_size)
+            assert reader.read_value() == value
+            reader.check_end()
+
+            reader = JSONStreamReader(io.BytesIO(data), chunk_size=chunk_size)
+            steps = reader.iter_value()
+            while True:
+                try:
+                    next(steps)
+                except StopIteration as stop:
+                    assert stop.value == value
+                    break
+            reader.check_end()
+
+
+def test_truncated_stream_is_rejected():
+    data = json.dumps({"a": [1, 2.5e10, "x"]}).encode('utf-8')
+
+    for end in range(len(data)):
+        reader = JSONStreamReader(io.BytesIO(data[:end]), chunk_size=3)
+        with pytest.raises(ValueError):
+            reader.read_value()
+            reader.check_end()
+
+
+def test_write_json_replaces_file(tmp_path):
+    path = tmp_path / "document.json"
+    path.write_text("[]")
+    os.chmod(path, 0o640)
+
+    write_json(path, as_sources({"a": [1, 2]}), indent=2)
+    assert json.loads(path.read_text()) == {"a": [1, 2]}
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_path) == ["document.json"]
+
+
+def test_write_json_keeps_file_if_encoding_fails(tmp_path):
+    path = tmp_path / "document.json"
+    path.write_text("[]")
+
+    with pytest.raises(TypeError):
+        write_json(path, [1, object()])
+
+    assert path.read_text() == "[]"
+    assert os.listdir(tmp_path) == ["document.json"]
+
+
+@pytest.mark.skipif(orjson is None, reason="orjson is not installed")
+def test_encoders_write_floats_identically():
+    values = [float('nan'), float('inf'), -float('inf'), 1e16, 1.5e300, 1e-05, 5e-324, -0.0, 0.1, None, "1e16 0.00001"]
+    value = {"values": values, "nested": [{"x": v} for v in values]}
+
+    for indent in (None, 2, 4):
+        for sort_keys in (False, True):
+            expected = json_encoder(value, indent, sort_keys)
+            assert orjson_encoder(value, indent, sort_keys) == expected
+            assert "".join(iter_encode(value, indent, sort_keys, orjson_encoder)) == expected
+            for v in values:
+                assert orjson_encoder(v, indent, sort_keys) == json_encoder(v, indent, sort_keys)
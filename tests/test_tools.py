@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from qtjsonschema.errors import ResourceUnavailableError
+from qtjsonschema.tools import (HTTPResourceLoader, ResourceCache, URILoaderRegistry,
+                                create_cached_uri_loader_registry, create_default_uri_loader_registry)
+
+
+class SchemaRequestHandler(BaseHTTPRequestHandler):
+    """Serve the server's document, with an ETag, recording the status of each response"""
+
+    def do_GET(self):
+        server = self.server
+        etag = '"{}"'.format(server.version)
+
+        if self.headers.get('If-None-Match') == etag:
+            server.statuses.append(304)
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = json.dumps(server.document).encode('utf-8')
+        server.statuses.append(200)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve_document(document: dict):
+    """Serve document over HTTP in a thread, yielding the server"""
+    server = HTTPServer(('127.0.0.1', 0), SchemaRequestHandler)
+    server.document = document
+    server.version = 1
+    server.statuses = []
+    server.uri = "http://127.0.0.1:{}/schema.json".format(server.server_port)
+
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_file_resources_are_cached_until_modified(tmp_path):
+    path = tmp_path / "definitions.json"
+    path.write_text(json.dumps({"a": 1}))
+    resource_cache = ResourceCache()
+
+    assert create_default_uri_loader_registry(resource_cache=resource_cache).load_uri(path.as_uri()) == {"a": 1}
+    assert create_default_uri_loader_registry(resource_cache=resource_cache).load_uri(path.as_uri()) == {"a": 1}
+    assert resource_cache.stats()['hits'] == 1
+
+    path.write_text(json.dumps({"a": 2}))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+
+    assert create_default_uri_loader_registry(resource_cache=resource_cache).load_uri(path.as_uri()) == {"a": 2}
+    assert resource_cache.stats()['hits'] == 1
+
+
+def test_cached_uri_loader_registry_is_deprecated(tmp_path):
+    path = tmp_path / "definitions.json"
+    path.write_text(json.dumps({"a": 1}))
+
+    with pytest.deprecated_call():
+        registry_class = create_cached_uri_loader_registry(16)
+
+    first, second = registry_class(), registry_class()
+    assert isinstance(first, URILoaderRegistry)
+    assert first.resource_cache is second.resource_cache
+    assert first.resource_cache.max_size == 16
+
+
+def test_http_resources_are_revalidated(tmp_path):
+    with serve_document({"type": "string"}) as server:
+        loader = HTTPResourceLoader(cache_directory=tmp_path)
+        assert loader.load_resource(server.uri) == {"type": "string"}
+
+        # An unchanged resource is not sent again, and is read from the cache
+        assert HTTPResourceLoader(cache_directory=tmp_path).load_resource(server.uri) == {"type": "string"}
+        assert server.statuses == [200, 304]
+
+        server.document = {"type": "integer"}
+        server.version = 2
+        assert HTTPResourceLoader(cache_directory=tmp_path).load_resource(server.uri) == {"type": "integer"}
+        assert server.statuses == [200, 304, 200]
+
+
+def test_shared_http_resources_are_revalidated(tmp_path):
+    resource_cache = ResourceCache()
+    http_loader = HTTPResourceLoader(cache_directory=tmp_path)
+
+    with serve_document({"type": "string"}) as server:
+        for document, version in (({"type": "string"}, 1), ({"type": "integer"}, 2)):
+            server.document = document
+            server.version = version
+            registry = create_default_uri_loader_registry(http_loader=http_loader, resource_cache=resource_cache)
+            assert registry.load_uri(server.uri) == document
+
+        assert server.statuses == [200, 200]
+
+
+def test_offline_http_resources_are_loaded_from_cache(tmp_path):
+    with serve_document({"type": "string"}) as server:
+        HTTPResourceLoader(cache_directory=tmp_path).load_resource(server.uri)
+
+        loader = HTTPResourceLoader(cache_directory=tmp_path, offline=True)
+        assert loader.load_resource(server.uri) == {"type": "string"}
+        assert server.statuses == [200]
+
+        with pytest.raises(ResourceUnavailableError):
+            loader.load_resource(server.uri.replace("schema", "other"))
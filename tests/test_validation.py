@@ -0,0 +1,59 @@
+import json
+
+from qtjsonschema.tools import create_default_uri_loader_registry
+from qtjsonschema.validation import ValidationTarget, create_validator, iter_subschema_issues, iter_validation_issues
+
+
+def write_schemas(directory):
+    definitions_path = directory / "definitions" / "definitions.json"
+    definitions_path.parent.mkdir()
+    definitions_path.write_text(json.dumps({
+        "person": {"type": "object", "properties": {"name": {"$ref": "#/name"}}},
+        "name": {"type": "string", "minLength": 1}
+    }))
+
+    schema_path = directory / "schema.json"
+    schema_path.write_text(json.dumps({
+        "type": "object",
+        "properties": {"person": {"$ref": "definitions/definitions.json#/person"}, "count": {"type": "integer"}}
+    }))
+    return schema_path, definitions_path
+
+
+def create_file_validator(schema_path):
+    schema = json.loads(schema_path.read_text())
+    registry = create_default_uri_loader_registry(schema, schema_path.as_uri())
+    return create_validator(schema, schema_path.as_uri(), registry.resources, registry.get_scheme_handlers())
+
+
+def test_relative_references_are_resolved_against_base_uri(tmp_path):
+    schema_path, _ = write_schemas(tmp_path)
+    validator = create_file_validator(schema_path)
+
+    issues = list(iter_validation_issues(validator, {"person": {"name": ""}, "count": "1"}))
+    assert sorted(i.path for i in issues) == [("count",), ("person", "name")]
+    assert ("properties", "count", "type") in [i.schema_path for i in issues]
+
+
+def test_subschema_references_are_resolved_against_scope(tmp_path):
+    schema_path, definitions_path = write_schemas(tmp_path)
+    validator = create_file_validator(schema_path)
+    person_schema = json.loads(definitions_path.read_text())["person"]
+
+    target = ValidationTarget(("person",), person_schema, definitions_path.as_uri() + "#/person", {"name": ""})
+    issues = list(iter_subschema_issues(validator, target))
+    assert [(i.path, i.schema_path) for i in issues] == [(("person", "name"), ("properties", "name", "minLength"))]
+
+    target = ValidationTarget(("count",), {"type": "integer"}, None, "1")
+    issues = list(iter_subschema_issues(validator, target))
+    assert [(i.path, i.schema_path) for i in issues] == [(("count",), ("type",))]
+
+
+def test_root_reference_is_resolved_against_base_uri(tmp_path):
+    _, definitions_path = write_schemas(tmp_path)
+    schema_path = tmp_path / "root.json"
+    schema_path.write_text(json.dumps({"$ref": "definitions/definitions.json#/person"}))
+    validator = create_file_validator(schema_path)
+
+    issues = list(iter_validation_issues(validator, {"name": ""}))
+    assert [i.path for i in issues] == [("name",)]
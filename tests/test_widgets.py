@@ -0,0 +1,151 @@
+import io
+import itertools
+import json
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5 import QtWidgets
+
+from qtjsonschema.journal import EditJournal
+from qtjsonschema.streaming import JSONStreamReader
+from qtjsonschema.widgets import create_widget
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+ARRAY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "arr": {"type": "array", "items": {"type": "string"}}
+    }
+}
+
+
+def test_closed_array_stream_load_is_consistent():
+    widget = create_widget("root", ARRAY_SCHEMA)
+    array = widget.properties["arr"]
+    assert widget.dump_json_object() == {"arr": []}
+
+    data = json.dumps({"arr": ["item {}".format(i) for i in range(500)]}).encode()
+    steps = widget.iter_load_json_object(JSONStreamReader(io.BytesIO(data), chunk_size=64))
+    for _ in itertools.islice(steps, 240):
+        pass
+    steps.close()
+
+    count = array.widget_stack.count()
+    assert 0 < count < 500
+    assert array.items_list.count() == count
+    assert widget.dump_json_object() == {"arr": ["item {}".format(i) for i in range(count)]}
+
+    journal = EditJournal()
+    widget.edited.connect(journal.record)
+    array.add_item("added")
+
+    operation = journal.undo()
+    assert operation.path == ("arr", count)
+    widget.apply_patch_operation(operation.op, operation.path)
+    assert array.widget_stack.count() == count
+
+
+GROUP_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "group": {
+            "type": "object",
+            "properties": {
+                "list": {
+                    "type": "array",
+                    "items": {"type": "object", "properties": {"a": {"type": "integer"}, "b": {"type": "string"}}}
+                },
+                "ignored": {"type": "string"}
+            }
+        }
+    }
+}
+
+GROUP_DATA = {"group": {"list": [{"a": 1}, {"a": 2, "c": 3}], "extra": True}}
+
+
+def test_collapsed_object_dumps_expanded_value():
+    widget = create_widget("root", GROUP_SCHEMA)
+    group = widget.properties["group"]
+    widget.load_json_object(GROUP_DATA)
+    assert not group.is_built
+
+    collapsed = widget.dump_json_object()
+    group.set_expanded(True)
+    assert widget.dump_json_object() == collapsed
+    assert collapsed == {"group": {"list": [{"a": 1, "b": ""}, {"a": 2, "b": ""}], "ignored": ""}}
+
+
+def test_collapsed_object_streams_expanded_value():
+    widget = create_widget("root", GROUP_SCHEMA)
+    group = widget.properties["group"]
+    for _ in widget.iter_load_json_object(JSONStreamReader(io.BytesIO(json.dumps(GROUP_DATA).encode()))):
+        pass
+    assert not group.is_built
+
+    collapsed = widget.dump_json_object()
+    group.set_expanded(True)
+    assert widget.dump_json_object() == collapsed
+
+
+def test_recursive_default_has_no_null():
+    schema = {
+        "type": "object",
+        "properties": {
+            "name": {"type": "string"},
+            "child": {"$ref": "#"}
+        }
+    }
+    widget = create_widget("root", schema)
+    assert widget.dump_json_object() == {"name": "", "child": {"name": "", "child": {}}}
+
+    widget.load_json_object({"child": {"child": {"name": "leaf"}}})
+    assert widget.dump_json_object()["child"]["child"] == {"name": "leaf", "child": {"name": "", "child": {}}}
+
+
+def test_collapsed_numbers_are_clamped():
+    schema = {
+        "type": "object",
+        "properties": {
+            "g": {
+                "type": "object",
+                "properties": {
+                    "n": {"type": "integer"},
+                    "x": {"type": "number", "maximum": 5},
+                    "y": {"type": "number", "minimum": -1}
+                }
+            }
+        }
+    }
+    widget = create_widget("root", schema)
+    group = widget.properties["g"]
+    widget.load_json_object({"g": {"n": 500, "x": 7.123, "y": 1.005}})
+    assert not group.is_built
+
+    collapsed = widget.dump_json_object()
+    group.set_expanded(True)
+    assert widget.dump_json_object() == collapsed
+    assert collapsed == {"g": {"n": 99, "x": 5.0, "y": 1.0}}
+
+
+def test_collapsed_enum_keeps_loaded_member():
+    schema = {
+        "type": "object",
+        "properties": {
+            "g": {
+                "type": "object",
+                "properties": {"e": {"enum": [{"a": 1}, {"b": 2}]}}
+            }
+        }
+    }
+    widget = create_widget("root", schema)
+    group = widget.properties["g"]
+    widget.load_json_object({"g": {"e": {"b": 2}}})
+    assert not group.is_built
+
+    assert widget.dump_json_object() == {"g": {"e": {"b": 2}}}
+    group.set_expanded(True)
+    assert widget.dump_json_object() == {"g": {"e": {"b": 2}}}